@@ -1,12 +1,83 @@
 import sys
 import os
 import argparse
-import subprocess
+import asyncio
+import json
+from datetime import datetime, timedelta
 
 # Add local directory to path so `data.*` package imports resolve when run
-# either from the repo root or from scripts/.
+# either from the repo root or from scripts/; the repo root resolves `scripts.*`.
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from data.tracked_symbols import load_tracked_symbols
+from scripts.core.crawler import DEFAULT_MAX_PER_HOST, DEFAULT_RPM
+from scripts.crawl_dataroma_stock import crawl_ticker, make_crawler, save_ticker_data
+
+# Completed tickers and their updated_at, rewritten after every ticker so an
+# interrupted batch resumes where it stopped. Kept under public/data/cache
+# (next to the page cache) so the seed / mirror scripts carry it between CI runs.
+CHECKPOINT_FILE = os.path.join("public", "data", "cache", "dataroma_batch_checkpoint.json")
+DEFAULT_MAX_AGE_HOURS = 20  # a ticker crawled within this window is skipped
+DEFAULT_WORKERS = 2         # tickers in flight; their pages share the crawler's per-host limits
+
+
+def load_checkpoint(path=CHECKPOINT_FILE):
+    """{ticker: updated_at} of completed tickers ({} when missing or unreadable)."""
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return dict(json.load(fh).get("completed", {}))
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def save_checkpoint(completed, path=CHECKPOINT_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"completed": completed}, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def is_fresh(updated_at, max_age_hours, now=None):
+    if not updated_at or max_age_hours <= 0:
+        return False
+    try:
+        crawled = datetime.fromisoformat(updated_at)
+    except ValueError:
+        return False
+    return (now or datetime.now()) - crawled < timedelta(hours=max_age_hours)
+
+
+def pending_tickers(tickers, completed, max_age_hours, now=None):
+    return [t for t in tickers if not is_fresh(completed.get(t), max_age_hours, now)]
+
+
+async def crawl_batch(crawler, tickers, completed, checkpoint_path=CHECKPOINT_FILE,
+                      workers=DEFAULT_WORKERS, crawl=crawl_ticker, save=save_ticker_data):
+    """
+    Crawl tickers in-process on one PoliteCrawler, `workers` tickers at a
+    time. Each success is saved and checkpointed as soon as it completes.
+    Returns (success, failed).
+    """
+    gate = asyncio.Semaphore(max(1, workers))
+    success, failed = [], []
+
+    async def process(ticker):
+        async with gate:
+            try:
+                data = await crawl(crawler, ticker)
+                save(data)
+            except Exception as e:
+                print(f"FAILED: {ticker}: {e}")
+                failed.append(ticker)
+                return
+        completed[ticker] = data["updated_at"]
+        save_checkpoint(completed, checkpoint_path)
+        success.append(ticker)
+        print(f"[{len(success) + len(failed)}/{len(tickers)}] SUCCESS: {ticker}")
+
+    await asyncio.gather(*(process(t) for t in tickers))
+    return success, failed
 
 
 def main():
@@ -18,6 +89,26 @@ def main():
         "--priority", type=int, default=None,
         help="Only crawl symbols with this priority value (default: all enabled).",
     )
+    parser.add_argument(
+        "--max-age-hours", type=float, default=DEFAULT_MAX_AGE_HOURS,
+        help="Skip tickers completed within this many hours (0 = recrawl all).",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS,
+        help="Tickers crawled at the same time.",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_MAX_PER_HOST,
+        help="Max in-flight requests to Dataroma.",
+    )
+    parser.add_argument(
+        "--rpm", type=float, default=DEFAULT_RPM,
+        help="Max requests per minute to Dataroma.",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Ignore and do not write the local page cache.",
+    )
     parser.add_argument(
         "--dry-run", action="store_true",
         help="Print the resolved ticker list and exit without crawling.",
@@ -30,44 +121,31 @@ def main():
     print(f"Found {len(tickers)} tickers to process "
           f"(source: config/stocks.json, scope: {scope}).")
 
+    # 2. Skip tickers the checkpoint marks as fresh (resume after interruption).
+    completed = load_checkpoint()
+    todo = pending_tickers(tickers, completed, args.max_age_hours)
+    print(f"{len(tickers) - len(todo)} crawled within {args.max_age_hours:g}h, "
+          f"{len(todo)} to crawl.")
+
     if args.dry_run:
-        print(", ".join(tickers))
+        print(", ".join(todo))
         return
 
-    # 2. Process each ticker via the single-ticker crawler (isolated subprocess).
-    failed = []
-    success = []
-
-    for i, ticker in enumerate(tickers):
-        print(f"[{i + 1}/{len(tickers)}] Processing {ticker}...")
-        try:
-            result = subprocess.run(
-                [sys.executable, "scripts/crawl_dataroma_stock.py", "--ticker", ticker],
-                capture_output=True,
-                text=True,
-            )
-
-            if result.returncode == 0:
-                print(f"SUCCESS: {ticker}")
-                success.append(ticker)
-            else:
-                print(f"FAILED: {ticker}")
-                print(f"Error output: {result.stderr}")
-                failed.append(ticker)
-
-        except Exception as e:
-            print(f"EXCEPTION for {ticker}: {e}")
-            failed.append(ticker)
+    # 3. Crawl in-process: one session, one scheduler for the whole batch.
+    with make_crawler(args.concurrency, args.rpm, use_cache=not args.no_cache) as crawler:
+        success, failed = crawler.run(crawl_batch(crawler, todo, completed, workers=args.workers))
+        print(crawler.summary())
 
-    # 3. Summary
+    # 4. Summary
     print("\n" + "=" * 30)
     print("BATCH CRAWL COMPLETE")
     print(f"Total: {len(tickers)}")
+    print(f"Skipped (fresh): {len(tickers) - len(todo)}")
     print(f"Success: {len(success)}")
     print(f"Failed: {len(failed)}")
 
     if failed:
-        print(f"Failed Tickers: {', '.join(failed)}")
+        print(f"Failed Tickers: {', '.join(sorted(failed))}")
 
 
 if __name__ == "__main__":
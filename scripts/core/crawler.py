@@ -0,0 +1,321 @@
+"""
+Polite Concurrent Crawler Core (asyncio Scheduler, Shared Connection Pool)
+禮貌型並行爬蟲核心（asyncio 排程、共用連線池）
+
+The Dataroma scrapers used to sleep 2-8 s before every request and fetch one
+page at a time. PoliteCrawler schedules requests with asyncio instead:
+  - a per-host concurrency ceiling (asyncio.Semaphore),
+  - a per-host requests-per-minute budget: request starts are reserved on
+    evenly spaced slots, so no host ever sees more than `rpm` starts a minute,
+  - a randomized politeness delay awaited with asyncio.sleep, so other
+    requests keep flowing while one waits,
+  - one requests.Session (pooled keep-alive connections, rotating
+    User-Agent) shared by a small thread pool that performs the blocking I/O.
+Throughput therefore rises to the configured ceiling rather than one request
+per politeness delay.
+以 asyncio 排程：每個主機有並行上限與每分鐘請求預算，隨機延遲以非阻塞方式
+等待；實際 HTTP 由共用 requests.Session 的執行緒池完成。
+
+Page cache (optional): with a PageCache and a per-page-type TTL, a page
+fetched within its TTL is served from disk without any request; an expired
+page is revalidated with If-None-Match / If-Modified-Since (304 keeps the
+stored body). Each entry keeps the body (gzip), fetch time, ETag,
+Last-Modified and the body's SHA-256; fetch_parsed() also stores the parse
+result against that hash and the parser's code fingerprint, so an unchanged
+page is never parsed twice by the same parser code. A failed request falls
+back to the stored copy, however old.
+頁面快取：TTL 內直接讀取本地副本；過期則送出條件式請求（304 沿用舊內容）；
+內容雜湊與解析器程式碼皆未變時沿用上次的解析結果。
+
+Usage:
+    with PoliteCrawler(max_per_host=3, rpm=30) as crawler:
+        pages = crawler.run(crawler.fetch_many(urls))        # [str | None]
+        soup = crawler.run(crawler.fetch_soup(url))
+
+    cached = PoliteCrawler(cache=PageCache("public/data/cache/pages"), ttl_hours={"/m/hist/": 168})
+    rows = cached.run(cached.fetch_parsed(url, parse_rows))  # parse_rows(soup) -> JSON-able
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scripts.core.html_tables import DEFAULT_BACKEND, extract_tables, make_soup
+from scripts.core.result_cache import code_fingerprint
+
+# Risk Mitigation: Random User-Agents
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0'
+]
+
+DEFAULT_MAX_PER_HOST = 3
+DEFAULT_RPM = 30
+DEFAULT_DELAY = (0.5, 2.0)  # seconds of random politeness jitter per request
+
+
+class _HostGate:
+    """Concurrency ceiling plus evenly spaced start slots for one host."""
+    def __init__(self, max_concurrent, rpm):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.interval = 60.0 / rpm if rpm else 0.0
+        self.next_slot = 0.0
+
+    def reserve(self, now):
+        """Seconds to wait for this request's start slot (slots are claimed in call order)."""
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        return slot - now
+
+
+# --- Page cache ---
+
+def _write_atomic(path, data, opener=open, mode='w'):
+    tmp = f"{path}.tmp"
+    with opener(tmp, mode, encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class PageCache:
+    """
+    One entry per URL: {key}.json (url, fetched_at, etag, last_modified,
+    sha256, parsed) next to {key}.html.gz (the body), key = SHA-1 of the URL.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _paths(self, url):
+        base = os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+        return base + '.json', base + '.html.gz'
+
+    def load(self, url):
+        """The entry with its 'body', or None when missing or unreadable."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                entry = json.load(f)
+            with gzip.open(body_path, 'rt', encoding='utf-8') as f:
+                entry['body'] = f.read()
+        except (OSError, ValueError, EOFError):
+            return None
+        return entry
+
+    def save(self, url, entry, body_changed=True):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta_path, body_path = self._paths(url)
+        if body_changed:
+            _write_atomic(body_path, entry['body'], gzip.open, 'wt')
+        _write_atomic(meta_path, json.dumps({k: v for k, v in entry.items() if k != 'body'}, indent=1))
+
+    @staticmethod
+    def is_fresh(entry, ttl_hours, now=None):
+        if not entry or not ttl_hours:
+            return False
+        age = (now or datetime.now()) - datetime.fromisoformat(entry['fetched_at'])
+        return age < timedelta(hours=ttl_hours)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class PoliteCrawler:
+    """
+    Rate-limited concurrent fetcher. Coroutines (fetch, fetch_soup,
+    fetch_parsed, fetch_many) run on the crawler's event loop via run(); the
+    crawler is reusable across many run() calls and keeps its connection pool.
+    cache: optional PageCache; ttl_hours: {url path fragment: hours}, the
+    first fragment found in a URL's path sets its TTL (no match: always
+    revalidate). backend: HTML parser for soups and table extraction
+    (html_tables: lxml when installed, else html.parser).
+    """
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, rpm=DEFAULT_RPM, delay=DEFAULT_DELAY,
+                 timeout=15, retries=1, user_agents=USER_AGENTS, seed=None, verbose=True,
+                 cache=None, ttl_hours=None, backend=DEFAULT_BACKEND):
+        self.max_per_host = max(1, int(max_per_host))
+        self.rpm = rpm
+        self.delay = delay
+        self.timeout = timeout
+        self.retries = retries
+        self.user_agents = list(user_agents)
+        self.verbose = verbose
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_per_host * 2, thread_name_prefix='crawler')
+        self.loop = asyncio.new_event_loop()
+        self.gates = {}
+        self.cache = cache
+        self.ttl_hours = dict(ttl_hours or {})
+        self.backend = backend
+        self.requests = 0
+        self.failures = 0
+        self.cache_hits = 0     # served from the cache without a request
+        self.not_modified = 0   # revalidated with a 304
+        self.parses = 0
+        self._parser_codes = {}
+
+    # --- Lifecycle ---
+
+    def run(self, coro):
+        """Run a coroutine to completion on the crawler's loop (sync entry point)."""
+        return self.loop.run_until_complete(coro)
+
+    def close(self):
+        if not self.loop.is_closed():
+            self.loop.close()
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Fetching ---
+
+    def _gate(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.gates:
+            self.gates[host] = _HostGate(self.max_per_host, self.rpm)
+        return self.gates[host]
+
+    def _ttl(self, url):
+        path = urlsplit(url).path
+        return next((hours for fragment, hours in self.ttl_hours.items() if fragment in path), None)
+
+    def _get(self, url, validators):
+        headers = {'User-Agent': self.rng.choice(self.user_agents)}
+        headers.update(validators)
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None, response.headers
+        response.raise_for_status()
+        return response.text, response.headers
+
+    async def _request(self, url, validators):
+        """(text, headers) with text None on a 304; None when every attempt failed."""
+        gate = self._gate(url)
+        for attempt in range(self.retries + 1):
+            async with gate.semaphore:
+                wait = gate.reserve(time.monotonic()) + self.rng.uniform(*self.delay)
+                if self.verbose:
+                    print(f"Fetching {url} (in {wait:.2f}s)...")
+                await asyncio.sleep(wait)
+                self.requests += 1
+                try:
+                    return await self.loop.run_in_executor(self.executor, self._get, url, validators)
+                except requests.exceptions.RequestException as e:
+                    self.failures += 1
+                    print(f"Error fetching {url}: {e}" + (" (retrying)" if attempt < self.retries else ""))
+        return None
+
+    async def fetch_entry(self, url):
+        """
+        Cache entry dict (body, sha256, fetched_at, ...) for url, from the
+        cache when fresh, else from the network; None when it cannot be had.
+        """
+        cached = self.cache.load(url) if self.cache else None
+        if self.cache and PageCache.is_fresh(cached, self._ttl(url)):
+            self.cache_hits += 1
+            return cached
+
+        validators = {}
+        if cached and cached.get('etag'):
+            validators['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            validators['If-Modified-Since'] = cached['last_modified']
+        result = await self._request(url, validators)
+        if result is None:
+            if cached:
+                print(f"Using cached copy of {url} from {cached['fetched_at']}")
+            return cached
+
+        text, headers = result
+        now = datetime.now().isoformat()
+        if text is None:
+            self.not_modified += 1
+            cached['fetched_at'] = now
+            if self.cache:
+                self.cache.save(url, cached, body_changed=False)
+            return cached
+
+        digest = content_hash(text)
+        changed = not cached or cached.get('sha256') != digest
+        entry = {
+            'url': url,
+            'fetched_at': now,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'sha256': digest,
+            'parsed': {} if changed else cached.get('parsed', {}),
+            'body': text,
+        }
+        if self.cache:
+            self.cache.save(url, entry, body_changed=changed)
+        return entry
+
+    async def fetch(self, url):
+        """Page text, or None after `retries` failed retries (errors are printed, not raised)."""
+        entry = await self.fetch_entry(url)
+        return entry['body'] if entry else None
+
+    async def fetch_soup(self, url):
+        text = await self.fetch(url)
+        return make_soup(text, self.backend) if text is not None else None
+
+    async def fetch_parsed(self, url, parse, tables=None, name=None):
+        """
+        parse(page) for the page at url, or None when it cannot be fetched;
+        page is {id: Table} of the given table ids when `tables` is set
+        (html_tables.extract_tables, the fast path), else a BeautifulSoup.
+        With a cache the (JSON-serializable) result is stored under `name`
+        (default: the parser's qualified name) and reused while both the page's
+        content hash and the parser's code_fingerprint are unchanged, so a
+        parser fix re-parses stored pages on the next run.
+        """
+        entry = await self.fetch_entry(url)
+        if entry is None:
+            return None
+        name = name or f"{parse.__module__}.{parse.__qualname__}"
+        code = self._parser_codes.get(parse)
+        if code is None:
+            code = self._parser_codes[parse] = code_fingerprint(parse)
+        memo = entry.get('parsed', {}).get(name)
+        if memo is not None and memo.get('sha256') == entry['sha256'] and memo.get('code') == code:
+            return memo['result']
+        self.parses += 1
+        body = entry['body']
+        result = parse(extract_tables(body, tables, self.backend) if tables else make_soup(body, self.backend))
+        if self.cache:
+            entry.setdefault('parsed', {})[name] = {'sha256': entry['sha256'], 'code': code, 'result': result}
+            self.cache.save(url, entry, body_changed=False)
+            # Round-trip so a fresh parse and a cached one look the same (tuples -> lists)
+            result = json.loads(json.dumps(result))
+        return result
+
+    async def fetch_many(self, urls, soup=False):
+        """Results in input order; all requests are scheduled at once under the host limits."""
+        fn = self.fetch_soup if soup else self.fetch
+        return await asyncio.gather(*(fn(u) for u in urls))
+
+    def summary(self):
+        text = f"Crawler: {self.requests} requests, {self.failures} failed"
+        if self.cache:
+            text += f", {self.cache_hits} cache hits, {self.not_modified} not modified, {self.parses} parses"
+        return text
@@ -0,0 +1,318 @@
+"""
+Fear & Greed Component Engine (Shared Market Panel)
+恐懼與貪婪指數元件引擎（共用市場面板）
+
+The seven-component model (momentum, strength, breadth, options, volatility,
+safe haven, junk bond demand) used by calc_fear_greed, update_sentiment and
+the research tuners. The ^GSPC / ^VIX / JNK / IEF / ^NYA panel is loaded
+once per period and reused:
+  1. a fresh local cache (.cache/fear_greed/panel_<period>.pkl),
+  2. the daily OHLCV store (public/data/ohlcv: FOREXCOM_SPXUSD, TVC_VIX,
+     NASDAQ_JNK) for tickers whose stored history covers the period and
+     reaches the latest downloaded bar (a lagging store is re-downloaded),
+  3. one yf.download for whatever is still missing (a stale cache is used
+     when the download fails).
+市場面板每個期間只下載一次，優先讀取本地快取與既有 OHLCV 檔。
+
+Raw metrics are computed once per engine; components() normalizes all seven
+columns together (one rolling pass over the metric frame):
+  zscore - 50 + scale * rolling z-score over `lookback` days, clipped 0..100
+  fixed  - fixed-range min-max of the percent-style metrics (ranges below)
+Inverted components (rising VIX = fear) flip the sign / the scale.
+
+update_history() persists the daily components + FGI as JSON and extends
+them incrementally from a small rolling-window state file.
+
+Usage:
+    engine = FearGreedEngine()
+    comps = engine.components(lookback=125, scale=20)
+    fgi = engine.index(comps)
+    history = update_history("history.json", "state.json")   # daily run
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+TICKERS = ("^GSPC", "^VIX", "JNK", "IEF", "^NYA")
+FIELDS = ("Open", "High", "Low", "Close", "Volume")
+# Yahoo ticker -> file stem written by generate-real-ohlcv-yfinance.py
+STORE_NAMES = {"^GSPC": "FOREXCOM_SPXUSD", "^VIX": "TVC_VIX", "JNK": "NASDAQ_JNK"}
+OHLCV_DIR = "public/data/ohlcv"
+CACHE_DIR = ".cache/fear_greed"
+MAX_AGE_HOURS = 12
+PERIOD_DAYS = {"1mo": 31, "3mo": 92, "6mo": 183, "1y": 365, "2y": 730, "5y": 1826, "10y": 3652}
+
+COMPONENTS = ('momentum', 'strength', 'breadth', 'options', 'volatility', 'safe_haven', 'junk_bond')
+INVERTED = ('breadth', 'options', 'volatility')
+NORMALIZATIONS = ('zscore', 'fixed')
+# Fixed-range normalization: (metric, low, high); None = already on a 0..100 scale
+FIXED_RANGES = {
+    'momentum': ('momentum_pct', -5, 5),
+    'strength': ('strength_pct', None, None),
+    'breadth': ('breadth', -2, 2),
+    'options': ('options', 10, 30),
+    'volatility': ('volatility_gap', -5, 5),
+    'safe_haven': ('safe_haven_pct', -5, 5),
+    'junk_bond': ('junk_bond_gap', -3, 3),
+}
+
+
+# --- Market panel ---
+
+def _cache_path(period, cache_dir):
+    return os.path.join(cache_dir, f"panel_{period}.pkl")
+
+
+def _read_store(ticker, ohlcv_dir):
+    """Daily bars for a ticker from the OHLCV store (None when absent)."""
+    path = os.path.join(ohlcv_dir, f"{STORE_NAMES[ticker]}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        payload = json.load(f)
+    if (payload.get('metadata') or {}).get('period', '1d') != '1d':
+        return None
+    # Stored as UTC epoch ms of the exchange-local midnight; keep the trading date
+    index = pd.to_datetime(payload['timestamps'], unit='ms', utc=True).tz_convert(None).normalize()
+    return pd.DataFrame({f: payload[f.lower()] for f in FIELDS}, index=index, dtype=float)
+
+
+def _download(tickers, period):
+    import yfinance as yf
+    data = yf.download(list(tickers), period=period, interval="1d", progress=False)
+    if not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([data.columns, list(tickers)])
+    return {t: data.xs(t, axis=1, level=1)[list(FIELDS)] for t in tickers if t in data.columns.get_level_values(1)}
+
+
+def load_panel(period="5y", refresh=False, cache_dir=CACHE_DIR, ohlcv_dir=OHLCV_DIR, max_age_hours=MAX_AGE_HOURS):
+    """
+    (field, ticker) column panel like yf.download, forward-filled.
+    refresh=True ignores the cache (the store and the network are re-read).
+    """
+    cache = _cache_path(period, cache_dir)
+    if not refresh and os.path.exists(cache) and time.time() - os.path.getmtime(cache) < max_age_hours * 3600:
+        return pd.read_pickle(cache)
+
+    start = pd.Timestamp.now().normalize() - pd.Timedelta(days=PERIOD_DAYS.get(period, 1826) - 7)
+    stored = {}
+    for ticker in STORE_NAMES:
+        df = _read_store(ticker, ohlcv_dir)
+        if df is not None and len(df) and df.index[0] <= start:
+            stored[ticker] = df[df.index >= start]
+    frames, tried = {}, set()
+    missing = [t for t in TICKERS if t not in stored]
+    while True:
+        if missing:
+            tried.update(missing)
+            try:
+                frames.update(_download(missing, period))
+            except Exception as e:
+                if os.path.exists(cache):
+                    print(f"Warning: download failed ({e}); using cached panel {cache}")
+                    return pd.read_pickle(cache)
+                raise
+        # A store that stops before the downloaded bars (failed daily step, old
+        # local copy) would be forward-filled next to fresh data: download it too
+        latest = max((f['Close'].last_valid_index() for f in frames.values() if f['Close'].notna().any()),
+                     default=pd.Timestamp.now().normalize() - pd.offsets.BDay(1))
+        missing = [t for t, df in stored.items() if t not in tried and df.index[-1] < latest]
+        if not missing:
+            break
+    for ticker, df in stored.items():
+        if ticker not in frames:
+            if df.index[-1] < latest:
+                raise RuntimeError(f"{ticker} store ends {df.index[-1].date()} and could not be downloaded")
+            frames[ticker] = df
+    absent = [t for t in TICKERS if t not in frames]
+    if absent:
+        raise RuntimeError(f"No data for {', '.join(absent)}")
+
+    panel = pd.concat({t: frames[t] for t in TICKERS}, axis=1, sort=True).swaplevel(axis=1)[list(FIELDS)]
+    panel = panel.ffill()
+    os.makedirs(cache_dir, exist_ok=True)
+    panel.to_pickle(cache)
+    return panel
+
+
+# --- Components ---
+
+def zscore_scale(metrics, lookback=125, scale=20):
+    """50 + scale * rolling z-score, clipped to 0..100 (all columns in one pass)."""
+    roll = metrics.rolling(lookback)
+    z = (metrics - roll.mean()) / roll.std().replace(0, np.nan)
+    return (50 + z * scale).clip(0, 100)
+
+
+def fixed_scale(values, low, high):
+    """Clamp to [low, high] and map linearly onto 0..100."""
+    return (values.clip(low, high) - low) / (high - low) * 100
+
+
+class FearGreedEngine:
+    """
+    Seven Fear & Greed components as full time series from one market panel.
+    以單一市場面板計算七個恐懼貪婪元件的完整時間序列。
+    """
+    def __init__(self, panel=None, period="5y", **load_kwargs):
+        self.panel = panel if panel is not None else load_panel(period, **load_kwargs)
+        self.closes = self.panel['Close']
+        self._metrics = None
+
+    def metrics(self):
+        """Raw metric frame (computed once): z-score metrics plus the fixed-range variants."""
+        if self._metrics is not None:
+            return self._metrics
+        c = self.closes
+        spx, vix, nya, ief, jnk = c['^GSPC'], c['^VIX'], c['^NYA'], c['IEF'], c['JNK']
+        ma125 = spx.rolling(125).mean()
+        high52, low52 = nya.rolling(252).max(), nya.rolling(252).min()
+        vix_ma50 = vix.rolling(50).mean()
+        stock_vs_bond = spx.pct_change(20) - ief.pct_change(20)
+        junk_ratio = jnk / ief
+        junk_ma = junk_ratio.rolling(125).mean()
+        strength = (nya - low52) / (high52 - low52)
+        self._metrics = pd.DataFrame({
+            # 1. Momentum: SPX relative to its 125-day MA
+            'momentum': spx / ma125,
+            # 2. Strength: NYA position in its 52-week range (proxy for net new highs)
+            'strength': strength,
+            # 3. Breadth: VIX 5-day change (proxy; rising VIX = fear)
+            'breadth': vix.diff(5),
+            # 4. Options: VIX level (put/call proxy)
+            'options': vix,
+            # 5. Volatility: VIX deviation from its 50-day MA
+            'volatility': (vix - vix_ma50) / vix_ma50,
+            # 6. Safe Haven: 20-day stock minus bond return
+            'safe_haven': stock_vs_bond,
+            # 7. Junk Bond Demand: JNK / IEF price ratio
+            'junk_bond': junk_ratio,
+            'momentum_pct': (spx - ma125) / ma125 * 100,
+            'strength_pct': strength * 100,
+            'volatility_gap': vix - vix_ma50,
+            'safe_haven_pct': stock_vs_bond * 100,
+            'junk_bond_gap': (junk_ratio - junk_ma) / junk_ma * 100,
+        })
+        return self._metrics
+
+    def signed_metrics(self):
+        """Z-score metrics per component, negated for the inverted ones (higher = greed)."""
+        sign = np.where(np.isin(COMPONENTS, INVERTED), -1.0, 1.0)
+        return self.metrics()[list(COMPONENTS)] * sign
+
+    def components(self, lookback=125, scale=20, normalization='zscore'):
+        """DataFrame with one 0..100 column per component (COMPONENTS order)."""
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(f"Unknown normalization: {normalization} (use one of {NORMALIZATIONS})")
+        if normalization == 'zscore':
+            return zscore_scale(self.signed_metrics(), lookback, scale)
+        m = self.metrics()
+        out = {}
+        for name in COMPONENTS:
+            metric, low, high = FIXED_RANGES[name]
+            score = m[metric] if low is None else fixed_scale(m[metric], low, high)
+            out[name] = 100 - score if name in INVERTED else score
+        return pd.DataFrame(out)
+
+    def index(self, components=None, weights=None):
+        """Composite index: equal-weight mean of the components (or a weighted sum)."""
+        comps = self.components() if components is None else components
+        if weights is None:
+            return comps.mean(axis=1)
+        return comps[list(COMPONENTS)] @ np.asarray(weights, dtype=float)
+
+
+# --- Persisted daily history ---
+
+HISTORY_WARMUP = 252  # longest metric window (52-week range)
+HISTORY_PERIOD = "5y"
+HISTORY_DECIMALS = 2
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _history_frame(payload):
+    index = pd.to_datetime(payload['dates'])
+    frame = pd.DataFrame(payload['components'], index=index)[list(COMPONENTS)]
+    frame['FGI'] = payload['fgi']
+    return frame
+
+
+def _state_closes(state):
+    return pd.DataFrame(state['closes'], index=pd.to_datetime(state['dates']))[list(TICKERS)]
+
+
+def _tail_period(last_date):
+    """Smallest download period covering the bars after last_date (None: too old, backfill)."""
+    gap = (pd.Timestamp.now().normalize() - last_date).days + 7
+    for period in ("1mo", "3mo", "6mo", "1y"):
+        if gap <= PERIOD_DAYS[period]:
+            return period
+    return None
+
+
+def _score_frame(closes, lookback, scale):
+    engine = FearGreedEngine(pd.concat({'Close': closes}, axis=1))
+    comps = engine.components(lookback, scale)
+    comps['FGI'] = engine.index(comps)
+    return comps.dropna()
+
+
+def update_history(history_path, state_path, lookback=125, scale=20, backfill=False, **load_kwargs):
+    """
+    Extend the persisted daily history (components + FGI) and return it.
+    The state file keeps the last HISTORY_WARMUP + lookback closes, exactly
+    the rows the rolling windows need, so a daily run only scores the new
+    bars. backfill=True (or missing / mismatched state) rebuilds the whole
+    history from a HISTORY_PERIOD panel in one pass.
+    保存每日歷史；平時只以狀態檔（滾動視窗所需的收盤價尾端）計算新交易日，
+    backfill 時一次向量化重建完整歷史。
+    """
+    params = {'lookback': lookback, 'scale': scale, 'normalization': 'zscore'}
+    payload, state = _read_json(history_path), _read_json(state_path)
+    usable = (payload is not None and state is not None and payload.get('metadata', {}).get('params') == params
+              and payload['dates'] and state['dates'] and payload['dates'][-1] == state['dates'][-1])
+    period = _tail_period(pd.Timestamp(state['dates'][-1])) if usable and not backfill else None
+
+    if period is None:
+        closes = load_panel(HISTORY_PERIOD, **load_kwargs)['Close'][list(TICKERS)]
+        history = _score_frame(closes, lookback, scale).round(HISTORY_DECIMALS)
+    else:
+        history = _history_frame(payload)
+        prior = _state_closes(state)
+        fresh = load_panel(period, **load_kwargs)['Close'][list(TICKERS)]
+        fresh = fresh[fresh.index > prior.index[-1]]
+        closes = pd.concat([prior, fresh]).ffill()
+        new_rows = _score_frame(closes, lookback, scale).round(HISTORY_DECIMALS)
+        history = pd.concat([history, new_rows[new_rows.index > history.index[-1]]])
+
+    tail = closes[closes.index <= history.index[-1]].iloc[-(HISTORY_WARMUP + lookback):]
+    dates = [d.strftime('%Y-%m-%d') for d in history.index]
+    _write_json_atomic(history_path, {
+        'dates': dates,
+        'fgi': history['FGI'].tolist(),
+        'components': {c: history[c].tolist() for c in COMPONENTS},
+        'metadata': {'params': params, 'rows': len(history), 'generated': pd.Timestamp.now(tz='UTC').isoformat()},
+    })
+    _write_json_atomic(state_path, {
+        'dates': [d.strftime('%Y-%m-%d') for d in tail.index],
+        'closes': {t: tail[t].tolist() for t in TICKERS},
+    })
+    return history
@@ -0,0 +1,125 @@
+"""
+Fear & Greed Parameter Tuning (Broadcast Grid Search)
+恐懼與貪婪指數參數調校（廣播網格搜尋）
+
+Scoring a (lookback, scale) pair against a truth table only needs the index
+on the truth dates. RollingMoments keeps one set of cumulative sums (and
+squares) of the signed component metrics, so the rolling mean / std for any
+lookback at any row is two lookups: a whole lookback x truth-date x
+component block costs O(lookbacks x dates), independent of the series
+length. Scales then broadcast over that block, so a dense grid of thousands
+of combinations is a few array operations.
+以累積和一次預先計算，任何 lookback 在任一日期的滾動平均 / 標準差都是兩次查表；
+scale 以廣播方式同時評估，數千組參數組合數秒內完成。
+
+Semantics follow FearGreedEngine.components (pandas rolling, ddof=1, std 0
+-> NaN, 50 + z * scale clipped to 0..100, FGI = mean of the available
+components) and the tuners' error: mean |FGI - target| over truth dates with
+a value, evaluated at the nearest trading day; 999 when none has one.
+
+Usage:
+    rows, targets = truth_rows(engine.closes.index, TRUTH_TABLE)
+    errors = zscore_grid(engine.signed_metrics(), rows, targets, range(20, 505, 5), np.arange(5, 50.5, 0.5))
+    best_lookback, best_scale = errors.stack().idxmin()
+"""
+
+import numpy as np
+import pandas as pd
+
+NO_MATCH_ERROR = 999.0
+DEFAULT_CELLS = 4_000_000  # float64 cells per broadcast chunk (~32 MB)
+
+
+def truth_rows(index, truth_table):
+    """Positions of the nearest trading day for each truth date, plus the targets."""
+    dates = pd.DatetimeIndex(pd.to_datetime(list(truth_table)))
+    rows = pd.DatetimeIndex(index).get_indexer(dates, method='nearest')
+    return rows, np.asarray(list(truth_table.values()), dtype=float)
+
+
+class RollingMoments:
+    """
+    Rolling mean and sample std (ddof=1) of every column, for any rows and
+    lookbacks, from cumulative sums built once. Columns are centered first
+    to limit cancellation; windows containing a NaN are NaN.
+    """
+    def __init__(self, values):
+        x = np.asarray(values, dtype=float)
+        self.values = x
+        missing = np.isnan(x)
+        with np.errstate(invalid='ignore'):
+            counts = (~missing).sum(axis=0)
+            self.center = np.where(counts > 0, np.where(missing, 0.0, x).sum(axis=0) / np.maximum(counts, 1), 0.0)
+        xc = np.where(missing, 0.0, x - self.center)
+        zero = np.zeros((1,) + x.shape[1:])
+        self.s1 = np.concatenate([zero, np.cumsum(xc, axis=0)])
+        self.s2 = np.concatenate([zero, np.cumsum(xc * xc, axis=0)])
+        self.gaps = np.concatenate([zero, np.cumsum(missing, axis=0)])
+
+    def at(self, rows, lookbacks):
+        """(mean, std), each lookbacks x rows x columns."""
+        rows = np.asarray(rows)
+        window = np.asarray(lookbacks, dtype=np.int64)[:, None]
+        lo = rows[None, :] + 1 - window
+        valid = lo >= 0
+        lo = np.maximum(lo, 0)
+        hi = rows + 1
+        w = window[:, :, None].astype(float)
+        s1 = self.s1[hi][None] - self.s1[lo]
+        s2 = self.s2[hi][None] - self.s2[lo]
+        gaps = self.gaps[hi][None] - self.gaps[lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            var = np.maximum(s2 - s1 * s1 / w, 0.0) / (w - 1)
+        bad = ~valid[:, :, None] | (gaps > 0)
+        mean = np.where(bad, np.nan, s1 / w + self.center)
+        std = np.where(bad, np.nan, np.sqrt(var))
+        return mean, std
+
+
+def zscore_grid(signed_metrics, rows, targets, lookbacks, scales, max_cells=DEFAULT_CELLS):
+    """
+    Mean absolute error of the z-score FGI for every (lookback, scale) pair
+    (DataFrame: lookbacks x scales). signed_metrics: dates x components with
+    inverted components already negated (FearGreedEngine.signed_metrics()).
+    """
+    lookbacks = np.asarray(list(lookbacks), dtype=np.int64)
+    scales = np.asarray(list(scales), dtype=float)
+    rows = np.asarray(rows)
+    targets = np.asarray(targets, dtype=float)
+    moments = RollingMoments(signed_metrics)
+    x = moments.values[rows]
+    per_lookback = len(scales) * x.size
+    step = max(1, max_cells // max(per_lookback, 1))
+
+    errors = np.empty((len(lookbacks), len(scales)))
+    for lo in range(0, len(lookbacks), step):
+        chunk = lookbacks[lo:lo + step]
+        mean, std = moments.at(rows, chunk)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z = (x[None] - mean) / np.where(std > 0, std, np.nan)
+        # chunk x scales x dates x components
+        score = np.clip(50 + z[:, None] * scales[None, :, None, None], 0, 100)
+        present = ~np.isnan(score)
+        n = present.sum(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fgi = np.where(present, score, 0.0).sum(axis=-1) / n
+        err = np.abs(fgi - targets)
+        hit = n > 0
+        count = hit.sum(axis=-1)
+        total = np.where(hit, err, 0.0).sum(axis=-1)
+        errors[lo:lo + step] = np.where(count > 0, total / np.maximum(count, 1), NO_MATCH_ERROR)
+    return pd.DataFrame(errors, index=pd.Index(lookbacks, name='lookback'), columns=pd.Index(scales, name='scale'))
+
+
+def weight_mse(components, targets, weights):
+    """
+    MSE of the weighted composite (weights normalized to sum 1) against the
+    targets. weights: one vector (-> float) or a batch of rows (-> array).
+    """
+    w = np.asarray(weights, dtype=float)
+    w = w / w.sum(axis=-1, keepdims=True)
+    y = np.asarray(targets, dtype=float)
+    preds = np.asarray(components, dtype=float) @ w.T
+    resid = preds - (y[:, None] if w.ndim == 2 else y)
+    mse = (resid ** 2).mean(axis=0)
+    return float(mse) if w.ndim == 1 else mse
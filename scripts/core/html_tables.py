@@ -0,0 +1,149 @@
+"""
+HTML Table Extraction (lxml Fast Path, html.parser Fallback)
+HTML 表格擷取（lxml 快速路徑，html.parser 備援）
+
+The Dataroma pages are big tables (#grid, #t1, #sum), and building a full
+BeautifulSoup tree with the pure-Python html.parser dominated parse time (a
+p_hist.php page with 20 quarters x dozens of holdings is ~350 KB).
+extract_tables() pulls just the requested tables by id into plain
+Table / Row / Cell records: with lxml installed the page is parsed by
+lxml.html (C) and the tables walked directly; without it, BeautifulSoup's
+html.parser builds the tree and the same records come out. Page parsers only
+see the records, so their output does not depend on the backend.
+只擷取指定 id 的表格為 Table / Row / Cell 紀錄；有 lxml 時以 C 實作解析，
+否則退回 html.parser，兩者輸出相同。
+
+Records mirror what the parsers used from bs4: row / cell text (.text of
+the element), class lists, and the <a> links (href, text) inside a cell.
+Rows and cells are found recursively like find_all('tr') / find_all('td').
+
+Usage:
+    tables = extract_tables(html, ('grid', 't1'))
+    for row in tables['grid'].body:
+        ticker = row.cells[1].link.text
+"""
+
+from collections import namedtuple
+from dataclasses import dataclass, field
+from typing import List
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    import lxml.etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+BACKENDS = ('lxml', 'html.parser')
+DEFAULT_BACKEND = 'lxml' if HAS_LXML else 'html.parser'
+
+Link = namedtuple('Link', ['href', 'text'])  # href is None for an <a> without one
+
+
+@dataclass
+class Cell:
+    text: str
+    classes: List[str] = field(default_factory=list)
+    links: List[Link] = field(default_factory=list)
+
+    @property
+    def link(self):
+        """First <a> in the cell, or None."""
+        return self.links[0] if self.links else None
+
+
+@dataclass
+class Row:
+    text: str
+    classes: List[str] = field(default_factory=list)
+    cells: List[Cell] = field(default_factory=list)  # <td> only, like find_all('td')
+    in_body: bool = False                            # inside the table's first <tbody>
+
+
+@dataclass
+class Table:
+    rows: List[Row]
+
+    @property
+    def body(self):
+        """Rows of the first <tbody> (empty when the table has none)."""
+        return [row for row in self.rows if row.in_body]
+
+
+def _resolve(backend):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML backend: {backend} (use one of {BACKENDS})")
+    if backend == 'lxml' and not HAS_LXML:
+        raise ImportError("lxml is not installed; use backend='html.parser'")
+    return backend
+
+
+def make_soup(html, backend=None):
+    """Full BeautifulSoup tree with the fastest available tree builder."""
+    return BeautifulSoup(html, _resolve(backend))
+
+
+# --- lxml backend ---
+
+def _lxml_classes(el):
+    return el.get('class', '').split()
+
+
+def _lxml_table(table):
+    tbody = next(table.iter('tbody'), None)
+    body = set(tbody.iter('tr')) if tbody is not None else set()
+    rows = []
+    for tr in table.iter('tr'):
+        cells = [Cell(td.text_content(), _lxml_classes(td),
+                      [Link(a.get('href'), a.text_content()) for a in td.iter('a')])
+                 for td in tr.iter('td')]
+        rows.append(Row(tr.text_content(), _lxml_classes(tr), cells, tr in body))
+    return Table(rows)
+
+
+def _extract_lxml(html, ids):
+    try:
+        root = lxml.html.fromstring(html)
+    except (lxml.etree.ParserError, ValueError):
+        return {}
+    tables = {}
+    for table in root.iter('table'):
+        table_id = table.get('id')
+        if table_id in ids and table_id not in tables:
+            tables[table_id] = _lxml_table(table)
+    return tables
+
+
+# --- html.parser backend ---
+
+def _soup_table(table):
+    tbody = table.find('tbody')
+    body = set(map(id, tbody.find_all('tr'))) if tbody else set()
+    rows = []
+    for tr in table.find_all('tr'):
+        cells = [Cell(td.text, td.get('class', []),
+                      [Link(a.get('href'), a.text) for a in td.find_all('a')])
+                 for td in tr.find_all('td')]
+        rows.append(Row(tr.text, tr.get('class', []), cells, id(tr) in body))
+    return Table(rows)
+
+
+def _extract_soup(html, ids):
+    soup = BeautifulSoup(html, 'html.parser')
+    tables = {}
+    for table_id in ids:
+        table = soup.find('table', id=table_id)
+        if table:
+            tables[table_id] = _soup_table(table)
+    return tables
+
+
+def extract_tables(html, ids, backend=None):
+    """{table id: Table} for the first table with each id that is on the page."""
+    ids = (ids,) if isinstance(ids, str) else tuple(ids)
+    if _resolve(backend) == 'lxml':
+        return _extract_lxml(html, ids)
+    return _extract_soup(html, ids)
@@ -0,0 +1,235 @@
+"""
+Indicator Planner (Dependency-Declared Indicators)
+指標規劃器（宣告式指標依賴）
+
+Strategy engines declare the indicators they need as named IndicatorSpec
+objects instead of writing ad-hoc columns into the caller's frame. An
+IndicatorContext computes each distinct spec at most once per symbol and hands
+the same Series to every engine that asked for it, so running V5 and V1 on one
+symbol costs barely more than running one of them.
+策略引擎以具名的 IndicatorSpec 宣告所需指標，不再直接寫入呼叫端的 DataFrame。
+IndicatorContext 對每個標的的每個指標只計算一次，並在引擎間共享結果。
+
+Usage:
+    ctx = IndicatorContext(df)
+    frames = IndicatorPlanner().prepare(df, [qs.v5, qs.v1], ctx)
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    """
+    A named indicator with its parameters. Hashable, so equal specs dedupe.
+    具名指標與其參數；可雜湊，相同規格自動去重。
+    """
+    name: str
+    params: tuple = ()
+
+    def __repr__(self):
+        args = ", ".join(f"{k}={v!r}" for k, v in self.params)
+        return f"{self.name}({args})"
+
+
+def spec(name, **params):
+    """Build an IndicatorSpec with canonically ordered params."""
+    return IndicatorSpec(name, tuple(sorted(params.items())))
+
+
+# --- Registry ---
+# name -> fn(ctx, **params) -> pd.Series
+_REGISTRY = {}
+
+
+def register_indicator(name):
+    """Decorator registering a compute function for an indicator name."""
+    def wrap(fn):
+        _REGISTRY[name] = fn
+        return fn
+    return wrap
+
+
+def registered_indicators():
+    return sorted(_REGISTRY)
+
+
+def _indicators():
+    # Lazy import: strategy_selector imports this module for its engines.
+    # 延遲匯入，避免與 strategy_selector 循環匯入。
+    from scripts.core.strategy_selector import Indicators
+    return Indicators
+
+
+class IndicatorContext:
+    """
+    Per-symbol memo of computed indicators. Never mutates the source frame.
+    單一標的的指標快取，不會修改原始 DataFrame。
+    """
+    def __init__(self, df):
+        self.frame = df
+        self._cache = {}
+        self.computed = 0  # distinct specs actually evaluated
+
+    def column(self, field):
+        return self.frame[field]
+
+    def get(self, ind_spec):
+        if ind_spec in self._cache:
+            return self._cache[ind_spec]
+        fn = _REGISTRY.get(ind_spec.name)
+        if fn is None:
+            raise KeyError(f"Unknown indicator: {ind_spec.name}")
+        series = fn(self, **dict(ind_spec.params))
+        self._cache[ind_spec] = series
+        self.computed += 1
+        return series
+
+    def compute(self, specs):
+        return {s: self.get(s) for s in specs}
+
+    def __contains__(self, ind_spec):
+        return ind_spec in self._cache
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class IndicatorPlanner:
+    """
+    Resolves the deduplicated union of engine requirements and prepares
+    one view per engine from a shared IndicatorContext.
+    合併多個引擎的指標需求（去重），並由共享的 context 產生各引擎的資料視圖。
+    """
+    @staticmethod
+    def plan(engines):
+        seen = {}
+        for engine in engines:
+            for ind_spec in getattr(engine, 'requires', {}).values():
+                seen.setdefault(ind_spec, None)
+        return list(seen)
+
+    def context(self, df):
+        return IndicatorContext(df)
+
+    def prepare(self, df, engines, ctx=None):
+        ctx = ctx if ctx is not None else self.context(df)
+        ctx.compute(self.plan(engines))
+        return {engine.name: engine.prepare(df, ctx) for engine in engines}
+
+
+def attach(df, requires, ctx=None, dtype=None):
+    """
+    Return a new frame with the required indicator columns added.
+    Indicators are always computed in float64; pass dtype=np.float32 to store
+    the attached columns compactly (the cached float64 Series are untouched).
+    回傳加入所需指標欄位的新 DataFrame（原 DataFrame 不變）。
+    指標一律以 float64 計算，dtype 僅影響輸出欄位的儲存型別。
+    """
+    ctx = ctx if ctx is not None else IndicatorContext(df)
+    if dtype is None:
+        return df.assign(**{col: ctx.get(s) for col, s in requires.items()})
+    return df.assign(**{col: ctx.get(s).astype(dtype) for col, s in requires.items()})
+
+
+# --- Built-in Indicators ---
+
+@register_indicator('sma')
+def _sma(ctx, period, field='close'):
+    return ctx.column(field).rolling(period).mean()
+
+
+@register_indicator('rolling_std')
+def _rolling_std(ctx, period, field='close'):
+    return ctx.column(field).rolling(period).std()
+
+
+@register_indicator('rolling_max')
+def _rolling_max(ctx, period, field='high'):
+    return ctx.column(field).rolling(period).max()
+
+
+@register_indicator('bb_upper')
+def _bb_upper(ctx, period=20, num_std=2):
+    return ctx.get(spec('sma', period=period)) + num_std * ctx.get(spec('rolling_std', period=period))
+
+
+@register_indicator('bb_lower')
+def _bb_lower(ctx, period=20, num_std=2):
+    return ctx.get(spec('sma', period=period)) - num_std * ctx.get(spec('rolling_std', period=period))
+
+
+@register_indicator('bb_width')
+def _bb_width(ctx, period=20, num_std=2, zero_guard=True):
+    # zero_guard mirrors Indicators.bollinger_bands (sma==0 -> 1); research
+    # scripts historically divided by the raw SMA.
+    sma = ctx.get(spec('sma', period=period))
+    upper = ctx.get(spec('bb_upper', period=period, num_std=num_std))
+    lower = ctx.get(spec('bb_lower', period=period, num_std=num_std))
+    return (upper - lower) / (sma.replace(0, 1) if zero_guard else sma)
+
+
+@register_indicator('rolling_rank')
+def _rolling_rank(ctx, source, window):
+    return ctx.get(source).rolling(window).rank(pct=True)
+
+
+@register_indicator('rolling_zscore')
+def _rolling_zscore(ctx, source, window):
+    s = ctx.get(source)
+    return (s - s.rolling(window).mean()) / s.rolling(window).std()
+
+
+@register_indicator('atr')
+def _atr(ctx, period=14):
+    df = ctx.frame
+    return _indicators().atr(df['high'], df['low'], df['close'], period)
+
+
+@register_indicator('stoch_rsi_k')
+def _stoch_rsi_k(ctx, period=14, k=3, d=3):
+    return _indicators().stoch_rsi(ctx.column('close'), period, k, d)[0]
+
+
+@register_indicator('mcginley')
+def _mcginley(ctx, period=14):
+    return _indicators().mcginley_dynamic(ctx.column('close'), period)
+
+
+@register_indicator('kinetic_mcginley')
+def _kinetic_mcginley(ctx, period=20):
+    # McGinley variant used by the Kinetic model (k = period, floor 0.001).
+    # Kinetic 模型使用的 McGinley 版本。
+    close = ctx.column('close')
+    values = close.values.astype(float)
+    md = np.zeros_like(values)
+    if len(values) == 0:
+        return pd.Series(md, index=close.index)
+    md[0] = values[0]
+    k = float(period)
+    for i in range(1, len(values)):
+        prev = md[i-1]
+        if prev == 0: prev = 1e-9
+        ratio = max(values[i] / prev, 0.001)
+        md[i] = prev + (values[i] - prev) / (k * (ratio ** 4))
+    return pd.Series(md, index=close.index)
+
+
+@register_indicator('stoch_rsi')
+def _stoch_rsi(ctx, period=14):
+    # Normalized (0..1) Stochastic RSI, neutral 0.5 during warm-up.
+    # 正規化 (0..1) 的隨機 RSI，暖機期填 0.5。
+    close = ctx.column('close')
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    loss = loss.replace(0, 1e-9)
+    rs = gain / loss
+    rsi = 100 - (100 / (1 + rs))
+    min_rsi = rsi.rolling(window=period).min()
+    max_rsi = rsi.rolling(window=period).max()
+    stoch = (rsi - min_rsi) / (max_rsi - min_rsi).replace(0, 1e-9)
+    return stoch.fillna(0.5)
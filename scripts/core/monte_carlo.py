@@ -0,0 +1,168 @@
+"""
+Monte Carlo Equity Paths (Block-Resampled Portfolio Returns)
+蒙地卡羅權益路徑（區塊重抽投組報酬）
+
+Stress-tests a portfolio beyond its single historical path. A kernel run
+(run_portfolio) is decomposed into an aligned D x S contribution panel: the
+dollar P&L of the shares each symbol held into day t over the previous day's
+equity. Its row sums rebuild the historical equity curve exactly, so the
+portfolio rules (entries, exits, sizing, idle cash) are baked into every day.
+Date blocks of that panel are resampled (bootstrap_stats.resample_indices:
+block / circular / stationary) into a paths x days return matrix, keeping
+volatility clustering and cross-symbol correlation within a block.
+將投組的每日損益拆成 日期 x 標的 貢獻矩陣（加總即為歷史權益曲線），再以區塊
+重抽日期產生 路徑 x 天數 的報酬矩陣，保留區塊內的波動聚集與標的間相關性。
+
+Regime conditioning: pass a per-day regime label and `condition` to draw
+blocks only from days in that regime (e.g. SPY below its MA200). Conditioned
+days are concatenated before resampling, so a block may straddle two
+separate stretches of the same regime.
+
+Per path: CAGR, max drawdown, longest time under water (days from a peak to
+the recovery, or to the end when it never recovers) and the share of days
+spent under water. Chunks of paths run on worker processes, each chunk with
+its own SeedSequence.spawn stream (identical results for any worker count).
+
+Usage:
+    daily = portfolio_returns(panel, result, INITIAL_CAPITAL)
+    mc = run_monte_carlo(daily, 5000, horizon=252 * 5, block_size=20, seed=7, workers=4)
+    table = summarize(mc.stats)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from scripts.core.bootstrap_stats import METHODS, PERIODS_PER_YEAR, resample_indices
+
+DEFAULT_CHUNK = 1000  # paths per seeded chunk
+PERCENTILES = (5, 25, 50, 75, 95)
+STAT_LABELS = {
+    'cagr': "CAGR",
+    'max_drawdown': "Max Drawdown",
+    'max_underwater': "Longest Under Water (days)",
+    'underwater_share': "Time Under Water",
+    'final': "Final Equity Multiple",
+}
+
+
+# --- Historical decomposition ---
+
+def held_shares(panel, result):
+    """D x S shares held into each day (bought on day e, sold on day x -> held into e+1 .. x)."""
+    n_days, n_syms = panel.close.shape
+    diff = np.zeros((n_days + 1, n_syms))
+    for s, e, x, entry_px, _, size, _, _ in result.trades:
+        diff[e + 1, s] += size / entry_px
+        diff[x + 1, s] -= size / entry_px
+    index = {sym: j for j, sym in enumerate(panel.symbols)}
+    for sym, p in result.positions.items():
+        diff[panel.dates.get_loc(p['entry_date']) + 1, index[sym]] += p['shares']
+    return np.cumsum(diff[:n_days], axis=0)
+
+
+def contribution_panel(panel, result, initial_capital):
+    """
+    D x S daily return contributions: held shares x change in the valuation
+    close over the previous day's equity (day 0 against initial_capital).
+    """
+    price_change = np.diff(panel.last_close, axis=0, prepend=panel.last_close[:1])
+    prev_equity = np.concatenate([[initial_capital], result.equity[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = held_shares(panel, result) * price_change / prev_equity[:, None]
+    return np.nan_to_num(out, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def portfolio_returns(panel, result, initial_capital):
+    """Daily portfolio returns; (1 + r).cumprod() * initial_capital == result.equity."""
+    return contribution_panel(panel, result, initial_capital).sum(axis=1)
+
+
+# --- Path statistics (row-wise on a paths x days return matrix) ---
+
+def path_stats(path_returns, periods=PERIODS_PER_YEAR):
+    """{stat: array(paths)} for a paths x days matrix of daily returns."""
+    n_paths, horizon = path_returns.shape
+    equity = np.concatenate([np.ones((n_paths, 1)), np.cumprod(1 + path_returns, axis=1)], axis=1)
+    peak = np.maximum.accumulate(equity, axis=1)
+    under = equity < peak
+    # Days since the last peak; the longest run is the worst time under water
+    pos = np.arange(horizon + 1)
+    last_peak = np.maximum.accumulate(np.where(under, 0, pos), axis=1)
+    final = equity[:, -1]
+    with np.errstate(invalid='ignore'):
+        cagr = np.where(final > 0, np.power(np.maximum(final, 0), periods / horizon) - 1, -1.0)
+    return {
+        'cagr': cagr,
+        'max_drawdown': ((equity - peak) / peak).min(axis=1),
+        'max_underwater': (pos - last_peak).max(axis=1),
+        'underwater_share': under[:, 1:].mean(axis=1),
+        'final': final,
+    }
+
+
+def _stats_chunk(task):
+    returns, n_paths, horizon, method, block_size, seed_seq, periods = task
+    rng = np.random.default_rng(seed_seq)
+    idx = resample_indices(rng, n_paths, len(returns), method, block_size)
+    # Paths longer than the history continue with further draws
+    while idx.shape[1] < horizon:
+        idx = np.concatenate([idx, resample_indices(rng, n_paths, len(returns), method, block_size)], axis=1)
+    return path_stats(returns[idx[:, :horizon]], periods)
+
+
+@dataclass
+class MonteCarloResult:
+    stats: dict       # {stat: array(paths)}
+    paths: int
+    horizon: int      # days per path
+    method: str
+    block_size: int
+    condition: object = None
+
+
+def run_monte_carlo(returns, n_paths, horizon=None, method='stationary', block_size=20, seed=None,
+                    workers=1, chunk=DEFAULT_CHUNK, regimes=None, condition=None, periods=PERIODS_PER_YEAR):
+    """
+    Simulate n_paths block-resampled paths of `horizon` days (default: the
+    history length). returns: 1-D daily portfolio returns or a D x S
+    contribution panel (summed per day). regimes/condition: resample only the
+    days whose regime label equals condition.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown resampling method: {method} (use one of {METHODS})")
+    x = np.asarray(returns, dtype=float)
+    if x.ndim == 2:
+        x = x.sum(axis=1)
+    if condition is not None:
+        x = x[np.asarray(regimes) == condition]
+    if len(x) == 0:
+        raise ValueError("No days to resample" + ("" if condition is None else f" for regime {condition!r}"))
+    horizon = horizon or len(x)
+
+    n_chunks = max(1, -(-n_paths // chunk))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    tasks = [(x, min(chunk, n_paths - i * chunk), horizon, method, block_size, seeds[i], periods)
+             for i in range(n_chunks)]
+    workers = max(1, min(workers or os.cpu_count() or 1, n_chunks))
+    if workers == 1:
+        parts = [_stats_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_stats_chunk, tasks))
+    stats = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    return MonteCarloResult(stats, n_paths, horizon, method, block_size, condition)
+
+
+def summarize(stats, percentiles=PERCENTILES):
+    """Percentile table: one row per statistic, one column per percentile (plus the mean)."""
+    rows = []
+    for key, label in STAT_LABELS.items():
+        values = stats[key]
+        row = {'Metric': label, 'Mean': float(np.mean(values))}
+        row.update({f"P{p}": float(np.percentile(values, p)) for p in percentiles})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('Metric')
@@ -0,0 +1,284 @@
+"""
+Portfolio Kernel (Array-Based Event Loop)
+投資組合核心（陣列化事件迴圈）
+
+Runs a daily portfolio simulation on date x symbol matrices aligned to one
+calendar instead of per-day DataFrame .loc lookups. Positions, cash, stops and
+entry dates live in flat per-symbol arrays; the only Python-level work per day
+is over the (at most max_positions) open positions and that day's candidates.
+以對齊到同一交易日曆的 日期 x 標的 矩陣執行每日模擬，取代逐日 .loc 查詢；
+部位、現金、停損與進場日皆以扁平陣列保存。
+
+Semantics (shared by PortfolioManager and simulate_portfolio_v6):
+  1. Sells first: open positions are checked in entry order (or symbol order
+     for pre-computed sell signals) and credited to cash.
+  2. Mark-to-market (after sells or after buys, see PortfolioConfig.mark_after):
+     one dot product of held shares against the forward-filled close matrix.
+     A held symbol without a fresh bar is valued at its last known close and
+     the day is flagged stale (PortfolioResult.stale) instead of guessed.
+  3. Buys: candidates in symbol order (optionally shuffled), capped by
+     max_positions, sized by a fixed slot or a percentage of equity.
+
+Usage:
+    panel = MarketPanel.from_frames(frames, calendar, entry_col='signal_tech')
+    result = run_portfolio(panel, PortfolioConfig(sizing='percent'))
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 86_400_000_000_000
+
+# Exit rule per symbol
+EXIT_SIGNAL, EXIT_V5, EXIT_V1 = 0, 1, 2
+STRATEGY_EXITS = {"V5": EXIT_V5, "V1": EXIT_V1}
+
+# Exit reasons (trade log)
+REASON_SIGNAL, REASON_STOP, REASON_TIME, REASON_CLIMAX, REASON_TARGET = 1, 2, 3, 4, 5
+REASON_NAMES = {
+    REASON_SIGNAL: "Signal",
+    REASON_STOP: "Loss (Stop)",
+    REASON_TIME: "Stagnation (Time)",
+    REASON_CLIMAX: "Profit (Climax)",
+    REASON_TARGET: "Profit (Target)",
+}
+
+
+@dataclass
+class PortfolioConfig:
+    initial_capital: float = 100000.0
+    max_positions: int = 10
+    # Sizing: 'fixed' = slot_size per trade while cash >= slot_size;
+    # 'percent' = pos_size_pct of equity (capped by cash), stop below `dust`,
+    # and skip the day when cash < equity * pos_size_pct * cash_gate.
+    sizing: str = 'fixed'
+    slot_size: float = 10000.0
+    pos_size_pct: float = 0.10
+    cash_gate: float = 0.9
+    dust: float = 1000.0
+    shuffle: bool = False
+    mark_after: str = 'buys'      # 'sells' | 'buys'
+    sell_order: str = 'position'  # 'position' (entry order) | 'symbol'
+    # Exit rules (EXIT_V5 / EXIT_V1 symbols)
+    v5_atr_mult: float = 2.0
+    v5_time_days: int = 5
+    v5_time_atr: float = 0.5
+    v1_stop: float = 0.05
+    v1_target: float = 0.10
+    v1_time_days: int = 10
+
+
+def epoch_ns(dates):
+    """int64 nanoseconds for any datetime-like (independent of the index unit)."""
+    return np.asarray(dates, dtype='datetime64[ns]').view(np.int64)
+
+
+def align_matrix(frames, symbols, calendar, column, dtype=float, fill=np.nan):
+    """Stack one column of per-symbol frames (DatetimeIndex) into a D x S matrix."""
+    out = np.full((len(calendar), len(symbols)), fill, dtype=dtype)
+    for j, sym in enumerate(symbols):
+        df = frames[sym]
+        if column not in df.columns:
+            continue
+        pos = calendar.get_indexer(df.index)
+        hit = pos >= 0
+        out[pos[hit], j] = df[column].to_numpy()[hit]
+    return out
+
+
+@dataclass
+class MarketPanel:
+    """
+    Aligned inputs for run_portfolio. All matrices are D x S on `dates`.
+    avail: symbol has a bar that day; entry: buy candidate; exit: sell signal
+    (EXIT_SIGNAL) or climax flag (EXIT_V5). last_close / fresh are derived
+    once for valuation (forward-filled close, 0 before the first bar).
+    """
+    dates: pd.DatetimeIndex
+    symbols: list
+    close: np.ndarray
+    avail: np.ndarray
+    entry: np.ndarray
+    exit: np.ndarray
+    atr: np.ndarray
+    strategy: np.ndarray
+    last_close: np.ndarray = None
+    fresh: np.ndarray = None
+
+    def __post_init__(self):
+        if self.fresh is None:
+            self.fresh = self.avail & ~np.isnan(self.close)
+        if self.last_close is None:
+            px = pd.DataFrame(np.where(self.fresh, self.close, np.nan)).ffill()
+            self.last_close = px.fillna(0.0).to_numpy()
+
+    @classmethod
+    def from_frames(cls, frames, calendar, entry_col=None, exit_col=None, atr_col='atr', strategy=None):
+        """
+        Build a panel from {symbol: DataFrame indexed by date}.
+        strategy: {symbol: EXIT_*} (default EXIT_SIGNAL for all).
+        """
+        symbols = list(frames)
+        calendar = pd.DatetimeIndex(calendar)
+        shape = (len(calendar), len(symbols))
+        avail = np.zeros(shape, dtype=bool)
+        for j, sym in enumerate(symbols):  # bar present that day (even if NaN)
+            avail[:, j] = calendar.isin(frames[sym].index)
+        close = align_matrix(frames, symbols, calendar, 'close')
+        flag = lambda col: (align_matrix(frames, symbols, calendar, col, dtype=bool, fill=False)
+                            if col else np.zeros(shape, bool))
+        strategy = strategy or {}
+        return cls(
+            dates=calendar,
+            symbols=symbols,
+            close=close,
+            avail=avail,
+            entry=flag(entry_col),
+            exit=flag(exit_col),
+            atr=align_matrix(frames, symbols, calendar, atr_col),
+            strategy=np.array([strategy.get(s, EXIT_SIGNAL) for s in symbols], dtype=np.int8),
+        )
+
+
+@dataclass
+class PortfolioResult:
+    dates: pd.DatetimeIndex
+    symbols: list
+    equity: np.ndarray
+    stale: np.ndarray  # per day: held positions valued at a stale (forward-filled) close
+    cash: float
+    positions: dict   # {symbol: {'shares', 'entry', 'size', 'entry_date', 'stop'}}
+    trades: list      # (sym_idx, entry_day, exit_day, entry_px, exit_px, size, proceeds, reason)
+
+    def equity_curve(self):
+        return pd.Series(self.equity, index=self.dates, name='equity')
+
+    @property
+    def stale_days(self):
+        return int(np.count_nonzero(self.stale))
+
+    def trades_frame(self):
+        cols = ['Symbol', 'EntryDate', 'ExitDate', 'EntryPrice', 'ExitPrice', 'Size', 'Proceeds', 'Reason']
+        rows = [(self.symbols[s], self.dates[e], self.dates[x], ep, xp, size, proceeds, REASON_NAMES[r])
+                for s, e, x, ep, xp, size, proceeds, r in self.trades]
+        return pd.DataFrame(rows, columns=cols)
+
+
+def run_portfolio(panel, config=None, rng=None):
+    """
+    Simulate the portfolio over panel.dates. rng must provide shuffle()
+    (defaults to the global np.random state, as the legacy simulator did).
+    """
+    cfg = config or PortfolioConfig()
+    rng = rng if rng is not None else np.random
+    close, avail, entry, exit_flag, atr = panel.close, panel.avail, panel.entry, panel.exit, panel.atr
+    last_close, fresh = panel.last_close, panel.fresh
+    strategy = panel.strategy
+    day_ns = epoch_ns(panel.dates)
+    n_days, n_syms = close.shape
+
+    held = np.zeros(n_syms, dtype=bool)
+    shares = np.zeros(n_syms)
+    entry_px = np.zeros(n_syms)
+    size = np.zeros(n_syms)
+    stop = np.zeros(n_syms)
+    entry_day = np.zeros(n_syms, dtype=np.int64)
+    order = []  # held symbol indices in entry order
+    trades = []
+    equity = np.zeros(n_days)
+    stale = np.zeros(n_days, dtype=np.int32)
+
+    cash = float(cfg.initial_capital)
+    percent = cfg.sizing == 'percent'
+
+    def mark(d):
+        if not order:
+            stale[d] = 0
+            return cash
+        idx = np.array(order)
+        stale[d] = np.count_nonzero(~fresh[d, idx])
+        return cash + float(shares[idx] @ last_close[d, idx])
+
+    for d in range(n_days):
+        # 1. Exits (sell first)
+        if order:
+            exiting = []
+            for s in order:
+                if not avail[d, s]:
+                    continue  # no bar: cannot evaluate or trade
+                px = close[d, s]
+                rule = strategy[s]
+                reason = 0
+                if rule == EXIT_SIGNAL:
+                    if exit_flag[d, s]: reason = REASON_SIGNAL
+                else:
+                    pnl_pct = (px - entry_px[s]) / entry_px[s]
+                    days_held = (day_ns[d] - day_ns[entry_day[s]]) // NS_PER_DAY
+                    if rule == EXIT_V5:
+                        if px < stop[s]: reason = REASON_STOP
+                        elif days_held > cfg.v5_time_days and pnl_pct < (cfg.v5_time_atr * atr[d, s] / px): reason = REASON_TIME
+                        elif exit_flag[d, s]: reason = REASON_CLIMAX
+                    else:
+                        if pnl_pct < -cfg.v1_stop: reason = REASON_STOP
+                        elif pnl_pct > cfg.v1_target: reason = REASON_TARGET
+                        elif days_held > cfg.v1_time_days: reason = REASON_TIME
+                if reason:
+                    exiting.append((s, reason))
+            if exiting:
+                if cfg.sell_order == 'symbol':
+                    exiting.sort()
+                for s, reason in exiting:
+                    px = close[d, s]
+                    proceeds = shares[s] * px
+                    cash += proceeds
+                    held[s] = False
+                    trades.append((s, entry_day[s], d, entry_px[s], px, size[s], proceeds, reason))
+                order = [s for s in order if held[s]]
+
+        portfolio_val = None
+        if cfg.mark_after == 'sells':
+            portfolio_val = equity[d] = mark(d)
+        elif percent:
+            portfolio_val = mark(d)
+
+        # 2. Entries
+        if len(order) < cfg.max_positions and not (percent and cash < portfolio_val * cfg.pos_size_pct * cfg.cash_gate):
+            cands = np.flatnonzero(entry[d] & ~held)
+            if len(cands):
+                cands = cands.tolist()
+                if cfg.shuffle:
+                    rng.shuffle(cands)
+                for s in cands:
+                    if len(order) >= cfg.max_positions:
+                        break
+                    if percent:
+                        target = portfolio_val * cfg.pos_size_pct
+                        if cash < target: target = cash
+                        if target < cfg.dust: break
+                    else:
+                        target = cfg.slot_size
+                        if cash < target: continue
+                    px = close[d, s]
+                    held[s] = True
+                    shares[s] = target / px
+                    entry_px[s] = px
+                    size[s] = target
+                    entry_day[s] = d
+                    rule = strategy[s]
+                    if rule == EXIT_V5: stop[s] = px - (cfg.v5_atr_mult * atr[d, s])
+                    elif rule == EXIT_V1: stop[s] = px * (1 - cfg.v1_stop)
+                    else: stop[s] = 0
+                    order.append(s)
+                    cash -= target
+
+        if cfg.mark_after == 'buys':
+            equity[d] = mark(d)
+
+    positions = {
+        panel.symbols[s]: {'shares': shares[s], 'entry': entry_px[s], 'size': size[s],
+                           'entry_date': panel.dates[entry_day[s]], 'stop': stop[s]}
+        for s in order
+    }
+    return PortfolioResult(panel.dates, panel.symbols, equity, stale, cash, positions, trades)
@@ -7,17 +7,140 @@ from concurrent.futures import ProcessPoolExecutor
 
 sys.path.append(os.getcwd())
 from scripts.core.strategy_selector import QuantSystem, DataProvider, MarketRegime
+from scripts.core.portfolio_kernel import MarketPanel, PortfolioConfig, run_portfolio, epoch_ns, NS_PER_DAY
 
 DATA_DIR = "public/data"
 OUTPUT_REPORT = "docs/PORTFOLIO_SIMULATION_REPORT.md"
 
+# Exit parameters that drive the signal state machine (grouping key for sweeps)
+SIGNAL_PARAMS = ('v1_stop', 'v1_target', 'v1_time_days', 'v5_atr_mult', 'v5_time_days', 'v5_time_atr')
+
+class SignalInputs:
+    """
+    Signal-machine inputs for all routed symbols, stored as flat arrays with
+    per-symbol offsets (rows of symbol j are offsets[j]:offsets[j+1]).
+    所有標的的訊號輸入以扁平陣列加偏移量保存。
+    """
+    FIELDS = ('offsets', 'is_v5', 'day_ns', 'close', 'high', 'atr', 'can_enter', 'climax', 'sym_of_row', 'cal_pos')
+
+    def __init__(self, symbols, **arrays):
+        self.symbols = list(symbols)
+        for name in self.FIELDS:
+            setattr(self, name, arrays.get(name))
+        self.entry_rows = np.flatnonzero(self.can_enter)
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """blocks: [(symbol, is_v5, dates, close, high, atr, can_enter, climax)]"""
+        lengths = [len(b[2]) for b in blocks]
+        cat = lambda k, dtype: np.concatenate([np.asarray(b[k], dtype=dtype) for b in blocks]) if blocks else np.zeros(0, dtype)
+        return cls(
+            [b[0] for b in blocks],
+            offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            is_v5=np.array([b[1] for b in blocks], dtype=bool),
+            day_ns=np.concatenate([epoch_ns(b[2]) for b in blocks]) if blocks else np.zeros(0, np.int64),
+            close=cat(3, float), high=cat(4, float), atr=cat(5, float),
+            can_enter=cat(6, bool), climax=cat(7, bool),
+            sym_of_row=np.repeat(np.arange(len(blocks)), lengths),
+            cal_pos=np.full(sum(lengths), -1, dtype=np.int64),
+        )
+
+    def align(self, calendar):
+        """Map every row to its calendar position (-1 = not a calendar day)."""
+        self.cal_pos = pd.Index(epoch_ns(calendar)).get_indexer(self.day_ns).astype(np.int64)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def date_of(self, row):
+        return pd.Timestamp(self.day_ns[row])
+
+def signal_events(inputs, cfg):
+    """
+    Run the per-symbol signal state machine (path-dependent) with the exit
+    rules in cfg. Jumps straight to the next entry row while flat, so the
+    cost scales with rows spent in a position. Returns (rows, is_buy) in
+    symbol-then-time order.
+      V5: trailing stop (local high - v5_atr_mult * ATR), stagnation after
+          v5_time_days, climax.   V1: -v1_stop / +v1_target / v1_time_days.
+    訊號狀態機：空手時直接跳到下一個進場列，成本只與持有天數相關。
+    """
+    offsets, close, high, atr, climax, day_ns = inputs.offsets, inputs.close, inputs.high, inputs.atr, inputs.climax, inputs.day_ns
+    entry_rows = inputs.entry_rows
+    atr_mult, v5_days, v5_atr = cfg.v5_atr_mult, cfg.v5_time_days, cfg.v5_time_atr
+    v1_stop, v1_target, v1_days = cfg.v1_stop, cfg.v1_target, cfg.v1_time_days
+    rows, is_buy = [], []
+    
+    for j in range(len(inputs.symbols)):
+        hi = offsets[j + 1]
+        is_v5 = inputs.is_v5[j]
+        k = np.searchsorted(entry_rows, offsets[j])
+        i = offsets[j]
+        while k < len(entry_rows) and entry_rows[k] < hi:
+            e = entry_rows[k]
+            if e < i:
+                k = np.searchsorted(entry_rows, i)
+                continue
+            rows.append(e); is_buy.append(True)
+            entry_price = close[e]
+            entry_ns = day_ns[e]
+            local_high = max(entry_price, high[e])
+            i = e + 1
+            sold = False
+            while i < hi:
+                px = close[i]
+                days_held = (day_ns[i] - entry_ns) // NS_PER_DAY
+                if is_v5:
+                    stop_price = local_high - (atr_mult * atr[i])
+                    sold = (px < stop_price) or (days_held > v5_days and ((px-entry_price)/entry_price) < (v5_atr * atr[i]/px)) or climax[i]
+                else:
+                    pnl = (px - entry_price) / entry_price
+                    sold = pnl < -v1_stop or pnl > v1_target or days_held > v1_days
+                if sold:
+                    rows.append(i); is_buy.append(False)
+                    i += 1
+                    break
+                local_high = max(local_high, high[i])
+                i += 1
+            if not sold:
+                break # still holding at the end of the data
+    return np.array(rows, dtype=np.int64), np.array(is_buy, dtype=bool)
+
+def sizing_label(cfg):
+    if cfg.sizing == 'percent':
+        return f"{cfg.pos_size_pct:.0%} of equity per position"
+    return f"${cfg.slot_size:,.0f} per slot"
+
+def run_signal_portfolio(panel, inputs, cfg, events=None):
+    """Place BUY/SELL events on the panel calendar and run the portfolio kernel."""
+    rows, is_buy = events if events is not None else signal_events(inputs, cfg)
+    d = inputs.cal_pos[rows]
+    j = inputs.sym_of_row[rows]
+    on_cal = d >= 0 # signals on non-calendar days are dropped
+    panel.entry[:] = False
+    panel.exit[:] = False
+    panel.entry[d[on_cal & is_buy], j[on_cal & is_buy]] = True
+    panel.exit[d[on_cal & ~is_buy], j[on_cal & ~is_buy]] = True
+    return run_portfolio(panel, cfg)
+
 class PortfolioManager:
-    def __init__(self, initial_capital=100000, max_positions=10):
+    def __init__(self, initial_capital=100000, max_positions=10, slot_size=10000, sizing='fixed', pos_size_pct=0.10, **exit_params):
+        """
+        sizing: 'fixed' ($slot_size per position while cash allows) or
+        'percent' (pos_size_pct of equity). exit_params override the signal
+        exit rules (see SIGNAL_PARAMS), e.g. v1_stop=0.04, v5_atr_mult=2.5.
+        """
         self.initial_capital = initial_capital
         self.max_positions = max_positions
+        self.config = PortfolioConfig(
+            initial_capital=initial_capital, max_positions=max_positions,
+            sizing=sizing, slot_size=slot_size, pos_size_pct=pos_size_pct,
+            mark_after='buys', sell_order='symbol', **exit_params,
+        )
         self.cash = initial_capital
         self.positions = {} # {symbol: {size, entry_price}}
         self.equity_curve = []
+        self.stale_days = 0 # days where a holding had no fresh bar (valued at last close)
         self.qs = QuantSystem()
         self.symbol_data = {}
         self.spy_data = None
@@ -60,10 +183,13 @@ class PortfolioManager:
                      self.symbol_data[sym] = df
             except: pass
             
-    def generate_signals(self):
-        # Pre-calc signals for efficiency
-        print("Pre-calculating signals for Universe...")
-        all_signals = [] # List of tuples (date, symbol, action)
+    def signal_inputs(self):
+        """
+        Per-symbol arrays the signal state machine needs, flattened into one
+        SignalInputs (computed once; reused by every exit-parameter set).
+        每個標的的訊號輸入（只計算一次，供所有出場參數組合重複使用）。
+        """
+        blocks = []
         
         # Need aligned regime and sector trend
         # For simplicity, calculate per symbol (vectorized or engine)
@@ -77,7 +203,7 @@ class PortfolioManager:
             else: continue
             
             # Prepare
-            df = engine.prepare(df.copy())
+            df = engine.prepare(df)
             
             # Align SPY
             if self.spy_data is not None:
@@ -93,128 +219,60 @@ class PortfolioManager:
             # Using SPY as proxy for Sector Trend for simplicity in this MVP
             df['sector_trend'] = np.where(df['spy_close'] > df['spy_close'].rolling(20).mean(), "UP", "DOWN")
             
-            # Loop for signals
-            in_pos = False
-            entry_price = 0
-            entry_idx = 0 # integer index, not needed if iterating rows?
-            local_high = 0
-            
-            # Iterating rows
-            for date, row in df.iterrows():
-                # We need historical context for Loop logic (prev candle)
-                # This is slow, but correct.
-                # Actually, the 'df' is prepped. 
-                # Engine needs 'last' and 'prev'. 'row' is last.
-                # Just accessing row is fine.
-                
-                regime = row['regime']
-                sector_trend = row['sector_trend']
-                
-                sig = "HOLD"
-                
-                if engine.name == "V5_Growth (Tight)":
-                     if in_pos:
-                         # Exit Logic
-                         days_held = (date - entry_date).days
-                         stop_price = local_high - (2.0 * row['atr'])
-                         if row['close'] < stop_price: sig = "SELL_STOP"
-                         elif days_held > 5 and ((row['close']-entry_price)/entry_price) < (0.5 * row['atr']/row['close']): sig = "SELL_TIME"
-                         elif row.get('stoch_k', 0) > 95 and row.get('width_zscore', 0) > 2.0: sig = "SELL_CLIMAX"
-                     else:
-                         # Entry Logic
-                         # Squeeze check needs prev
-                         # Approximate: if bb_width_pct is low.
-                         if regime == "BEAR_RISK_OFF": sig = "NO_TRADE"
-                         elif sector_trend == "DOWN": sig = "WAIT"
-                         elif (row['bb_width_pct'] < 0.20) and (row['close'] > row['bb_upper']): sig = "BUY_BREAKOUT"
-                
-                elif engine.name == "V1_Defensive (MeanRev)":
-                     if in_pos:
-                         pnl = (row['close'] - entry_price) / entry_price
-                         days_held = (date - entry_date).days
-                         if pnl < -0.05: sig = "SELL_STOP"
-                         elif pnl > 0.10: sig = "SELL_TARGET"
-                         elif days_held > 10: sig = "SELL_TIME"
-                     else:
-                         if sector_trend == "DOWN": sig = "WAIT"
-                         elif row['close'] > row['mcginley'] and row['stoch_k'] < 20: sig = "BUY_DIP"
-
-                if "BUY" in sig and not in_pos:
-                    all_signals.append((date, sym, "BUY", row['close']))
-                    in_pos = True
-                    entry_price = row['close']
-                    entry_date = date
-                    local_high = row['close']
-                elif "SELL" in sig and in_pos:
-                    all_signals.append((date, sym, "SELL", row['close']))
-                    in_pos = False
-                
-                if in_pos:
-                    local_high = max(local_high, row['high'])
+            bear = (df['regime'] == "BEAR_RISK_OFF").to_numpy()
+            down = (df['sector_trend'] == "DOWN").to_numpy()
+            is_v5 = engine.name == "V5_Growth (Tight)"
+            if is_v5:
+                can_enter = (~bear & ~down & (df['bb_width_pct'] < 0.20) & (df['close'] > df['bb_upper'])).to_numpy()
+                climax = ((df['stoch_k'] > 95) & (df['width_zscore'] > 2.0)).to_numpy()
+                atr = df['atr'].to_numpy(dtype=float)
+            else:
+                can_enter = (~down & (df['close'] > df['mcginley']) & (df['stoch_k'] < 20)).to_numpy()
+                climax = np.zeros(len(df), dtype=bool)
+                atr = np.zeros(len(df))
+            blocks.append((sym, is_v5, df.index, df['close'].to_numpy(dtype=float), df['high'].to_numpy(dtype=float),
+                           atr, can_enter, climax))
+        return SignalInputs.from_blocks(blocks)
 
+    def generate_signals(self, inputs=None):
+        """Legacy event list: [(date, symbol, 'BUY'|'SELL', close)] sorted by date."""
+        print("Pre-calculating signals for Universe...")
+        inputs = inputs if inputs is not None else self.signal_inputs()
+        rows, is_buy = signal_events(inputs, self.config)
+        sym_idx = inputs.sym_of_row[rows]
+        all_signals = [(inputs.date_of(r), inputs.symbols[j], "BUY" if b else "SELL", inputs.close[r])
+                       for r, j, b in zip(rows, sym_idx, is_buy)]
         # Sort by Date
         all_signals.sort(key=lambda x: x[0])
         return all_signals
 
+    def calendar(self):
+        return self.spy_data[self.spy_data.index >= "2018-01-01"].index
+
+    def build_panel(self, inputs, calendar):
+        """Close/availability matrices for the symbols that carry signals (date x symbol)."""
+        return MarketPanel.from_frames({sym: self.symbol_data[sym] for sym in inputs.symbols}, calendar)
+
     def run_backtest(self):
         self.load_data()
-        signals = self.generate_signals() # List of (Date, Sym, Action, Price)
-        
-        # Convert signals to a Queue-like structure or just iterate
-        # But we need to track daily equity.
-        # So we need to iterate ALL dates in universe, and process signals on that date.
         
         # Get all dates
         if self.spy_data is None: return
-        all_dates = self.spy_data[self.spy_data.index >= "2018-01-01"].index
+        all_dates = self.calendar()
+        inputs = self.signal_inputs()
+        inputs.align(all_dates)
+        panel = self.build_panel(inputs, all_dates)
         
-        # Index signals by date
-        sig_map = {}
-        for s in signals:
-            d = s[0]
-            if d not in sig_map: sig_map[d] = []
-            sig_map[d].append(s)
-            
         print("Running Portfolio Simulation...")
-        for date in all_dates:
-            # 1. Process Signals (Buys/Sells)
-            todays_signals = sig_map.get(date, [])
-            
-            # Process Sells first
-            for _, sym, action, price in [s for s in todays_signals if s[2] == "SELL"]:
-                if sym in self.positions:
-                     pos = self.positions.pop(sym)
-                     proceeds = pos['shares'] * price
-                     self.cash += proceeds
-            
-            # Process Buys
-            for _, sym, action, price in [s for s in todays_signals if s[2] == "BUY"]:
-                if sym not in self.positions and len(self.positions) < self.max_positions:
-                    # Size: 10% of INITIAL capital ($10k) or Current Equity?
-                    # Generally fixed fractional or fixed amount.
-                    # User: dynamic weighting? "Growth 10%, Defensive 5%"
-                    # Let's simplify: Fixed $10k per slot (10 slots).
-                    size = 10000 
-                    if self.cash >= size:
-                        shares = size / price
-                        self.positions[sym] = {'shares': shares, 'entry': price}
-                        self.cash -= size
-            
-            # 2. Update Equity
-            pos_val = 0
-            for sym, pos in self.positions.items():
-                # Get current price
-                # Look up in symbol_data
-                try:
-                    curr_price = self.symbol_data[sym].loc[date]['close']
-                    pos_val += pos['shares'] * curr_price
-                except:
-                    # If missing data for today, use entry price or skip?
-                    # Use last known? Complicated. Use Entry for approximation if missing approx.
-                    pos_val += pos['shares'] * pos['entry']
-            
-            total_equity = self.cash + pos_val
-            self.equity_curve.append({'date': date, 'equity': total_equity})
+        # Sells first, then buys in signal order, sized per self.config
+        # (default: fixed $10k per slot while cash allows); held symbols
+        # without a bar keep their last close (stale).
+        result = run_signal_portfolio(panel, inputs, self.config)
+        
+        self.cash = result.cash
+        self.positions = {sym: {'shares': p['shares'], 'entry': p['entry']} for sym, p in result.positions.items()}
+        self.equity_curve = [{'date': d, 'equity': e} for d, e in zip(all_dates, result.equity)]
+        self.stale_days = result.stale_days
             
         self.generate_report()
 
@@ -239,6 +297,7 @@ class PortfolioManager:
         report += "### Parameters\n"
         report += f"- **Initial Capital**: ${self.initial_capital:,.0f}\n"
         report += f"- **Max Positions**: {self.max_positions}\n"
+        report += f"- **Sizing**: {sizing_label(self.config)}\n"
         report += "- **Strategy**: Matrix v6.0 (V5/V1 + Filters)\n\n"
         
         report += "### Performance (2018-2025)\n"
@@ -249,6 +308,8 @@ class PortfolioManager:
         report += f"| **Max Drawdown** | **{max_dd:.1%}** | -33.7% (2020/22) |\n"
         report += f"| **Total Return** | **{(end_val-start_val)/start_val:.1%}** | {(spy_base.iloc[-1]/spy_base.iloc[0])-1:.1%} |\n\n"
 
+        report += f"- **Stale-Price Days**: {self.stale_days} (held positions valued at last known close)\n\n"
+
         report += "### Conclusions\n"
         if max_dd > -0.25:
              report += "- **Risk Objective Met**: MaxDD < 25%. The Filters worked.\n"
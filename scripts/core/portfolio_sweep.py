@@ -0,0 +1,307 @@
+"""
+Portfolio Parameter Sweep
+投資組合參數掃描
+
+Evaluates a grid of PortfolioManager configurations (max positions, sizing
+rule, V1 stop/target, V5 ATR multiple and time stop) in one run:
+  - indicators and entry conditions are computed once (SignalInputs),
+  - the price matrices and signal inputs are published once in a shared
+    memory block that every worker maps read-only (no per-task pickling),
+  - configurations sharing the same exit parameters share one pass of the
+    signal state machine; only the portfolio kernel runs per configuration,
+  - with a pool, each group's configurations are split into chunks so every
+    worker has work even when the grid is a single exit-parameter group.
+以單次執行評估整組參數：指標只算一次，價格矩陣透過共享記憶體供各 worker
+唯讀使用；出場參數相同的組合共用同一次訊號計算。
+
+Usage:
+    python scripts/core/portfolio_sweep.py --max-positions 5,10,15 \\
+        --sizing fixed:10000,percent:0.10 --v1-stop 0.04,0.05 --workers 4
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.getcwd())
+from scripts.core.portfolio_kernel import MarketPanel, PortfolioConfig, epoch_ns
+from scripts.core.portfolio_manager import (
+    PortfolioManager, SignalInputs, SIGNAL_PARAMS, signal_events, run_signal_portfolio, sizing_label,
+)
+
+OUTPUT_REPORT = "docs/PORTFOLIO_SWEEP_REPORT.md"
+RANK_KEYS = ('sharpe', 'cagr', 'calmar', 'final_equity')
+PANEL_FIELDS = ('close', 'avail', 'last_close', 'fresh')
+
+
+class SharedArrays:
+    """
+    Named numpy arrays packed into one SharedMemory block. The parent creates
+    and unlinks it; workers attach by (name, manifest) and get zero-copy views.
+    將多個陣列打包進單一共享記憶體區塊；worker 以零複製方式讀取。
+    """
+    ALIGN = 64
+
+    def __init__(self, arrays):
+        self.manifest = []
+        offset = 0
+        for key, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            offset = -(-offset // self.ALIGN) * self.ALIGN
+            self.manifest.append((key, arr.dtype.str, arr.shape, offset))
+            offset += arr.nbytes
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.name = self.shm.name
+        self.arrays = self._views(self.shm, self.manifest)
+        for key, arr in arrays.items():
+            self.arrays[key][...] = arr
+
+    @staticmethod
+    def _views(shm, manifest):
+        return {key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+                for key, dtype, shape, offset in manifest}
+
+    @classmethod
+    def attach(cls, name, manifest):
+        # Pool workers share the parent's resource tracker, so the block
+        # stays registered exactly once and is unlinked by the parent.
+        shm = shared_memory.SharedMemory(name=name)
+        views = cls._views(shm, manifest)
+        for arr in views.values():
+            arr.flags.writeable = False
+        return shm, views
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SweepContext:
+    """Signal inputs + panel template; evaluates one group of configurations."""
+    def __init__(self, inputs, panel, base):
+        self.inputs = inputs
+        self.panel = panel
+        self.base = base
+
+    @classmethod
+    def from_arrays(cls, symbols, dates, arrays, base):
+        inputs = SignalInputs(symbols, **{k: arrays[k] for k in SignalInputs.FIELDS})
+        shape = arrays['panel_close'].shape
+        panel = MarketPanel(
+            dates=pd.DatetimeIndex(dates), symbols=list(symbols),
+            close=arrays['panel_close'], avail=arrays['panel_avail'],
+            entry=np.zeros(shape, bool), exit=np.zeros(shape, bool),  # private, rewritten per config
+            atr=np.zeros(shape), strategy=np.zeros(shape[1], dtype=np.int8),
+            last_close=arrays['panel_last_close'], fresh=arrays['panel_fresh'],
+        )
+        return cls(inputs, panel, base)
+
+    def evaluate(self, signal_params, configs):
+        events = signal_events(self.inputs, PortfolioConfig(**signal_params))
+        rows = []
+        for conf in configs:
+            cfg = PortfolioConfig(**{**self.base, **signal_params, **conf})
+            result = run_signal_portfolio(self.panel, self.inputs, cfg, events)
+            rows.append({**describe(cfg), **portfolio_metrics(result, cfg.initial_capital)})
+        return rows
+
+
+_WORKER = {}
+
+
+def _init_worker(shm_name, manifest, symbols, dates, base):
+    shm, arrays = SharedArrays.attach(shm_name, manifest)
+    _WORKER['shm'] = shm  # keep the mapping alive for the views
+    _WORKER['ctx'] = SweepContext.from_arrays(symbols, dates, arrays, base)
+
+
+def _evaluate_group(task):
+    return _WORKER['ctx'].evaluate(*task)
+
+
+# --- Grid ---
+
+def parse_list(text, cast=float):
+    return [cast(x) for x in str(text).split(',') if x.strip()]
+
+
+def parse_sizing(text):
+    """'fixed:10000,percent:0.10' -> [{'sizing': 'fixed', 'slot_size': 10000.0}, ...]"""
+    out = []
+    for item in parse_list(text, str):
+        rule, _, value = item.strip().partition(':')
+        if rule == 'fixed':
+            out.append({'sizing': 'fixed', 'slot_size': float(value or 10000)})
+        elif rule == 'percent':
+            out.append({'sizing': 'percent', 'pos_size_pct': float(value or 0.10)})
+        else:
+            raise ValueError(f"Unknown sizing rule: {item} (use fixed:<$> or percent:<fraction>)")
+    return out
+
+
+def build_grid(max_positions=(10,), sizings=({'sizing': 'fixed', 'slot_size': 10000.0},), **exit_grid):
+    """
+    Cartesian product of the parameter lists, grouped by exit parameters:
+    [(signal_params, [portfolio_params, ...]), ...]. Unlisted exit parameters
+    keep the PortfolioConfig defaults.
+    參數網格依出場參數分組，同組共用一次訊號計算。
+    """
+    defaults = PortfolioConfig()
+    exit_lists = [exit_grid.get(k) or [getattr(defaults, k)] for k in SIGNAL_PARAMS]
+    portfolio = [{'max_positions': int(n), **s} for n in max_positions for s in sizings]
+    return [(dict(zip(SIGNAL_PARAMS, combo)), portfolio) for combo in itertools.product(*exit_lists)]
+
+
+def split_tasks(grid, workers, per_worker=4):
+    """
+    Split each group's configuration list into chunks so a pool of `workers`
+    gets about per_worker tasks each; every chunk repeats its group's signal
+    pass (cheap next to the portfolio kernel). Grid order is kept.
+    將各組拆成多個子任務，讓所有 worker 都有工作（即使只有一組出場參數）。
+    """
+    total = sum(len(configs) for _, configs in grid)
+    size = max(1, -(-total // (workers * per_worker)))
+    return [(params, configs[i:i + size]) for params, configs in grid for i in range(0, len(configs), size)]
+
+
+# --- Metrics ---
+
+def portfolio_metrics(result, initial_capital):
+    eq = result.equity
+    final = float(eq[-1]) if len(eq) else float(initial_capital)
+    years = (result.dates[-1] - result.dates[0]).days / 365.25 if len(eq) > 1 else 0
+    cagr = (final / initial_capital) ** (1 / years) - 1 if years > 0 and final > 0 else 0.0
+    max_dd = float((eq / np.maximum.accumulate(eq) - 1).min()) if len(eq) else 0.0
+    rets = np.diff(eq) / eq[:-1] if len(eq) > 1 else np.zeros(0)
+    std = rets.std(ddof=1) if len(rets) > 1 else 0.0
+    sharpe = float(rets.mean() / std * np.sqrt(252)) if std > 0 else 0.0
+    wins = sum(1 for t in result.trades if t[6] > t[5])
+    return {
+        'final_equity': final,
+        'cagr': cagr,
+        'max_dd': max_dd,
+        'sharpe': sharpe,
+        'calmar': cagr / abs(max_dd) if max_dd < 0 else 0.0,
+        'trades': len(result.trades),
+        'win_rate': wins / len(result.trades) if result.trades else 0.0,
+        'stale_days': result.stale_days,
+    }
+
+
+def describe(cfg):
+    return {
+        'max_positions': cfg.max_positions,
+        'sizing': sizing_label(cfg),
+        **{k: getattr(cfg, k) for k in SIGNAL_PARAMS},
+    }
+
+
+# --- Runner ---
+
+def run_sweep(inputs, panel, grid, base=None, workers=None, rank_by='sharpe'):
+    """
+    Evaluate every configuration in grid (see build_grid) and return a
+    DataFrame ranked by rank_by (descending). workers=1 runs in-process.
+    """
+    base = base or {}
+    workers = workers or os.cpu_count() or 1
+    tasks = split_tasks(grid, workers) if workers > 1 else grid
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        ctx = SweepContext(inputs, panel, base)
+        groups = [ctx.evaluate(*task) for task in grid]
+    else:
+        arrays = {**inputs.arrays(), **{'panel_' + k: getattr(panel, k) for k in PANEL_FIELDS}}
+        shared = SharedArrays(arrays)
+        try:
+            init = (shared.name, shared.manifest, panel.symbols, epoch_ns(panel.dates), base)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init) as pool:
+                groups = list(pool.map(_evaluate_group, tasks))
+        finally:
+            shared.close()
+    table = pd.DataFrame([row for group in groups for row in group])
+    if table.empty:
+        return table
+    table = table.sort_values(rank_by, ascending=False, kind='stable').reset_index(drop=True)
+    table.index = table.index + 1
+    table.index.name = 'rank'
+    return table
+
+
+def format_report(table, top, rank_by, elapsed, n_symbols, n_days):
+    report = "# Portfolio Parameter Sweep\n\n"
+    report += f"- **Configurations**: {len(table)} ({n_symbols} symbols x {n_days} days, {elapsed:.1f}s)\n"
+    report += f"- **Ranked By**: {rank_by}\n\n"
+    report += "| Rank | Max Pos | Sizing | V1 Stop | V1 Target | V5 ATR x | V5 Time | CAGR | Max DD | Sharpe | Calmar | Trades | Win % | Final Equity |\n"
+    report += "| --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- | --- |\n"
+    for rank, r in table.head(top).iterrows():
+        report += (f"| {rank} | {r['max_positions']} | {r['sizing']} | {r['v1_stop']:.1%} | {r['v1_target']:.1%} | "
+                   f"{r['v5_atr_mult']:.2f} | {r['v5_time_days']}d | {r['cagr']:.1%} | {r['max_dd']:.1%} | "
+                   f"{r['sharpe']:.2f} | {r['calmar']:.2f} | {r['trades']} | {r['win_rate']:.0%} | "
+                   f"${r['final_equity']:,.0f} |\n")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep PortfolioManager parameters over a process pool.")
+    parser.add_argument("--max-positions", default="10", help="comma list, e.g. 5,10,15")
+    parser.add_argument("--sizing", default="fixed:10000", help="comma list of fixed:<$> / percent:<fraction>")
+    parser.add_argument("--v1-stop", default=None, help="comma list of V1 stop-loss fractions")
+    parser.add_argument("--v1-target", default=None, help="comma list of V1 profit-target fractions")
+    parser.add_argument("--v5-atr-mult", default=None, help="comma list of V5 trailing-stop ATR multiples")
+    parser.add_argument("--v5-time-days", default=None, help="comma list of V5 stagnation days")
+    parser.add_argument("--capital", type=float, default=100000)
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count; 1 = in-process)")
+    parser.add_argument("--rank-by", choices=RANK_KEYS, default="sharpe")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--output", default=OUTPUT_REPORT)
+    parser.add_argument("--csv", default=None, help="also write the full ranked table as CSV")
+    args = parser.parse_args()
+
+    opt = lambda text, cast=float: parse_list(text, cast) if text else None
+    grid = build_grid(
+        max_positions=parse_list(args.max_positions, int),
+        sizings=parse_sizing(args.sizing),
+        v1_stop=opt(args.v1_stop), v1_target=opt(args.v1_target),
+        v5_atr_mult=opt(args.v5_atr_mult), v5_time_days=opt(args.v5_time_days, int),
+    )
+
+    pm = PortfolioManager(initial_capital=args.capital)
+    pm.load_data()
+    if pm.spy_data is None:
+        print("SPY data missing; nothing to sweep.")
+        return
+    calendar = pm.calendar()
+    inputs = pm.signal_inputs()
+    inputs.align(calendar)
+    panel = pm.build_panel(inputs, calendar)
+
+    n_configs = sum(len(configs) for _, configs in grid)
+    print(f"Sweeping {n_configs} configurations ({len(grid)} signal sets) over {len(inputs.symbols)} symbols...")
+    t0 = time.time()
+    base = {'initial_capital': args.capital, 'mark_after': 'buys', 'sell_order': 'symbol'}
+    table = run_sweep(inputs, panel, grid, base=base, workers=args.workers, rank_by=args.rank_by)
+    elapsed = time.time() - t0
+
+    report = format_report(table, args.top, args.rank_by, elapsed, len(inputs.symbols), len(calendar))
+    with open(args.output, 'w', encoding='utf-8') as f: f.write(report)
+    if args.csv:
+        table.to_csv(args.csv)
+    print(report)
+    print(f"Report Generated: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+Backtest Result Cache (Fingerprinted, On-Disk)
+回測結果快取（指紋比對、磁碟儲存）
+
+Validators and optimizers recompute every symbol's trades on each run even
+when neither the OHLCV inputs nor the strategy changed. ResultCache stores
+each symbol's trade list (and optional per-bar arrays) in one compressed .npz
+file, keyed by a fingerprint of
+  - the engine name and version plus its parameter dict (the cache scope),
+  - the symbol's input arrays (OHLCV frame, market series, ...).
+A re-run after a docs-only change is served from disk; only symbols whose
+data changed are recomputed.
+以「引擎名稱 / 版本 / 參數」與「各標的輸入資料」的雜湊作為鍵值，將交易清單與
+逐筆陣列存成 .npz；資料未變動的標的直接讀取快取，只重算有變動的標的。
+
+Entries live at <root>/<engine>/<symbol>.<scope>.npz, so each symbol keeps one
+entry per scope and a data change overwrites it in place. Files are written
+atomically (temp file + os.replace), so parallel workers can share a cache.
+Pass code_fingerprint(StrategyClass, simulate_fn) in the params to invalidate
+entries automatically when the simulation code is edited: it hashes the given
+classes / functions plus every scripts.* module their defining module imports
+(transitively), so an edit to indicator_planner specs, strategy_selector
+indicators or any other shared engine code also invalidates. Helpers in the
+engine's own module are only covered when passed explicitly.
+
+Usage:
+    cache = ResultCache("v5_final", 1, {"code": code_fingerprint(StrategyV5)})
+    trades = cache.fetch_trades(symbol, (df_raw,), lambda: backtest(symbol, df_raw))
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+import zipfile
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = ".cache/results"
+FORMAT_VERSION = 2  # on-disk trade encoding (part of every scope)
+PACKAGE = "scripts."
+
+
+# --- Fingerprints ---
+
+def _update(h, obj):
+    if isinstance(obj, pd.DataFrame):
+        h.update(b'frame')
+        for col in obj.columns:
+            h.update(str(col).encode())
+            _update(h, obj[col])
+    elif isinstance(obj, (pd.Series, pd.Index)):
+        values = obj.to_numpy()
+        if values.dtype.kind == 'M':
+            values = np.asarray(values, dtype='datetime64[ns]').view(np.int64)
+        _update(h, values)
+    elif isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'O':
+            h.update(b'objects')
+            h.update(json.dumps([repr(v) for v in obj.ravel()]).encode())
+        else:
+            h.update(f"{obj.dtype.str}{obj.shape}".encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b'dict')
+        for key in sorted(obj, key=str):
+            h.update(str(key).encode())
+            _update(h, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"seq{len(obj)}".encode())
+        for item in obj:
+            _update(h, item)
+    else:
+        h.update(repr(obj).encode())
+
+
+def fingerprint(*parts):
+    """Stable hex digest of frames, arrays, dicts, sequences and scalars (repr)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        _update(h, part)
+    return h.hexdigest()
+
+
+def _source(obj):
+    try:
+        return inspect.getsource(obj)
+    except (OSError, TypeError):
+        return getattr(obj, '__qualname__', getattr(obj, '__name__', repr(obj)))
+
+
+def _module_dependencies(module):
+    """scripts.* modules imported (directly or via imported names) by module, transitively."""
+    seen, stack = {}, [module]
+    while stack:
+        for value in list(vars(stack.pop()).values()):
+            name = value.__name__ if inspect.ismodule(value) else getattr(value, '__module__', None)
+            if isinstance(name, str) and name.startswith(PACKAGE) and name not in seen and name != module.__name__:
+                dep = sys.modules.get(name)
+                if dep is not None:
+                    seen[name] = dep
+                    stack.append(dep)
+    return seen
+
+
+def code_fingerprint(*objects):
+    """
+    Digest of the source of classes / functions (name only when source is
+    unavailable) and of the scripts.* modules their defining modules import.
+    """
+    sources = [_source(obj) for obj in objects]
+    deps = {}
+    for obj in objects:
+        module = inspect.getmodule(obj)
+        if module is not None:
+            deps.update(_module_dependencies(module))
+    sources += [[name, _source(deps[name])] for name in sorted(deps)]
+    return fingerprint(sources)
+
+
+# --- Trade list <-> column arrays ---
+
+def _encode_trades(trades):
+    """
+    List of dicts (one column per key) or list of scalars -> {name: array}.
+    Each record column keeps a presence mask (keys missing from some records
+    stay missing); non-numeric columns are stored as JSON so None survives.
+    """
+    if not trades:
+        return {'kind': np.array('records'), 'columns': np.array([], dtype=str)}
+    if not isinstance(trades[0], dict):
+        return {'kind': np.array('values'), 'values': np.asarray(trades, dtype=float)}
+    frame = pd.DataFrame(trades)
+    out = {'kind': np.array('records'), 'columns': np.array([str(c) for c in frame.columns])}
+    for i, col in enumerate(frame.columns):
+        s = frame[col]
+        if s.dtype.kind == 'M':
+            values = np.asarray(s, dtype='datetime64[ns]')
+        elif s.dtype.kind in 'biuf':
+            values = s.to_numpy()
+        else:
+            values = np.array([json.dumps(t.get(col), default=str) for t in trades], dtype=str)
+            out[f'j{i}'] = np.array(True)
+        out[f't{i}'] = values
+        out[f'm{i}'] = np.array([col in t for t in trades])
+    return out
+
+
+def _decode_trades(data):
+    if str(data['kind']) == 'values':
+        return data['values'].tolist()
+    columns = data['columns'].tolist()
+    if not columns:
+        return []
+    frame = pd.DataFrame({col: data[f't{i}'] for i, col in enumerate(columns)})
+    for i, col in enumerate(columns):
+        if f'j{i}' in data.files:
+            frame[col] = pd.Series([json.loads(v) for v in data[f't{i}']], dtype=object)
+    records = frame.to_dict('records')
+    for i, col in enumerate(columns):
+        for record, present in zip(records, data[f'm{i}']):
+            if not present:
+                del record[col]
+    return records
+
+
+@dataclass
+class CachedResult:
+    trades: list
+    arrays: dict = field(default_factory=dict)
+
+
+class ResultCache:
+    """
+    Per-engine store of per-symbol results. enabled=False turns every lookup
+    into a miss and skips writes (e.g. a --no-cache flag).
+    每個引擎一個快取範圍；enabled=False 時一律重算且不寫入。
+    """
+    def __init__(self, engine, version, params=None, root=CACHE_DIR, enabled=True):
+        self.engine = engine
+        self.scope = fingerprint(FORMAT_VERSION, engine, version, params or {})
+        self.dir = os.path.join(root, engine)
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, symbol):
+        safe = "".join(c if c.isalnum() or c in '-_^.' else '_' for c in str(symbol))
+        return os.path.join(self.dir, f"{safe}.{self.scope[:16]}.npz")
+
+    def key(self, symbol, inputs):
+        return fingerprint(self.scope, str(symbol), inputs)
+
+    def load(self, symbol, inputs):
+        """CachedResult when an entry for exactly these inputs exists, else None."""
+        if not self.enabled:
+            return None
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['key']) != self.key(symbol, inputs):
+                    return None
+                arrays = {name[2:]: data[name] for name in data.files if name.startswith('a_')}
+                return CachedResult(_decode_trades(data), arrays)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return None  # unreadable / partial entry: recompute and overwrite
+
+    def store(self, symbol, inputs, trades, arrays=None):
+        if not self.enabled:
+            return
+        payload = _encode_trades(trades)
+        payload['key'] = np.array(self.key(symbol, inputs))
+        for name, values in (arrays or {}).items():
+            payload[f'a_{name}'] = np.asarray(values)
+        os.makedirs(self.dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **payload)
+            os.replace(tmp, self.path(symbol))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def fetch(self, symbol, inputs, compute):
+        """
+        compute() -> (trades, arrays). Served from disk when the fingerprint
+        matches; otherwise computed and stored.
+        """
+        cached = self.load(symbol, inputs)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        trades, arrays = compute()
+        self.store(symbol, inputs, trades, arrays)
+        return CachedResult(trades, arrays or {})
+
+    def fetch_trades(self, symbol, inputs, compute):
+        """fetch() for engines that only produce a trade list: compute() -> trades."""
+        return self.fetch(symbol, inputs, lambda: (compute(), None)).trades
+
+    def summary(self):
+        state = "" if self.enabled else " (disabled)"
+        return f"Result cache [{self.engine}]{state}: {self.hits} cached, {self.misses} computed"
@@ -0,0 +1,152 @@
+"""
+Rolling Regression Statistics (O(n) Cumulative-Sum Kernel)
+滾動迴歸統計（O(n) 累積和核心）
+
+Rolling least squares of y on x = 0 .. window-1 from running sums of y, x*y
+and y^2: every window's sums come from two cumulative scans, so a
+series of any length costs a handful of vectorized passes instead of one
+Python iteration (and one polyfit) per bar. Works on a 1-D series or a 2-D
+dates x symbols panel (windows run along axis 0, columns are independent).
+以 y、x*y、y^2 的累積和得到每個視窗的統計量，一次向量化計算整段序列；
+支援一維序列與二維 日期 x 標的 面板（沿 axis 0 滾動）。
+
+Numerical stability: differencing one global cumulative sum loses digits
+as the sums grow with the series (x*y grows with the bar index). Instead the
+running sums restart every `window` rows and each window is the suffix of
+one block plus the prefix of the next, with x taken relative to the block,
+and y taken relative to the block's mean, so rounding stays proportional to
+the local spread of a single window rather than to the series' level or
+length (slope and R^2 do not depend on either shift). Windows containing a
+NaN return NaN; flat windows (y constant up to rounding) return slope 0, R^2 0.
+累積和每 window 列重新起算（區塊前綴 + 後綴），誤差只與單一視窗相關。
+
+Usage:
+    slope, intercept, r2 = rolling_ols(np.log(close), 250)
+    trend_slope, trend_r2 = rolling_log_trend(df['close'], 250)   # Trend Clock
+"""
+
+import numpy as np
+
+PERIODS_PER_YEAR = 252
+FLAT_TOL = 8 * np.finfo(float).eps  # ss_yy within FLAT_TOL * window of the summed squares counts as flat
+
+
+def _as_float(values):
+    y = np.asarray(values, dtype=float)
+    if y.ndim not in (1, 2):
+        raise ValueError(f"Expected a 1-D series or 2-D panel, got {y.ndim} dimensions")
+    return y
+
+
+def _block_scans(values, window):
+    """Prefix and suffix sums restarting every `window` rows (axis 0)."""
+    n = len(values)
+    pad = -n % window
+    v = np.concatenate([values, np.zeros((pad,) + values.shape[1:])]) if pad else values
+    blocks = v.reshape((-1, window) + values.shape[1:])
+    prefix = np.cumsum(blocks, axis=1).reshape(v.shape)[:n]
+    suffix = np.cumsum(blocks[:, ::-1], axis=1)[:, ::-1].reshape(v.shape)[:n]
+    return prefix, suffix
+
+
+def _window_parts(values, window):
+    """
+    Each trailing window [i-window+1 .. i] spans at most two blocks: the
+    suffix of the block holding its first row plus the prefix of the next.
+    Returns (head, tail, offset): head + tail is the window sum and offset
+    is the first row's position inside its block (tail is 0 when 0).
+    """
+    prefix, suffix = _block_scans(values, window)
+    start = np.arange(len(values) - window + 1)
+    offset = start % window
+    tail = prefix[window - 1:]
+    if values.ndim == 2:
+        offset = offset[:, None]
+    return suffix[start], np.where(offset == 0, 0.0, tail), offset
+
+
+def rolling_sum(values, window):
+    """Rolling sum along axis 0, NaN for the first window-1 rows."""
+    y = _as_float(values)
+    out = np.full(y.shape, np.nan)
+    if len(y) >= window:
+        head, tail, _ = _window_parts(y, window)
+        out[window - 1:] = head + tail
+    return out
+
+
+def rolling_ols(values, window):
+    """
+    (slope, intercept, r2) of y ~ x with x = 0 .. window-1 over each trailing
+    window, aligned to the window's last row (np.polyfit(x, y, 1) convention).
+    The first window-1 rows are NaN.
+    """
+    if window < 2:
+        raise ValueError("window must be at least 2")
+    y = _as_float(values)
+    n = len(y)
+    slope, intercept, r2 = (np.full(y.shape, np.nan) for _ in range(3))
+    if n < window:
+        return slope, intercept, r2
+
+    missing = np.isnan(y)
+    # Anchor each block at its own mean: the sums then only see local deviations
+    pad = -n % window
+    filled = np.where(missing, 0.0, y)
+    if pad:
+        filled = np.concatenate([filled, np.zeros((pad,) + y.shape[1:])])
+        present = np.concatenate([~missing, np.zeros((pad,) + y.shape[1:], dtype=bool)])
+    else:
+        present = ~missing
+    shape = (-1, window) + y.shape[1:]
+    with np.errstate(invalid='ignore'):
+        anchor = filled.reshape(shape).sum(axis=1) / present.reshape(shape).sum(axis=1)
+    anchor = np.nan_to_num(anchor)
+    block = np.arange(n) // window
+    yc = np.where(missing, 0.0, y - anchor[block])
+    # Block-local x (row position inside its block) keeps the x*y sums small
+    q = (np.arange(n) % window).astype(float)
+    if y.ndim == 2:
+        q = q[:, None]
+
+    y_head, y_tail, offset = _window_parts(yc, window)
+    qy_head, qy_tail, _ = _window_parts(q * yc, window)
+    yy_head, yy_tail, _ = _window_parts(yc * yc, window)
+    w = float(window)
+    # Re-base the second block's rows (there are `offset` of them) onto the first block's anchor
+    first = block[:n - window + 1]
+    base = anchor[first]
+    d = np.where(offset == 0, 0.0, anchor[np.minimum(first + 1, len(anchor) - 1)] - base)
+    sy = y_head + y_tail + offset * d
+    syy = yy_head + yy_tail + 2 * d * y_tail + offset * d * d
+    # sum(x * y) with x = row - window start: rows of the second block sit w further along
+    sxy = (qy_head - offset * y_head + qy_tail + (w - offset) * y_tail
+           + d * (offset * (offset - 1) / 2.0 + offset * (w - offset)))
+
+    ss_xx = w * (w * w - 1) / 12.0
+    ss_xy = sxy - (w - 1) / 2.0 * sy
+    ss_yy = syy - sy * sy / w
+    b = ss_xy / ss_xx
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rr = np.clip(ss_xy * ss_xy / (ss_xx * ss_yy), 0.0, 1.0)
+
+    # Compare against the size of the summands: syy itself cancels to ~0 on a flat window
+    flat = ss_yy <= FLAT_TOL * w * (yy_head + yy_tail + offset * d * d)
+    b = np.where(flat, 0.0, b)
+    rr = np.where(flat, 0.0, rr)
+    a = sy / w + base - b * (w - 1) / 2.0
+
+    counts = np.cumsum(missing, axis=0)
+    gaps = counts[window - 1:] - np.concatenate([np.zeros_like(counts[:1]), counts[:-window]]) > 0
+    for out, value in ((slope, b), (intercept, a), (r2, rr)):
+        out[window - 1:] = np.where(gaps, np.nan, value)
+    return slope, intercept, r2
+
+
+def rolling_log_trend(close, window=250, periods=PERIODS_PER_YEAR):
+    """
+    Trend Clock: annualized slope and R^2 of log(close) over trailing windows
+    (slope * periods, so 0.2 ~ +20% log growth a year).
+    """
+    slope, _, r2 = rolling_ols(np.log(_as_float(close) + 1e-9), window)
+    return slope * periods, r2
@@ -3,6 +3,9 @@ import pandas as pd
 import numpy as np
 import os
 
+from scripts.core.indicator_planner import IndicatorPlanner, attach, spec
+from scripts.core.timeframes import TimeframeCache, normalize_timeframe
+
 SECTOR_FILE = "public/data/sector_industry.json"
 DATA_DIR = "public/data"
 
@@ -96,11 +99,19 @@ class MarketRegime:
 # --- 3. Strategy Engines (L3 Signal) ---
 
 class StrategyEngine:
-    def __init__(self, name):
+    # Column name -> IndicatorSpec. Shared specs are computed once per symbol.
+    # 欄位名稱 -> IndicatorSpec；相同規格在同一標的只計算一次。
+    requires = {}
+
+    def __init__(self, name, compact=False):
         self.name = name
+        # compact: store indicator columns as float32 (computed in float64)
+        # 精簡模式：指標以 float64 計算、以 float32 儲存
+        self.dtype = np.float32 if compact else None
     
-    def prepare(self, df):
-        raise NotImplementedError
+    def prepare(self, df, ctx=None):
+        """Return a new frame with this engine's indicator columns (df is not mutated)."""
+        return attach(df, self.requires, ctx, self.dtype)
         
     def generate_signal(self, df, regime, sector_trend):
         raise NotImplementedError
@@ -113,20 +124,19 @@ class EngineV5_Growth(StrategyEngine):
       - L2: Sector Trend must be UP (No falling knives)
       - L3: Squeeze + Breakout
     """
-    def __init__(self):
-        super().__init__("V5_Growth (Tight)")
-        
-    def prepare(self, df):
-        df['atr'] = Indicators.atr(df['high'], df['low'], df['close'], 14)
-        df['ma20'], df['bb_upper'], df['bb_width'] = Indicators.bollinger_bands(df['close'], 20)
-        df['bb_width_pct'] = df['bb_width'].rolling(120).rank(pct=True)
-        df['stoch_k'], _ = Indicators.stoch_rsi(df['close'], 14)
-        
+    requires = {
+        'atr': spec('atr', period=14),
+        'ma20': spec('sma', period=20),
+        'bb_upper': spec('bb_upper', period=20),
+        'bb_width': spec('bb_width', period=20),
+        'bb_width_pct': spec('rolling_rank', source=spec('bb_width', period=20), window=120),
+        'stoch_k': spec('stoch_rsi_k', period=14),
         # Z-Score of Width for Climax
-        width_mean = df['bb_width'].rolling(120).mean()
-        width_std = df['bb_width'].rolling(120).std()
-        df['width_zscore'] = (df['bb_width'] - width_mean) / width_std
-        return df
+        'width_zscore': spec('rolling_zscore', source=spec('bb_width', period=20), window=120),
+    }
+
+    def __init__(self, compact=False):
+        super().__init__("V5_Growth (Tight)", compact)
 
     def generate_signal(self, df, regime, sector_trend):
         if len(df) < 200: return "NO_DATA", "Insufficient Data"
@@ -163,13 +173,13 @@ class EngineV1_Defensive(StrategyEngine):
       - L2: Sector Trend must be UP? User said "No Catching Knives". 
         "If sector falling, wait." -> Logic: Only buy dips in *Uptrending Sectors*.
     """
-    def __init__(self):
-        super().__init__("V1_Defensive (MeanRev)")
+    requires = {
+        'mcginley': spec('mcginley', period=14),
+        'stoch_k': spec('stoch_rsi_k', period=14),
+    }
 
-    def prepare(self, df):
-        df['mcginley'] = Indicators.mcginley_dynamic(df['close'], 14)
-        df['stoch_k'], _ = Indicators.stoch_rsi(df['close'], 14)
-        return df
+    def __init__(self, compact=False):
+        super().__init__("V1_Defensive (MeanRev)", compact)
         
     def generate_signal(self, df, regime, sector_trend):
         if len(df) < 20: return "NO_DATA", "Insufficient Data"
@@ -210,9 +220,14 @@ class DataProvider:
         return DataProvider.SECTOR_ETF_MAP.get(sector, "SPY")
 
 class QuantSystem:
-    def __init__(self):
-        self.v5 = EngineV5_Growth()
-        self.v1 = EngineV1_Defensive()
+    def __init__(self, timeframe='1d', compact=False):
+        self.v5 = EngineV5_Growth(compact)
+        self.v1 = EngineV1_Defensive(compact)
+        self.planner = IndicatorPlanner()
+        # Bars are always fed as daily data; other timeframes are derived and cached.
+        # 輸入一律為日線，其他週期由日線衍生並快取。
+        self.timeframe = normalize_timeframe(timeframe)
+        self.bars = TimeframeCache()
         
         self.sector_map = {}
         self.load_metadata()
@@ -231,19 +246,37 @@ class QuantSystem:
                     self.sector_map[item['symbol'].upper()] = item.get('sector', 'Unknown')
         except: pass
 
-    def analyze_ticker(self, ticker, ohlcv_data, spy_data, sector_data=None):
+    def resample(self, ticker, ohlcv_data, timeframe=None):
+        """Daily bars -> this system's timeframe (cached per ticker)."""
+        return self.bars.get(ticker.upper(), ohlcv_data, timeframe or self.timeframe)
+
+    def prepare_all(self, ohlcv_data, ctx=None):
+        """
+        Prepare every engine's view of one symbol from a single shared
+        indicator pass (e.g. V5 vs V1 comparisons). Returns {engine.name: df}.
+        """
+        return self.planner.prepare(ohlcv_data, [self.v5, self.v1], ctx)
+
+    def analyze_ticker(self, ticker, ohlcv_data, spy_data, sector_data=None, ctx=None):
         """
         Main Analysis Pipeline (v6.0)
+        All inputs are daily bars; they are resampled to self.timeframe here.
+        Pass an IndicatorContext as ctx to share indicators across calls
+        (built on self.resample(ticker, ohlcv_data) for non-daily timeframes).
         """
         ticker = ticker.upper()
+        sector = self.sector_map.get(ticker, "Unknown")
         
         # 0. Context
+        ohlcv_data = self.resample(ticker, ohlcv_data)
+        if spy_data is not None:
+            spy_data = self.resample("SPY", spy_data)
+        if sector_data is not None:
+            sector_data = self.resample(DataProvider.get_etf_ticker(sector), sector_data)
         regime = MarketRegime.get_global_regime(spy_data)
         sector_trend = MarketRegime.get_sector_trend(sector_data)
         
         # 1. Routing
-        sector = self.sector_map.get(ticker, "Unknown")
-        
         active_engine = None
         if sector in self.GROUPS["GROWTH"]: active_engine = self.v5
         elif sector in self.GROUPS["DEFENSIVE"]: active_engine = self.v1
@@ -259,7 +292,7 @@ class QuantSystem:
         else: active_engine = self.v1
         
         # 2. Execution
-        df_prep = active_engine.prepare(ohlcv_data.copy())
+        df_prep = active_engine.prepare(ohlcv_data, ctx)
         signal, reason = active_engine.generate_signal(df_prep, regime, sector_trend)
         
         return {
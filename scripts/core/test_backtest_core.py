@@ -0,0 +1,69 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.research.backtest_core import BacktestUniverse, BacktestRules, run_period
+
+def make_frames(n_tickers=6, n=160, seed=2):
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for i in range(n_tickers):
+        dates = pd.bdate_range("2022-01-03", periods=n)
+        keep = rng.random(n) > (0.1 if i % 2 else 0.0)  # some symbols miss days
+        close = 20 * np.exp(np.cumsum(rng.normal(0.001, 0.03, keep.sum())))
+        frames[f"T{i}"] = pd.DataFrame({
+            'date': dates[keep], 'close': close,
+            'signal': rng.choice(["DIP_BUY", "LAUNCHPAD", "WAIT"], keep.sum(), p=[0.05, 0.05, 0.9]),
+            'x_trend': rng.normal(0, 1, keep.sum()),
+        })
+    return frames
+
+def reference_period(frames, start, end, capital=100000):
+    # Per-date scan the date-indexed core replaces (fixed exits, once-per-day cap)
+    all_dates = sorted(set().union(*[df['date'].tolist() for df in frames.values()]))
+    cash, positions, history, trades = capital, {}, [], []
+    for day in [d for d in all_dates if pd.Timestamp(start) <= d <= pd.Timestamp(end)]:
+        equity = cash
+        for t, pos in list(positions.items()):
+            row = frames[t][frames[t]['date'] == day]
+            if row.empty: continue
+            price = row.iloc[0]['close']
+            equity += pos['qty'] * price
+            pnl = (price - pos['entry_price']) / pos['entry_price']
+            if (day - pos['entry_date']).days >= 5 or pnl < -0.05 or pnl > 0.10:
+                cash += pos['qty'] * price
+                trades.append(pnl)
+                del positions[t]
+        history.append(equity)
+        if len(positions) < 5:
+            for t, df in frames.items():
+                row = df[df['date'] == day]
+                if row.empty or t in positions: continue
+                if row.iloc[0]['signal'] in ["DIP_BUY", "LAUNCHPAD"]:
+                    allocation = equity * 0.10
+                    if cash > allocation:
+                        cash -= allocation
+                        positions[t] = {'qty': allocation / row.iloc[0]['close'],
+                                        'entry_price': row.iloc[0]['close'], 'entry_date': day}
+    return history, trades, cash
+
+def test_run_period_matches_per_date_scan():
+    frames = make_frames()
+    universe = BacktestUniverse(frames)
+    for start, end in [("2022-01-01", "2022-12-31"), ("2022-03-15", "2022-06-30")]:
+        history, trades, cash = reference_period(frames, start, end)
+        res = run_period(universe, BacktestRules(), start, end)
+        assert res.equity == history
+        assert [t['pnl'] for t in res.trades] == trades
+        assert res.cash == cash
+
+def test_ranked_capped_entries_and_panic_gate():
+    frames = make_frames()
+    vix = pd.DataFrame({'date': pd.bdate_range("2022-01-03", periods=160), 'close': 50.0})
+    universe = BacktestUniverse(frames, {"^VIX": vix})
+    capped = run_period(universe, BacktestRules(rank_by_trend=True, cap_entries=True))
+    assert len(capped.positions) <= 5 and capped.trades
+    panic = run_period(universe, BacktestRules(panic_symbol="^VIX", panic_level=35))
+    assert not panic.trades and not panic.positions
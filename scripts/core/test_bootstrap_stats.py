@@ -0,0 +1,76 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.bootstrap_stats import (
+    sharpe, profit_factor, max_drawdown, bootstrap_distribution, lower_bound, point_metrics,
+    resample_indices, run_bootstrap,
+)
+
+def legacy_metrics(sample):
+    # Per-iteration loop the validators used to run
+    sample = pd.Series(sample)
+    s = (sample.mean() / sample.std()) * (252**0.5) if sample.std() > 0 else 0
+    w = sample[sample > 0].sum()
+    l = abs(sample[sample <= 0].sum())
+    pf = w / l if l > 0 else 0
+    equity = [1.0]
+    for r in sample: equity.append(equity[-1] * (1+r))
+    equity = np.array(equity)
+    mdd = ((equity - np.maximum.accumulate(equity))/np.maximum.accumulate(equity)).min()
+    return s, pf, mdd
+
+def test_metrics_match_legacy_loop():
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0.005, 0.04, (50, 30))
+    samples[3] = 0.02      # no losses, zero std
+    samples[4] = -0.01     # only losses
+    expected = np.array([legacy_metrics(row) for row in samples])
+    np.testing.assert_allclose(sharpe(samples), expected[:, 0], rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(profit_factor(samples), expected[:, 1], rtol=1e-9)
+    np.testing.assert_allclose(max_drawdown(samples), expected[:, 2], rtol=1e-9, atol=1e-15)
+    assert point_metrics(samples[0])['pf'] == profit_factor(samples[:1])[0]
+
+def test_seeded_chunked_and_lower_bound():
+    returns = np.random.default_rng(1).normal(0.01, 0.05, 40)
+    a = bootstrap_distribution(returns, 1000, rng=np.random.default_rng(7))
+    b = bootstrap_distribution(returns, 1000, rng=np.random.default_rng(7), chunk_cells=40 * 37)
+    for k in a:
+        np.testing.assert_array_equal(a[k], b[k])
+    # sorted(values)[int(iterations * (1 - confidence))]
+    assert lower_bound(a['pf'], 0.98) == sorted(a['pf'])[20]
+    assert bootstrap_distribution([], 10)['sharpe'].size == 0
+
+def test_block_methods_keep_runs():
+    rng = np.random.default_rng(2)
+    block = resample_indices(rng, 20, 50, 'block', 5)
+    assert block.max() < 50 and (np.diff(block.reshape(20, 10, 5), axis=2) == 1).all()
+    circ = resample_indices(rng, 20, 50, 'circular', 5).reshape(20, 10, 5)
+    assert (np.diff(circ, axis=2) % 50 == 1).all()
+    stat = resample_indices(rng, 200, 50, 'stationary', 5)
+    steps = np.diff(stat, axis=1) % 50 == 1
+    assert 0.7 < steps.mean() < 0.9  # continues with probability 1 - 1/5 (plus chance hits)
+
+def test_run_bootstrap_reproducible_and_stops_early():
+    returns = np.random.default_rng(3).normal(0.01, 0.05, 60)
+    serial = run_bootstrap(returns, 5000, method='stationary', block_size=4, seed=11, batch=1000)
+    pooled = run_bootstrap(returns, 5000, method='stationary', block_size=4, seed=11, batch=1000, workers=2)
+    for k in serial.distributions:
+        np.testing.assert_array_equal(serial.distributions[k], pooled.distributions[k])
+    assert serial.iterations == 5000 and not serial.converged
+
+    early = run_bootstrap(returns, 50000, seed=11, batch=1000, tol=0.05)
+    assert early.converged and early.iterations < 50000
+    # Same seed without the stop: the stopped run is a prefix of the full run
+    full = run_bootstrap(returns, 50000, seed=11, batch=1000)
+    np.testing.assert_array_equal(early.distributions['pf'], full.distributions['pf'][:early.iterations])
+
+def test_run_bootstrap_early_stop_independent_of_workers():
+    returns = np.random.default_rng(7).normal(0.005, 0.03, 120)
+    runs = [run_bootstrap(returns, 40000, seed=7, batch=1000, tol=0.01, workers=w) for w in (1, 4)]
+    assert runs[0].converged and runs[0].iterations < 40000
+    assert runs[0].iterations == runs[1].iterations and runs[0].lower_bounds == runs[1].lower_bounds
+    for k in runs[0].distributions:
+        np.testing.assert_array_equal(runs[0].distributions[k], runs[1].distributions[k])
@@ -0,0 +1,47 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.strategy_selector import QuantSystem
+from scripts.research.quant_engine import KineticMarketState
+
+def create_mock(n=600):
+    np.random.seed(11)
+    close = 100 * np.exp(np.cumsum(np.random.normal(0.0003, 0.02, n)))
+    return pd.DataFrame({
+        'date': pd.date_range(start="2021-01-01", periods=n),
+        'open': close, 'high': close*1.01, 'low': close*0.99, 'close': close, 'volume': [1000.0]*n
+    })
+
+def assert_close(full, compact, columns):
+    for col in columns:
+        assert compact[col].dtype == np.float32, col
+        a = full[col].to_numpy(np.float64)
+        b = compact[col].to_numpy(np.float64)
+        assert np.array_equal(np.isnan(a), np.isnan(b)), col
+        # float32 keeps ~7 significant digits
+        np.testing.assert_allclose(b, a, rtol=1e-6, atol=1e-6, equal_nan=True, err_msg=col)
+
+def test_compact_engines_match_float64():
+    df = create_mock()
+    full, compact = QuantSystem(), QuantSystem(compact=True)
+    for eng_full, eng_compact in ((full.v5, compact.v5), (full.v1, compact.v1)):
+        a, b = eng_full.prepare(df), eng_compact.prepare(df)
+        assert_close(a, b, list(eng_full.requires))
+        assert b['close'].dtype == np.float64  # prices are left alone
+
+def test_compact_kinetic_state_matches_float64():
+    df = create_mock()
+    full = KineticMarketState(df).analyze()
+    compact = KineticMarketState(df, compact=True).analyze()
+    assert_close(full, compact, ['mcginley', 'x_trend', 'y_momentum', 'z_structure'])
+    # Tags are decided in float64 before the downcast
+    assert (full['signal'] == compact['signal'].astype(object)).all()
+    assert compact.memory_usage(deep=True).sum() < full.memory_usage(deep=True).sum()
+
+if __name__ == "__main__":
+    test_compact_engines_match_float64()
+    test_compact_kinetic_state_matches_float64()
+    print("ok")
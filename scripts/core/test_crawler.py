@@ -0,0 +1,228 @@
+import sys
+import os
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.getcwd())
+from scripts.core.crawler import PageCache, PoliteCrawler
+from scripts.crawl_dataroma_managers import (UNKNOWN, UNKNOWN_TTL_DAYS, RotationAggregator, crawl_managers,
+                                             missing_sectors)
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "..", "research")
+# Local stand-in for dataroma.com: saved pages served under their live paths
+ROUTES = {
+    "/m/hist/p_hist.php": "debug_phist.html",
+    "/m/holdings.php": "debug_holdings.html",
+    "/m/custom.php": "debug_custom.html",
+    "/m/home.php": "debug_hist.html",
+}
+
+
+def serve(delay=0.05):
+    pages = {path: open(os.path.join(PAGES_DIR, name), encoding="utf-8").read().encode()
+             for path, name in ROUTES.items()}
+    stats = {"in_flight": 0, "peak": 0, "starts": [], "paths": []}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                stats["in_flight"] += 1
+                stats["peak"] = max(stats["peak"], stats["in_flight"])
+                stats["starts"].append(time.monotonic())
+                stats["paths"].append(self.path)
+            time.sleep(delay)
+            body = pages.get(self.path.split("?")[0])
+            etag = '"%s"' % hashlib.md5(body).hexdigest() if body else None
+            if etag and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self.send_response(200 if body else 404)
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body or b"")
+            with lock:
+                stats["in_flight"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}", pages, stats
+
+
+def test_concurrency_ceiling_and_rate_budget():
+    server, base, pages, stats = serve()
+    paths = list(ROUTES) * 4
+    try:
+        with PoliteCrawler(max_per_host=3, rpm=1200, delay=(0, 0.02), seed=1, verbose=False) as crawler:
+            t0 = time.monotonic()
+            texts = crawler.run(crawler.fetch_many([base + p for p in paths]))
+            elapsed = time.monotonic() - t0
+    finally:
+        server.shutdown()
+    assert [t.encode() for t in texts] == [pages[p] for p in paths]
+    assert stats["peak"] <= 3
+    # 1200 rpm -> start slots 50ms apart (arrivals jitter by thread hand-off, so allow 30ms per span)
+    starts = stats["starts"]
+    for k in (1, 4, len(starts) - 1):
+        assert min(b - a for a, b in zip(starts, starts[k:])) >= k * 0.05 - 0.03
+    # concurrency keeps the run far below serial time
+    assert elapsed < len(paths) * (0.05 + 0.05 + 0.02)
+
+
+def test_missing_page_is_none():
+    server, base, _, _ = serve(delay=0)
+    try:
+        with PoliteCrawler(rpm=0, delay=(0, 0), retries=1, verbose=False) as crawler:
+            assert crawler.run(crawler.fetch_soup(base + "/m/nope.php")) is None
+            assert crawler.requests == 2 and crawler.failures == 2
+    finally:
+        server.shutdown()
+
+
+def test_manager_sectors_resolved_once_per_distinct_ticker():
+    server, base, _, stats = serve(delay=0)
+    sector_map = {"AAPL": "Technology", "AXP": "Financials", "KO": UNKNOWN}
+    unknown, targets = {}, [{"code": "BRK", "name": "Berkshire"}, {"code": "BRK2", "name": "Copycat"}]
+    try:
+        with PoliteCrawler(rpm=0, delay=(0, 0), retries=0, verbose=False) as crawler:
+            histories = crawler.run(crawl_managers(crawler, targets, sector_map, unknown, base))
+    finally:
+        server.shutdown()
+    assert list(histories) == ["BRK", "BRK2"] and histories["BRK"]["history"] == histories["BRK2"]["history"]
+    hist = histories["BRK"]["history"]
+    assert len(hist) == 20 and next(iter(hist)) == "2025 Q3"
+    latest = hist["2025 Q3"]
+    assert latest["sectors"]["Technology"] == 22.69 and latest["sectors"]["Financials"] == 18.84
+    assert latest["coverage_pct"] == round(sum(latest["sectors"].values()), 2)
+    # Two managers, one lookup per distinct unknown ticker; failed fetches are not cached
+    lookups = [p for p in stats["paths"] if p.startswith("/m/stock.php")]
+    assert len(lookups) == len(set(lookups)) == len(stats["paths"]) - 2
+    assert "/m/stock.php?sym=KO" not in lookups and set(sector_map) == {"AAPL", "AXP", "KO"}
+    assert "KO" in unknown  # legacy Unknown entries start their negative-cache clock
+
+
+def test_unknown_sectors_expire():
+    now = datetime(2026, 1, 31)
+    sector_map = {"A": "Energy", "B": UNKNOWN, "C": UNKNOWN}
+    unknown = {"C": (now - timedelta(days=UNKNOWN_TTL_DAYS)).isoformat()}
+    assert missing_sectors(["A", "B", "C", "D"], sector_map, unknown, now) == ["C", "D"]
+    assert unknown["B"] == now.isoformat()
+
+
+def test_page_cache_ttl_conditional_requests_and_parse_memo(tmp_path):
+    server, base, pages, stats = serve(delay=0)
+    rows_of = lambda soup: len(soup.find("table", id="grid").find_all("tr"))
+    hist, holdings = base + "/m/hist/p_hist.php?f=BRK", base + "/m/holdings.php?m=BRK"
+    try:
+        def crawl():
+            with PoliteCrawler(rpm=0, delay=(0, 0), retries=0, verbose=False,
+                               cache=PageCache(str(tmp_path)), ttl_hours={"/m/hist/": 24}) as crawler:
+                text = crawler.run(crawler.fetch(hist))
+                return text, crawler.run(crawler.fetch_parsed(holdings, rows_of)), crawler
+
+        first, rows, crawler = crawl()
+        assert crawler.requests == 2 and crawler.parses == 1 and first.encode() == pages["/m/hist/p_hist.php"]
+        # Within its TTL the history page is not requested; the holdings page is revalidated (304)
+        second, cached_rows, crawler = crawl()
+        assert second == first and cached_rows == rows
+        assert crawler.requests == 1 and crawler.cache_hits == 1 and crawler.not_modified == 1 and crawler.parses == 0
+        assert [p.split("?")[0] for p in stats["paths"][-1:]] == ["/m/holdings.php"]
+        # New content is re-parsed; an unreachable page falls back to the stored copy
+        pages["/m/holdings.php"] = pages["/m/holdings.php"].replace(b"</tbody>", b"<tr><td>x</td></tr></tbody>", 1)
+        _, changed_rows, crawler = crawl()
+        assert changed_rows == rows + 1 and crawler.parses == 1
+        del pages["/m/holdings.php"]
+        _, stale_rows, crawler = crawl()
+        assert crawler.failures == 1 and stale_rows == rows + 1
+    finally:
+        server.shutdown()
+
+
+def test_parser_change_invalidates_parse_memo(tmp_path):
+    server, base, _, _ = serve(delay=0)
+    url = base + "/m/holdings.php?m=BRK"
+
+    def rows_v1(soup):
+        return len(soup.find("table", id="grid").find_all("tr"))
+
+    def rows_v2(soup):  # same memo name, fixed parser
+        return len(soup.find("table", id="grid").find_all("tr")) - 1
+
+    try:
+        def parse(fn):
+            with PoliteCrawler(rpm=0, delay=(0, 0), retries=0, verbose=False, cache=PageCache(str(tmp_path))) as crawler:
+                return crawler.run(crawler.fetch_parsed(url, fn, name="rows")), crawler.parses
+
+        first, parses = parse(rows_v1)
+        assert parses == 1 and parse(rows_v1) == (first, 0)
+        assert parse(rows_v2) == (first - 1, 1)
+        assert parse(rows_v2) == (first - 1, 0)
+    finally:
+        server.shutdown()
+
+
+def test_batch_checkpoint_resume(tmp_path):
+    from scripts.batch_crawl_dataroma import crawl_batch, load_checkpoint, pending_tickers
+    checkpoint, saved = str(tmp_path / "checkpoint.json"), []
+
+    async def crawl(crawler, ticker):
+        if ticker == "BAD":
+            raise RuntimeError("overview page unavailable")
+        return {"ticker": ticker, "updated_at": datetime.now().isoformat()}
+
+    stale = (datetime.now() - timedelta(hours=30)).isoformat()
+    completed = {"OLD": stale, "NEW": datetime.now().isoformat()}
+    todo = pending_tickers(["NEW", "OLD", "BAD", "AAA"], completed, 20)
+    assert todo == ["OLD", "BAD", "AAA"]
+    with PoliteCrawler(verbose=False) as crawler:
+        success, failed = crawler.run(crawl_batch(crawler, todo, completed, checkpoint, crawl=crawl, save=saved.append))
+    assert sorted(success) == ["AAA", "OLD"] and failed == ["BAD"]
+    # An interrupted or repeated run only picks up what is missing or stale
+    resumed = load_checkpoint(checkpoint)
+    assert set(resumed) == {"AAA", "NEW", "OLD"} and resumed["OLD"] != stale
+    assert pending_tickers(["NEW", "OLD", "BAD", "AAA"], resumed, 20) == ["BAD"]
+    assert pending_tickers(["NEW"], resumed, 0) == ["NEW"]
+
+
+def test_rotation_aggregator_matches_full_recompute(tmp_path):
+    import json, random
+    rng = random.Random(7)
+    sectors, periods = ["Tech", "Energy", "Financials", UNKNOWN], [f"{y} Q{q}" for y in (2024, 2025) for q in range(1, 5)]
+    histories = {}
+    for m in range(25):
+        hist = {}
+        for period in rng.sample(periods, rng.randint(1, len(periods))):
+            secs = {s: rng.uniform(0, 30) for s in rng.sample(sectors, rng.randint(1, 4))}
+            hist[period] = {"sectors": secs, "coverage_pct": round(sum(secs.values()) * rng.choice([1, 0.1]), 2)}
+        histories[f"M{m}"] = hist
+
+    # Reference: every period re-averaged from scratch over all managers
+    expected = {}
+    for period in sorted({p for h in histories.values() for p in h}):
+        sums, count = {}, 0
+        for h in histories.values():
+            if period in h and h[period]["coverage_pct"] >= 10:
+                for sec, pct in h[period]["sectors"].items():
+                    sums[sec] = sums.get(sec, 0.0) + pct * 100.0 / h[period]["coverage_pct"]
+                count += 1
+        if count:
+            expected[period] = {sec: round(v / count, 2) for sec, v in sums.items()}
+
+    out = tmp_path / "rotation.json"
+    aggregator = RotationAggregator(str(out))
+    for code, hist in histories.items():
+        aggregator.add(code, hist)
+    assert not out.exists()  # written once, at the end of the run
+    aggregator.flush()
+    saved = json.loads(out.read_text())
+    assert saved["rotation"] == expected and list(saved["rotation"]) == list(expected)
+    assert all(list(saved["rotation"][p]) == list(expected[p]) for p in expected)
+    assert saved["managers_scraped"] == list(histories)
@@ -0,0 +1,104 @@
+import sys
+import os
+import json
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+import scripts.core.fear_greed as fg
+from scripts.core.fear_greed import FearGreedEngine, load_panel, COMPONENTS, TICKERS
+
+def make_bars(index, base, seed):
+    close = base * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.012, len(index))))
+    return pd.DataFrame({'Open': close, 'High': close, 'Low': close, 'Close': close, 'Volume': 1e6}, index=index)
+
+def test_panel_from_store_then_cache(tmp_path, monkeypatch):
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=800)
+    bars = {t: make_bars(index, base, i) for i, (t, base) in enumerate(zip(TICKERS, (4000, 20, 95, 100, 15000)))}
+    store = tmp_path / "ohlcv"
+    store.mkdir()
+    for ticker, stem in fg.STORE_NAMES.items():
+        df = bars[ticker]
+        # generate-real-ohlcv-yfinance.py schema: epoch ms of the New York midnight
+        ts = df.index.tz_localize("America/New_York").tz_convert("UTC").as_unit("ms").asi8
+        payload = {"timestamps": ts.tolist(), **{c.lower(): df[c].tolist() for c in fg.FIELDS}, "metadata": {"period": "1d"}}
+        (store / f"{stem}.json").write_text(json.dumps(payload))
+
+    calls = []
+    def download(tickers, period):
+        calls.append(list(tickers))
+        return {t: bars[t] for t in tickers}
+    monkeypatch.setattr(fg, "_download", download)
+
+    kwargs = dict(period="2y", cache_dir=str(tmp_path / "cache"), ohlcv_dir=str(store))
+    panel = load_panel(**kwargs)
+    assert calls == [["IEF", "^NYA"]]  # the store covers SPX / VIX / JNK
+    assert list(panel['Close'].columns) == list(TICKERS)
+    np.testing.assert_allclose(panel['Close'].loc[index[-1]], [bars[t]['Close'].iloc[-1] for t in TICKERS])
+    load_panel(**kwargs)
+    assert len(calls) == 1  # served from the local cache
+
+def test_components_match_reference_formulas():
+    index = pd.bdate_range("2020-01-01", periods=700)
+    panel = pd.concat({t: make_bars(index, base, i) for i, (t, base) in enumerate(zip(TICKERS, (4000, 20, 95, 100, 15000)))},
+                      axis=1).swaplevel(axis=1)[list(fg.FIELDS)]
+    engine = FearGreedEngine(panel)
+    vix, spx = panel['Close']['^VIX'], panel['Close']['^GSPC']
+
+    comps = engine.components(lookback=63, scale=15)
+    assert list(comps.columns) == list(COMPONENTS)
+    z = (vix - vix.rolling(63).mean()) / vix.rolling(63).std()
+    np.testing.assert_allclose(comps['options'], (50 - z * 15).clip(0, 100), equal_nan=True)
+    fgi = engine.index(comps)
+    assert fgi.iloc[-1] == comps.iloc[-1].mean()
+
+    fixed = engine.components(normalization='fixed')
+    ma = spx.rolling(125).mean()
+    mom = (((spx - ma) / ma * 100).clip(-5, 5) + 5) * 10
+    np.testing.assert_allclose(fixed['momentum'], mom, equal_nan=True)
+    assert fixed.iloc[300:].min().min() >= 0 and fixed.iloc[300:].max().max() <= 100
+
+def test_history_extends_incrementally(tmp_path, monkeypatch):
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=900)
+    full = pd.concat({t: make_bars(index, base, i + 10) for i, (t, base) in enumerate(zip(TICKERS, (4000, 20, 95, 100, 15000)))},
+                     axis=1).swaplevel(axis=1)[list(fg.FIELDS)]
+    visible = {'until': index[-15]}
+    periods = []
+    def fake_load(period, **kwargs):
+        periods.append(period)
+        return full[full.index <= visible['until']]
+    monkeypatch.setattr(fg, "load_panel", fake_load)
+
+    history, state = str(tmp_path / "history.json"), str(tmp_path / "state.json")
+    first = fg.update_history(history, state)            # no files yet: backfill
+    assert first.index[-1] == index[-15] and periods == [fg.HISTORY_PERIOD]
+    visible['until'] = index[-1]
+    extended = fg.update_history(history, state)         # only the last 14 bars are scored
+    assert periods[-1] == "1mo" and len(extended) == len(first) + 14
+    rebuilt = fg.update_history(str(tmp_path / "h2.json"), str(tmp_path / "s2.json"), backfill=True)
+    pd.testing.assert_index_equal(extended.index, rebuilt.index)
+    # Rounded to 2 decimals; rolling sums over a shorter tail may flip the last digit
+    assert (extended - rebuilt).abs().max().max() <= 0.011
+    assert len(json.load(open(state))['dates']) == fg.HISTORY_WARMUP + 125
+    assert fg._history_frame(json.load(open(history))).equals(extended)
+
+def test_lagging_store_is_downloaded(tmp_path, monkeypatch):
+    index = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=800)
+    bars = {t: make_bars(index, base, i) for i, (t, base) in enumerate(zip(TICKERS, (4000, 20, 95, 100, 15000)))}
+    store = tmp_path / "ohlcv"
+    store.mkdir()
+    for ticker, stem in fg.STORE_NAMES.items():
+        df = bars[ticker].iloc[:-3] if ticker == "^VIX" else bars[ticker]  # VIX store missed 3 daily updates
+        ts = df.index.tz_localize("America/New_York").tz_convert("UTC").as_unit("ms").asi8
+        payload = {"timestamps": ts.tolist(), **{c.lower(): df[c].tolist() for c in fg.FIELDS}, "metadata": {"period": "1d"}}
+        (store / f"{stem}.json").write_text(json.dumps(payload))
+
+    calls = []
+    def download(tickers, period):
+        calls.append(list(tickers))
+        return {t: bars[t] for t in tickers}
+    monkeypatch.setattr(fg, "_download", download)
+
+    panel = load_panel(period="2y", cache_dir=str(tmp_path / "cache"), ohlcv_dir=str(store))
+    assert calls == [["IEF", "^NYA"], ["^VIX"]]
+    assert panel['Close']['^VIX'].loc[index[-1]] == bars['^VIX']['Close'].iloc[-1]
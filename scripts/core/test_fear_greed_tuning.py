@@ -0,0 +1,45 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.fear_greed import FearGreedEngine, TICKERS, FIELDS
+from scripts.core.fear_greed_tuning import RollingMoments, truth_rows, weight_mse, zscore_grid
+
+def make_engine(n=700, seed=3):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2021-01-04", periods=n)
+    closes = {t: base * np.exp(np.cumsum(rng.normal(0, 0.012, n))) for t, base in zip(TICKERS, (4000, 20, 95, 100, 15000))}
+    panel = pd.concat({f: pd.DataFrame(closes, index=index) for f in FIELDS}, axis=1)
+    return FearGreedEngine(panel)
+
+def test_rolling_moments_match_pandas():
+    metrics = make_engine().signed_metrics()
+    rows = np.array([0, 130, 400, 699])
+    mean, std = RollingMoments(metrics).at(rows, [2, 63, 125])
+    for i, lookback in enumerate((2, 63, 125)):
+        roll = metrics.rolling(lookback)
+        np.testing.assert_allclose(mean[i], roll.mean().to_numpy()[rows], rtol=1e-9, atol=1e-12, equal_nan=True)
+        np.testing.assert_allclose(std[i], roll.std().to_numpy()[rows], rtol=1e-7, atol=1e-12, equal_nan=True)
+
+def test_grid_matches_engine_scenarios():
+    engine = make_engine()
+    truth = {"2023-06-01": 30, "2023-07-04": 55, "2023-09-15": 70, "2020-01-01": 50}  # last one: before any data
+    rows, targets = truth_rows(engine.closes.index, truth)
+    grid = zscore_grid(engine.signed_metrics(), rows, targets, [20, 125, 750], [10, 20.5], max_cells=50)
+    for lookback in grid.index:
+        for scale in grid.columns:
+            fgi = engine.index(engine.components(lookback, scale)).to_numpy()[rows]
+            ok = ~np.isnan(fgi)
+            expected = np.abs(fgi[ok] - targets[ok]).mean() if ok.any() else 999
+            assert np.isclose(grid.loc[lookback, scale], expected, rtol=1e-9)
+    assert grid.loc[750].eq(999).all()  # longer than the whole series
+
+def test_weight_mse_batches():
+    rng = np.random.default_rng(0)
+    X, y = rng.uniform(0, 100, (12, 7)), rng.uniform(0, 100, 12)
+    W = rng.dirichlet(np.ones(7), 50) * 3  # unnormalized rows
+    batch = weight_mse(X, y, W)
+    assert batch.shape == (50,) and np.isclose(batch[7], weight_mse(X, y, W[7]))
+    assert np.isclose(weight_mse(X, y, np.ones(7)), np.mean((X.mean(axis=1) - y) ** 2))
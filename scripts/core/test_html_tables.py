@@ -0,0 +1,39 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.getcwd())
+from scripts.core.html_tables import HAS_LXML, extract_tables
+from scripts.crawl_dataroma_managers import parse_history_rows
+
+PAGES_DIR = os.path.join(os.path.dirname(__file__), "..", "research")
+IDS = ("grid", "t1", "t10", "bigbets")
+
+
+def read(name):
+    return open(os.path.join(PAGES_DIR, name), encoding="utf-8").read()
+
+
+@pytest.mark.skipif(not HAS_LXML, reason="lxml not installed")
+@pytest.mark.parametrize("name", ["debug_hist.html", "debug_holdings.html", "debug_phist.html"])
+def test_backends_agree_on_saved_pages(name):
+    html = read(name)
+    fast, slow = extract_tables(html, IDS, "lxml"), extract_tables(html, IDS, "html.parser")
+    assert fast == slow and fast
+    assert parse_history_rows(fast) == parse_history_rows(slow)
+
+
+def test_records():
+    html = ('<table id="grid"><thead><tr><th>P</th></tr></thead><tbody>'
+            '<tr class="q_chg a"><td class="sym"><span><a href="/m/stock.php?sym=AAPL">AAPL</a>'
+            '<div>Apple&nbsp;22.69%</div></span></td><td><a>no href</a></td></tr></tbody></table>')
+    for backend in ("html.parser",) + (("lxml",) if HAS_LXML else ()):
+        grid = extract_tables(html, "grid", backend)["grid"]
+        assert len(grid.rows) == 2 and grid.rows[0].cells == [] and len(grid.body) == 1
+        row = grid.body[0]
+        assert row.classes == ["q_chg", "a"] and row.cells[0].classes == ["sym"]
+        assert row.cells[0].text == "AAPLApple\xa022.69%" and row.cells[0].link == ("/m/stock.php?sym=AAPL", "AAPL")
+        assert row.cells[1].link.href is None
+        assert extract_tables("", "grid", backend) == {}
+    with pytest.raises(ValueError):
+        extract_tables(html, "grid", "html5lib")
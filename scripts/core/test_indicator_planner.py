@@ -0,0 +1,37 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.strategy_selector import QuantSystem
+from scripts.core.indicator_planner import IndicatorContext, IndicatorPlanner, spec
+
+def create_mock(n=400):
+    np.random.seed(7)
+    close = 100 * np.exp(np.cumsum(np.random.normal(0.0005, 0.02, n)))
+    return pd.DataFrame({
+        'date': pd.date_range(start="2022-01-01", periods=n),
+        'open': close, 'high': close*1.01, 'low': close*0.99, 'close': close, 'volume': [1000]*n
+    })
+
+def test_shared_context_matches_isolated_prepare():
+    qs = QuantSystem()
+    df = create_mock()
+    before = df.copy()
+
+    ctx = IndicatorContext(df)
+    shared = qs.prepare_all(df, ctx)
+    for engine in (qs.v5, qs.v1):
+        pd.testing.assert_frame_equal(shared[engine.name], engine.prepare(df), check_exact=True)
+
+    # Source frame is never mutated
+    pd.testing.assert_frame_equal(df, before)
+    # stoch_rsi_k(14) is declared by both engines but computed once
+    union = IndicatorPlanner.plan([qs.v5, qs.v1])
+    assert len(union) == len(qs.v5.requires) + len(qs.v1.requires) - 1
+    assert spec('stoch_rsi_k', period=14) in ctx
+
+if __name__ == "__main__":
+    test_shared_context_matches_isolated_prepare()
+    print("ok")
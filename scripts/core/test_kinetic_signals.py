@@ -0,0 +1,38 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.research.quant_engine import KineticMarketState, SIGNAL_TAGS
+
+def legacy_tag(x, y, z):
+    # Row-wise rules the vectorized tagging replaces
+    if z > 0.8 and x > 0: return "LAUNCHPAD"
+    if x > 0.5 and y < 0.2: return "DIP_BUY"
+    if x > 1.0 and y > 0.9: return "MOMENTUM_RUN"
+    if x < -0.5: return "AVOID"
+    return "WAIT"
+
+def test_vectorized_tags_follow_precedence():
+    rng = np.random.default_rng(2)
+    # Thresholds themselves plus random points (ties and overlaps between rules)
+    grid = np.array([-3, -0.5, 0, 0.2, 0.5, 0.8, 0.9, 1.0, 3])
+    x, y, z = (np.concatenate([rng.choice(grid, 4000), rng.uniform(-3, 3, 1000)]) for _ in range(3))
+    df = pd.DataFrame({'x_trend': x, 'y_momentum': y, 'z_structure': z})
+    tags = KineticMarketState(df).tag_signals(df)
+    assert list(tags.categories) == SIGNAL_TAGS
+    assert list(tags) == [legacy_tag(*v) for v in zip(x, y, z)]
+
+def test_commentary_rendered_for_published_row():
+    n = 400
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(9).normal(0.0003, 0.02, n)))
+    df = pd.DataFrame({'time': pd.date_range("2022-01-03", periods=n).astype(str), 'open': close,
+                       'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': 1000.0})
+    engine = KineticMarketState(df)
+    out = engine.analyze()
+    assert 'commentary' not in out.columns and out['signal'].dtype == 'category'
+    latest = out.iloc[-1]
+    assert engine.commentary() == engine.commentary(latest) == engine.commentary(n - 1)
+    avoid = out.index[out['signal'] == "AVOID"][0]
+    assert engine.commentary(avoid).startswith(f"Trend is Down (X={out.loc[avoid, 'x_trend']:.2f})")
@@ -0,0 +1,76 @@
+import os
+import json
+import importlib.util
+from datetime import datetime, timedelta, timezone
+
+SCRIPT = os.path.join(os.path.dirname(__file__), "..", "update-metadata-python.py")
+spec = importlib.util.spec_from_file_location("update_metadata_python", SCRIPT)
+upd = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(upd)
+
+NOW = datetime.now(timezone.utc)
+
+def item(symbol, age_days, confidence=1.0, naive=False):
+    verified = NOW - timedelta(days=age_days)
+    if naive:
+        verified = verified.replace(tzinfo=None)
+    return {'symbol': symbol, 'sector': 'Technology', 'industry': 'Semiconductors', 'confidence': confidence,
+            'sources': ['yfinance_python' if confidence == 1.0 else 'fallback_data'],
+            'last_verified_at': verified.isoformat()}
+
+def make_updater(tmp_path, symbols, existing, force=False):
+    updater = upd.YFinanceMetadataUpdater(rate=0, force=force)
+    updater.output_file = tmp_path / "symbols_metadata.json"
+    updater.sector_file = tmp_path / "sector_industry.json"
+    updater.stocks_config_file = tmp_path / "stocks.json"
+    updater.stocks_config_file.write_text(json.dumps({"stocks": [{"symbol": s} for s in symbols]}))
+    updater.output_file.write_text(json.dumps({"items": existing}))
+    fetched = []
+    def fetch(symbol):
+        fetched.append(symbol)
+        return dict(item(symbol, 0), sector='Refreshed')
+    updater.get_stock_metadata = fetch
+    return updater, fetched
+
+def test_needs_refresh_paths():
+    updater = upd.YFinanceMetadataUpdater(ttl_days=7)
+    assert updater.needs_refresh(None, NOW)                          # missing
+    assert updater.needs_refresh(item('A', 1, confidence=0.8), NOW)  # fallback
+    assert updater.needs_refresh(item('A', 8), NOW)                  # past TTL
+    assert not updater.needs_refresh(item('A', 6), NOW)
+    assert not updater.needs_refresh(item('A', 6, naive=True), NOW)  # naive stamps read as UTC
+    assert updater.needs_refresh(item('A', 8, naive=True), NOW)
+    assert updater.needs_refresh(dict(item('A', 1), last_verified_at='not a date'), NOW)
+    # Weekly cron vs 7-day TTL: last week's stamp is refreshed whatever the runner start jitter
+    verified = datetime(2026, 10, 11, 2, 4, tzinfo=timezone.utc)
+    last_week = dict(item('A', 0), last_verified_at=verified.isoformat())
+    for run in (datetime(2026, 10, 18, 2, 1, tzinfo=timezone.utc), datetime(2026, 10, 18, 2, 9, tzinfo=timezone.utc)):
+        assert updater.needs_refresh(last_week, run)
+    assert not updater.needs_refresh(last_week, verified + timedelta(days=6, hours=11))
+    # next_refresh: earliest due time; a fallback item is due now
+    assert updater.next_refresh([item('A', 1), item('B', 3)], NOW) == (NOW - timedelta(days=3) + timedelta(days=7)).isoformat()
+    assert updater.next_refresh([item('A', 1), item('C', 0, confidence=0.8)], NOW) == NOW.isoformat()
+
+def test_only_stale_items_refetched_and_rest_carried_forward(tmp_path):
+    existing = [item('FRESH', 1), item('STALE', 9), item('FALLBACK', 1, confidence=0.8), item('NAIVE', 2, naive=True),
+                item('DROPPED', 1)]
+    symbols = ['STALE', 'FRESH', 'NEW', 'FALLBACK', 'NAIVE']
+    updater, fetched = make_updater(tmp_path, symbols, existing)
+    assert updater.update_metadata()
+    out = json.loads(updater.output_file.read_text())
+
+    assert sorted(fetched) == ['FALLBACK', 'NEW', 'STALE']
+    assert [i['symbol'] for i in out['items']] == symbols  # universe order; DROPPED is no longer tracked
+    by_symbol = {i['symbol']: i for i in out['items']}
+    assert by_symbol['FRESH'] == existing[0] and by_symbol['NAIVE'] == existing[3]  # carried forward unchanged
+    assert all(by_symbol[s]['sector'] == 'Refreshed' for s in fetched)
+    meta = out['refresh_metadata']
+    assert (meta['symbols_updated'], meta['symbols_success'], meta['symbols_carried_forward']) == (3, 3, 2)
+    assert out['next_refresh'] == (datetime.fromisoformat(existing[3]['last_verified_at'])
+                                   .replace(tzinfo=timezone.utc) + timedelta(days=7)).isoformat()
+
+def test_force_refetches_everything(tmp_path):
+    updater, fetched = make_updater(tmp_path, ['A', 'B'], [item('A', 1), item('B', 1)], force=True)
+    updater.update_metadata()
+    assert sorted(fetched) == ['A', 'B']
+    assert json.loads(updater.output_file.read_text())['refresh_metadata']['symbols_carried_forward'] == 0
@@ -0,0 +1,55 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.portfolio_kernel import MarketPanel, PortfolioConfig, run_portfolio, EXIT_V1, REASON_TARGET
+
+def make_panel(close, entry, exit_=None, strategy=None):
+    close = np.asarray(close, dtype=float)
+    d, s = close.shape
+    return MarketPanel(
+        dates=pd.bdate_range("2024-01-01", periods=d),
+        symbols=[f"S{i}" for i in range(s)],
+        close=close,
+        avail=~np.isnan(close),
+        entry=np.asarray(entry, dtype=bool),
+        exit=np.zeros((d, s), bool) if exit_ is None else np.asarray(exit_, dtype=bool),
+        atr=np.zeros((d, s)),
+        strategy=np.zeros(s, np.int8) if strategy is None else np.asarray(strategy, np.int8),
+    )
+
+def test_fixed_slots_sell_first_and_max_positions():
+    close = [[10, 20, 40], [10, 20, 40], [20, 20, 40]]
+    entry = [[1, 1, 1], [0, 0, 0], [0, 0, 1]]
+    exit_ = [[0, 0, 0], [0, 0, 0], [1, 0, 0]]
+    cfg = PortfolioConfig(initial_capital=25000, max_positions=2, slot_size=10000)
+    res = run_portfolio(make_panel(close, entry, exit_), cfg)
+    # Day 0: S0 and S1 bought, S2 blocked by max_positions
+    # Day 2: S0 sold at 2x first, which frees the slot for S2 the same day
+    assert list(res.positions) == ["S1", "S2"]
+    assert res.cash == 25000 - 20000 + 20000 - 10000
+    assert res.equity[0] == 25000 and res.equity[-1] == 35000
+    assert len(res.trades) == 1 and res.trades[0][6] == 20000
+
+def test_percent_sizing_dust_and_stale_marks():
+    close = [[10, 10, 10], [np.nan, 11.5, 10], [10, 10, 10]]
+    entry = [[1, 1, 1], [0, 0, 0], [0, 0, 0]]
+    cfg = PortfolioConfig(initial_capital=10000, max_positions=5, sizing='percent', pos_size_pct=0.45,
+                          dust=1000, mark_after='sells')
+    res = run_portfolio(make_panel(close, entry, strategy=[EXIT_V1] * 3), cfg)
+    # 4500 + 4500, then S2 takes the remaining 1000 cash (not below dust)
+    assert res.equity[0] == 10000
+    assert res.positions["S2"]["size"] == 1000
+    # S1 hits the +10% target and is sold; S0 has no bar on day 1, so it is
+    # valued at its last close (10) and the day is flagged stale
+    assert res.trades[0][0] == 1 and res.trades[0][7] == REASON_TARGET
+    assert np.isclose(res.equity[1], 4500 * 1.15 + 1000 + 4500)
+    assert list(res.stale) == [0, 1, 0] and res.stale_days == 1
+    assert list(res.positions) == ["S0", "S2"]
+
+if __name__ == "__main__":
+    test_fixed_slots_sell_first_and_max_positions()
+    test_percent_sizing_dust_and_stale_marks()
+    print("ok")
@@ -0,0 +1,62 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.portfolio_kernel import MarketPanel, PortfolioConfig
+from scripts.core.portfolio_manager import SignalInputs, signal_events, run_signal_portfolio
+from scripts.core.portfolio_sweep import build_grid, parse_sizing, run_sweep, split_tasks
+
+def make_inputs(n_days=120, n_syms=6, seed=3):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2023-01-02", periods=n_days)
+    blocks = []
+    for j in range(n_syms):
+        close = 50 * np.exp(np.cumsum(rng.normal(0.001, 0.02, n_days)))
+        blocks.append((f"S{j}", j % 2 == 0, dates, close, close * 1.01, close * 0.03,
+                       rng.random(n_days) < 0.08, rng.random(n_days) < 0.02))
+    inputs = SignalInputs.from_blocks(blocks)
+    inputs.align(dates)
+    close = inputs.close.reshape(n_syms, n_days).T.copy()
+    shape = close.shape
+    panel = MarketPanel(dates=dates, symbols=inputs.symbols, close=close, avail=np.ones(shape, bool),
+                        entry=np.zeros(shape, bool), exit=np.zeros(shape, bool),
+                        atr=np.zeros(shape), strategy=np.zeros(n_syms, np.int8))
+    return inputs, panel
+
+def test_signal_events_exit_params():
+    inputs, _ = make_inputs()
+    rows, is_buy = signal_events(inputs, PortfolioConfig())
+    # Per symbol, events alternate BUY/SELL starting with a BUY
+    for j in range(len(inputs.symbols)):
+        mine = is_buy[inputs.sym_of_row[rows] == j]
+        assert all(mine[::2]) and not any(mine[1::2])
+    # A tighter V1 stop can only shorten (never lengthen) the holds
+    tight = signal_events(inputs, PortfolioConfig(v1_stop=0.001, v1_target=0.001))
+    assert len(tight[0]) >= len(rows)
+
+def test_sweep_groups_and_matches_direct_runs():
+    inputs, panel = make_inputs()
+    grid = build_grid([2, 4], parse_sizing("fixed:5000,percent:0.2"), v1_stop=[0.03, 0.05])
+    assert len(grid) == 2 and all(len(configs) == 4 for _, configs in grid)
+
+    table = run_sweep(inputs, panel, grid, workers=1)
+    assert len(table) == 8 and list(table.index) == list(range(1, 9))
+    assert table['sharpe'].is_monotonic_decreasing
+
+    cfg = PortfolioConfig(max_positions=4, sizing='fixed', slot_size=5000, v1_stop=0.03)
+    direct = run_signal_portfolio(panel, inputs, cfg)
+    row = table[(table.max_positions == 4) & (table.sizing == "$5,000 per slot") & (table.v1_stop == 0.03)]
+    assert row['final_equity'].iloc[0] == direct.equity[-1]
+
+    pooled = run_sweep(inputs, panel, grid, workers=2)
+    pd.testing.assert_frame_equal(table, pooled)
+
+def test_single_group_is_split_across_workers():
+    inputs, panel = make_inputs()
+    grid = build_grid([1, 2, 3, 4, 5], parse_sizing("fixed:5000,percent:0.1,percent:0.2"))
+    assert len(grid) == 1
+    tasks = split_tasks(grid, workers=2)
+    assert len(tasks) >= 2 and [c for _, chunk in tasks for c in chunk] == grid[0][1]
+    pd.testing.assert_frame_equal(run_sweep(inputs, panel, grid, workers=1), run_sweep(inputs, panel, grid, workers=2))
@@ -0,0 +1,80 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.result_cache import ResultCache, fingerprint, code_fingerprint
+
+def make_frame(n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({'date': pd.bdate_range("2023-01-02", periods=n),
+                         'close': 50 + rng.normal(0, 1, n).cumsum()})
+
+TRADES = [{'Symbol': 'AAA', 'EntryDate': pd.Timestamp("2023-01-03"), 'ExitDate': pd.Timestamp("2023-01-09"),
+           'PnL': 0.0123, 'Days': 6, 'Reason': 'Chandelier'}]
+
+def test_fingerprint_tracks_inputs():
+    df = make_frame()
+    assert fingerprint(df, {'a': 1}) == fingerprint(df.copy(), {'a': 1})
+    changed = df.copy()
+    changed.loc[5, 'close'] += 1e-9
+    assert fingerprint(changed) != fingerprint(df)
+    assert fingerprint(df, {'a': 1}) != fingerprint(df, {'a': 2})
+    assert code_fingerprint(make_frame) != code_fingerprint(test_fingerprint_tracks_inputs)
+
+def test_only_changed_symbols_recompute(tmp_path):
+    frames = {'AAA': make_frame(seed=1), 'BBB': make_frame(seed=2)}
+    calls = []
+    def compute(sym):
+        calls.append(sym)
+        return [dict(t, Symbol=sym) for t in TRADES], {'entry': np.arange(5) % 2 == 0}
+
+    cache = ResultCache('engine', 1, {'stop': 3.0}, root=str(tmp_path))
+    first = {s: cache.fetch(s, (df,), lambda: compute(s)) for s, df in frames.items()}
+    again = {s: cache.fetch(s, (df,), lambda: compute(s)) for s, df in frames.items()}
+    assert calls == ['AAA', 'BBB'] and (cache.hits, cache.misses) == (2, 2)
+    for s in frames:
+        assert again[s].trades == first[s].trades
+        np.testing.assert_array_equal(again[s].arrays['entry'], first[s].arrays['entry'])
+
+    frames['BBB'].loc[3, 'close'] = 0.0
+    for s, df in frames.items():
+        cache.fetch(s, (df,), lambda: compute(s))
+    assert calls == ['AAA', 'BBB', 'BBB']
+
+    # New parameters are a new scope; a disabled cache always recomputes
+    ResultCache('engine', 1, {'stop': 2.0}, root=str(tmp_path)).fetch_trades('AAA', (frames['AAA'],), lambda: compute('AAA')[0])
+    ResultCache('engine', 1, {'stop': 3.0}, root=str(tmp_path), enabled=False).fetch_trades('AAA', (frames['AAA'],), lambda: compute('AAA')[0])
+    assert calls[-2:] == ['AAA', 'AAA']
+
+def test_scalar_trades_and_unreadable_entry(tmp_path):
+    cache = ResultCache('pnl_only', 1, root=str(tmp_path))
+    df = make_frame()
+    assert cache.fetch_trades('X', (df,), lambda: [0.1, -0.05]) == [0.1, -0.05]
+    assert cache.fetch_trades('X', (df,), lambda: []) == [0.1, -0.05]
+    with open(cache.path('X'), 'wb') as f:
+        f.write(b'not an npz')
+    assert cache.fetch_trades('X', (df,), lambda: []) == []
+
+def test_sparse_and_none_fields_round_trip(tmp_path):
+    cache = ResultCache('sparse', 1, root=str(tmp_path))
+    trades = [{'Reason': None, 'PnL': 0.1},
+              {'Reason': 'stop', 'Extra': 'x', 'PnL': -0.2, 'Flag': True, 'ExitDate': pd.Timestamp("2023-01-09")}]
+    df = make_frame()
+    cache.fetch_trades('S', (df,), lambda: trades)
+    assert cache.fetch_trades('S', (df,), lambda: []) == trades and cache.hits == 1
+
+def test_code_fingerprint_covers_imported_engine_modules(monkeypatch):
+    import inspect
+    import scripts.core.strategy_selector as selector
+    import scripts.core.indicator_planner as planner
+    from scripts.core.result_cache import _module_dependencies
+    deps = _module_dependencies(selector)
+    assert {'scripts.core.indicator_planner', 'scripts.core.timeframes'} <= set(deps)
+    assert 'scripts.core.strategy_selector' not in deps
+    # Editing an indicator formula in a dependency changes the engine's fingerprint
+    before = code_fingerprint(selector.StrategyEngine)
+    getsource = inspect.getsource
+    monkeypatch.setattr(inspect, 'getsource', lambda obj: getsource(obj) + ('# edit' if obj is planner else ''))
+    assert code_fingerprint(selector.StrategyEngine) != before
@@ -0,0 +1,35 @@
+import sys
+import os
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.rolling_stats import rolling_ols, rolling_log_trend, rolling_sum
+
+def test_rolling_ols_matches_polyfit():
+    rng = np.random.default_rng(3)
+    # Long, trending panel: the raw sums of x*y would cancel badly without centering
+    panel = 200 + rng.normal(0.05, 1.0, (3000, 4)).cumsum(axis=0)
+    for window in (2, 17, 250):
+        slope, intercept, r2 = rolling_ols(panel, window)
+        assert np.isnan(slope[:window - 1]).all() and not np.isnan(slope[window - 1:]).any()
+        x = np.arange(window)
+        for i in rng.integers(window - 1, len(panel), 25):
+            for j in range(panel.shape[1]):
+                y = panel[i - window + 1:i + 1, j]
+                b, a = np.polyfit(x, y, 1)
+                np.testing.assert_allclose([slope[i, j], intercept[i, j]], [b, a], rtol=1e-9, atol=1e-9)
+                assert abs(r2[i, j] - np.corrcoef(x, y)[0, 1] ** 2) < 1e-9
+        # 1-D input gives the same column
+        np.testing.assert_allclose(rolling_ols(panel[:, 1], window)[0], slope[:, 1], rtol=1e-12)
+    np.testing.assert_allclose(rolling_sum(panel, 5)[4:], [panel[i - 4:i + 1].sum(axis=0) for i in range(4, 3000)])
+
+def test_log_trend_flat_and_missing_windows():
+    rng = np.random.default_rng(5)
+    close = 50 * np.exp(rng.normal(0.001, 0.02, 400).cumsum())
+    close[100:180] = 42.0    # flat stretch: legacy Trend Clock returns (0, 0)
+    close[300] = np.nan      # a missing bar blanks every window that contains it
+    slope, r2 = rolling_log_trend(close, 50)
+    assert (slope[149:180] == 0).all() and (r2[149:180] == 0).all()
+    assert np.isnan(slope[300:350]).all() and not np.isnan(slope[350:]).any()
+    b, _ = np.polyfit(np.arange(50), np.log(close[200:250] + 1e-9), 1)
+    assert np.isclose(slope[249], b * 252) and 0 <= np.nanmin(r2) and np.nanmax(r2) <= 1
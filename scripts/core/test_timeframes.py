@@ -0,0 +1,60 @@
+import sys
+import os
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+from scripts.core.timeframes import resample_ohlcv, TimeframeCache
+from scripts.core.strategy_selector import QuantSystem
+
+def create_daily(n=300):
+    np.random.seed(3)
+    close = 100 * np.exp(np.cumsum(np.random.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        'date': pd.bdate_range(start="2023-01-02", periods=n),
+        'open': close * 0.995, 'high': close * 1.01, 'low': close * 0.99, 'close': close,
+        'volume': np.random.randint(100, 1000, n).astype(float)
+    })
+
+def test_weekly_aggregation():
+    df = create_daily()
+    weekly = resample_ohlcv(df, '1wk')
+    assert list(weekly.columns) == list(df.columns)
+
+    # Every weekly bar matches a direct aggregation of its daily rows
+    for _, bar in weekly.iterrows():
+        week = df[(df['date'] > bar['date'] - pd.Timedelta(days=7)) & (df['date'] <= bar['date'])]
+        assert bar['open'] == week['open'].iloc[0]
+        assert bar['high'] == week['high'].max()
+        assert bar['low'] == week['low'].min()
+        assert bar['close'] == week['close'].iloc[-1]
+        assert bar['volume'] == week['volume'].sum()
+        assert bar['date'] == week['date'].iloc[-1]  # stamped with last trading day
+
+    monthly = resample_ohlcv(df.set_index('date'), 'monthly')
+    assert monthly.index.name == 'date'
+    assert monthly['volume'].sum() == df['volume'].sum()
+
+def test_cache_and_quant_system_timeframe():
+    df = create_daily()
+    cache = TimeframeCache()
+    first = cache.get('AAA', df, '1wk')
+    assert cache.get('AAA', df, 'W') is first
+    assert cache.get('AAA', df.iloc[:-1], '1wk') is not first  # new data invalidates
+    assert cache.get('AAA', df, '1d') is df
+    # Back-adjusting history (last bar unchanged) also invalidates
+    adjusted = df.copy()
+    adjusted.loc[:len(df) - 2, ['open', 'high', 'low', 'close']] *= 0.98
+    first = cache.get('AAA', df, '1wk')
+    rebuilt = cache.get('AAA', adjusted, '1wk')
+    assert rebuilt is not first and rebuilt['close'].iloc[0] == adjusted['close'].iloc[:5].iloc[-1]
+
+    qs = QuantSystem(timeframe='1wk')
+    res = qs.analyze_ticker("AAA", df, df, df)
+    assert res['Signal'] in ("NO_DATA", "HOLD", "BUY_DIP", "BUY_BREAKOUT", "WAIT", "NO_TRADE", "SELL_CLIMAX")
+    assert len(qs.bars) == 2  # AAA and SPY; the sector proxy shares the SPY key
+
+if __name__ == "__main__":
+    test_weekly_aggregation()
+    test_cache_and_quant_system_timeframe()
+    print("ok")
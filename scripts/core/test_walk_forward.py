@@ -0,0 +1,57 @@
+import sys
+import os
+import time
+import pandas as pd
+import numpy as np
+
+sys.path.append(os.getcwd())
+import scripts.research.optimize_matrix as om
+from scripts.research.optimize_matrix import (
+    PreparedSymbol, _init_walk_forward, oos_equity_curve, walk_forward_task, walk_forward_windows,
+)
+
+def make_prepared(symbol, seed, start="2018-01-01", years=5):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=252 * years).to_numpy()
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, len(dates))))
+    return PreparedSymbol(symbol=symbol, dates=dates, close=close, high=close * 1.01, atr=close * 0.02,
+                          setup=rng.random(len(dates)) < 0.05, filters={})
+
+def test_windows_tile_the_test_spans():
+    windows = walk_forward_windows("2018-01-01", "2023-06-30", train_years=3, test_years=1)
+    assert [w[1] for w in windows] == [pd.Timestamp(f"{y}-01-01") for y in (2021, 2022, 2023)]
+    for (train_start, test_start, test_end), nxt in zip(windows, windows[1:] + [None]):
+        assert test_start == train_start + pd.DateOffset(years=3) and test_end == test_start + pd.DateOffset(years=1)
+        if nxt:
+            assert test_end == nxt[1]  # contiguous, non-overlapping test spans
+    # A test span starting on last_date is kept; one starting after it is not
+    assert len(walk_forward_windows("2018-01-01", "2023-01-01", 3, 1)) == 3
+    assert len(walk_forward_windows("2018-01-01", "2022-12-31", 3, 1)) == 2
+    assert walk_forward_windows("2018-01-01", "2020-12-31", 3, 1) == []
+
+def test_past_deadline_selects_on_point_estimates(monkeypatch):
+    prepared = {s: make_prepared(s, i) for i, s in enumerate(("AAA", "BBB"))}
+    seen = []
+    score = om.MatrixOptimizer.bootstrap_score
+    monkeypatch.setattr(om.MatrixOptimizer, "bootstrap_score",
+                        staticmethod(lambda trades, iterations=None: seen.append(iterations) or score(trades, iterations)))
+    window = walk_forward_windows("2018-01-01", "2022-12-31", 3, 1)[0]
+
+    _init_walk_forward(prepared, time.time() - 1, 500)
+    res = walk_forward_task((0, window, "Tech", ["AAA", "BBB"]))
+    assert res["Degraded"] and set(seen) == {0}
+    assert res["Trades"] and all(window[1] <= pd.Timestamp(t["ExitDate"]) < window[2] for t in res["Trades"])
+    assert {t["Symbol"] for t in res["Trades"]} <= {"AAA", "BBB"}
+
+    seen.clear()
+    _init_walk_forward(prepared, time.time() + 3600, 50)
+    assert not walk_forward_task((0, window, "Tech", ["AAA", "BBB"]))["Degraded"] and set(seen) == {50}
+
+def test_oos_equity_curve_compounds_daily_mean_pnl():
+    trades = [{"ExitDate": "2022-01-04", "PnL": 0.2},
+              {"ExitDate": "2022-01-03", "PnL": 0.1},
+              {"ExitDate": "2022-01-03", "PnL": -0.05}]
+    curve = oos_equity_curve(trades)
+    assert list(curve.index) == [pd.Timestamp("2022-01-03"), pd.Timestamp("2022-01-04")]
+    np.testing.assert_allclose(curve.to_numpy(), [1.025, 1.025 * 1.2])
+    assert oos_equity_curve([]).empty
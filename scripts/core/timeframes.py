@@ -0,0 +1,131 @@
+"""
+Timeframes (Derived Weekly / Monthly Bars)
+多週期 K 線（由日線衍生週線 / 月線）
+
+Weekly and monthly OHLCV are derived from the stored daily bars instead of
+being downloaded separately: open = first, high = max, low = min,
+close = last, volume = sum. Each bar is stamped with the last trading day it
+contains, so a still-forming week never carries a future date.
+週線與月線由已儲存的日線重新取樣，不需另行下載；每根 K 線以該週期內最後
+一個交易日為日期，避免出現未來時間戳。
+
+Usage:
+    weekly = resample_ohlcv(df, '1wk')
+    cache = TimeframeCache()
+    weekly = cache.get('AAPL', df, '1wk')   # recomputed only when df changes
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+# Canonical names follow the yfinance intervals used by the OHLCV generator.
+# 標準名稱沿用 OHLCV 產生器的 yfinance interval。
+TIMEFRAME_ALIASES = {
+    '1d': '1d', 'd': '1d', 'daily': '1d',
+    '1wk': '1wk', 'w': '1wk', '1w': '1wk', 'weekly': '1wk',
+    '1mo': '1mo', 'm': '1mo', '1m': '1mo', 'monthly': '1mo',
+}
+
+# Period frequency per timeframe (None = native daily bars).
+# Weeks end on Friday to match the US trading week.
+_PERIODS = {'1d': None, '1wk': 'W-FRI', '1mo': 'M'}
+
+OHLCV_AGG = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum',
+}
+
+
+def normalize_timeframe(timeframe):
+    tf = TIMEFRAME_ALIASES.get(str(timeframe).strip().lower())
+    if tf is None:
+        raise ValueError(f"Unsupported timeframe: {timeframe} (use one of {sorted(_PERIODS)})")
+    return tf
+
+
+def resample_ohlcv(df, timeframe):
+    """
+    Aggregate daily OHLCV into weekly/monthly bars.
+    Accepts either a 'date' column or a DatetimeIndex and returns the same
+    layout. Columns other than OHLCV keep their last value in the period.
+    將日線彙總為週 / 月線；輸入為 'date' 欄或 DatetimeIndex，輸出保持相同格式。
+    """
+    tf = normalize_timeframe(timeframe)
+    freq = _PERIODS[tf]
+    if freq is None or df is None or df.empty:
+        return df
+
+    has_date_col = 'date' in df.columns
+    frame = df.set_index('date') if has_date_col else df
+    dates = pd.DatetimeIndex(frame.index)
+    if dates.tz is not None:
+        # Bucket on exchange-local calendar days, keep original stamps
+        periods = dates.tz_localize(None).to_period(freq)
+    else:
+        periods = dates.to_period(freq)
+
+    agg = {col: OHLCV_AGG.get(col, 'last') for col in frame.columns}
+    grouped = frame.groupby(periods, sort=True)
+    out = grouped.agg(agg)
+    last_day = pd.Series(dates, index=dates).groupby(periods, sort=True).last()
+    out.index = pd.DatetimeIndex(last_day.values, name='date')
+
+    if has_date_col:
+        out = out.reset_index()
+        return out[df.columns]
+    return out
+
+
+def _fingerprint(df):
+    # Hash of the dates and OHLCV values: appending a bar or revising any bar
+    # (e.g. dividend / split back-adjustment of the whole history) changes it.
+    # 日期與 OHLCV 的雜湊：新增或修正任何一根 K 線（含除權息回溯調整）都會改變。
+    if df is None or df.empty:
+        return (0,)
+    dates = df['date'].values if 'date' in df.columns else df.index.values
+    h = hashlib.blake2b(pd.DatetimeIndex(dates).asi8.tobytes(), digest_size=16)
+    cols = [col for col in OHLCV_AGG if col in df.columns]
+    if cols:
+        h.update(np.ascontiguousarray(df[cols].to_numpy(dtype=float)).tobytes())
+    return (len(df), h.hexdigest())
+
+
+class TimeframeCache:
+    """
+    Per-symbol cache of resampled frames, invalidated when the daily data changes.
+    依標的快取重新取樣後的資料；日線更新時自動失效。
+    """
+    def __init__(self):
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, symbol, df, timeframe):
+        tf = normalize_timeframe(timeframe)
+        if _PERIODS[tf] is None:
+            return df
+        key = (symbol, tf)
+        fp = _fingerprint(df)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == fp:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        out = resample_ohlcv(df, tf)
+        self._cache[key] = (fp, out)
+        return out
+
+    def clear(self, symbol=None):
+        if symbol is None:
+            self._cache.clear()
+        else:
+            for key in [k for k in self._cache if k[0] == symbol]:
+                del self._cache[key]
+
+    def __len__(self):
+        return len(self._cache)
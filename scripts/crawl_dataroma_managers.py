@@ -1,28 +1,28 @@
-
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import sys
 import json
-import time
-import random
 import os
 import argparse
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 import yfinance as yf
 
-# Configuration
-USER_AGENTS = [
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0'
-]
+sys.path.append(os.getcwd())
+from scripts.core.crawler import DEFAULT_MAX_PER_HOST, DEFAULT_RPM
+from scripts.crawl_dataroma_stock import make_crawler
 
+# Configuration
+BASE_URL = "https://www.dataroma.com"
 DATA_DIR = os.path.join("public", "data")
 CACHE_DIR = os.path.join("public", "data", "cache")
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs(CACHE_DIR, exist_ok=True)
+MAX_PERIODS = 20  # Limit to 20 quarters (5 years)
 
 SECTOR_MAP_FILE = os.path.join(DATA_DIR, "stock_sector_map.json")
+# Negative cache: when each "Unknown" sector was last looked up. Unknowns are
+# retried once this old, instead of never (old map entries start their clock on first sight).
+UNKNOWN_SECTORS_FILE = os.path.join(CACHE_DIR, "sector_unknown.json")
+UNKNOWN = "Unknown"
+UNKNOWN_TTL_DAYS = 30
 
 def load_sector_map():
     if os.path.exists(SECTOR_MAP_FILE):
@@ -34,47 +34,32 @@ def save_sector_map(sector_map):
     with open(SECTOR_MAP_FILE, 'w') as f:
         json.dump(sector_map, f, indent=2)
 
-def get_soup(url):
-    """Fetches URL with random delay."""
-    delay = random.uniform(2, 5)
-    print(f"Waiting {delay:.2f}s before fetching {url}...")
-    time.sleep(delay)
-    
-    headers = {'User-Agent': random.choice(USER_AGENTS)}
-    try:
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        return BeautifulSoup(response.text, 'html.parser')
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching {url}: {e}")
-        return None
+def load_unknown_sectors():
+    if os.path.exists(UNKNOWN_SECTORS_FILE):
+        with open(UNKNOWN_SECTORS_FILE, 'r') as f:
+            return json.load(f)
+    return {}
 
-def fetch_stock_sector(ticker, sector_map):
-    """Fetches sector for a stock if not in map."""
-    if ticker in sector_map:
-        return sector_map[ticker]
-    
-    print(f"Fetching sector for {ticker}...")
-    url = f"https://www.dataroma.com/m/stock.php?sym={ticker}"
-    soup = get_soup(url)
-    if not soup:
-        return "Unknown"
-    
-    # Parse Stats Table (#t1)
-    t1 = soup.find('table', id='t1')
+def save_unknown_sectors(unknown):
+    os.makedirs(os.path.dirname(UNKNOWN_SECTORS_FILE), exist_ok=True)
+    with open(UNKNOWN_SECTORS_FILE, 'w') as f:
+        json.dump(unknown, f, indent=2, sort_keys=True)
+
+def parse_sector(tables):
+    """Sector from the stock page stats table (#t1), or "" when it lists none."""
+    t1 = tables.get('t1')
     if t1:
-        rows = t1.find_all('tr')
-        for row in rows:
-            cols = row.find_all('td')
+        for row in t1.rows:
+            cols = row.cells
             if len(cols) == 2:
                 key = cols[0].text.strip().lower().rstrip(':')
                 val = cols[1].text.strip()
                 if "sector" in key:
-                    sector_map[ticker] = val
                     return val
-    
-    
-    # Fallback to yfinance if Dataroma fails
+    return ""
+
+def fetch_yfinance_sector(ticker):
+    """Fallback to yfinance if Dataroma fails (blocking; run off the event loop)."""
     print(f"Fallback: Fetching {ticker} via yfinance...")
     try:
         yf_ticker = ticker.replace('.', '-')
@@ -86,31 +71,77 @@ def fetch_stock_sector(ticker, sector_map):
         
         if sector:
             print(f"  -> Found via yfinance: {sector}")
-            sector_map[ticker] = sector
             return sector
     except Exception as e:
         print(f"  -> yfinance error: {e}")
+    return None
+
+def missing_sectors(tickers, sector_map, unknown, now=None, ttl_days=UNKNOWN_TTL_DAYS):
+    """
+    Tickers that need a lookup: absent from sector_map, or "Unknown" with an
+    expired negative-cache entry. Unknowns without an entry get one dated now.
+    """
+    now = now or datetime.now()
+    todo = []
+    for ticker in tickers:
+        sector = sector_map.get(ticker)
+        if sector is None:
+            todo.append(ticker)
+        elif sector == UNKNOWN:
+            checked = datetime.fromisoformat(unknown.setdefault(ticker, now.isoformat()))
+            if now - checked >= timedelta(days=ttl_days):
+                todo.append(ticker)
+    return todo
+
+async def lookup_sector(crawler, ticker, base_url=BASE_URL):
+    """
+    Sector from the Dataroma stock page, else yfinance; "Unknown" when
+    neither has one, None when the stock page could not be fetched at all.
+    """
+    print(f"Fetching sector for {ticker}...")
+    url = f"{base_url}/m/stock.php?sym={ticker}"
+    sector = await crawler.fetch_parsed(url, parse_sector, ('t1',))
+    if sector is None:
+        return None
+    if not sector:
+        loop = asyncio.get_running_loop()
+        sector = await loop.run_in_executor(crawler.executor, fetch_yfinance_sector, ticker)
+    return sector or UNKNOWN
 
-    sector_map[ticker] = "Unknown"
-    return "Unknown"
+async def resolve_sectors(crawler, tickers, sector_map, unknown, base_url=BASE_URL):
+    """
+    One concurrent, rate-limited pass over the tickers sector_map cannot
+    answer (each distinct ticker at most once). Updates sector_map and the
+    negative cache in place; returns the number of lookups made.
+    """
+    now = datetime.now()
+    todo = missing_sectors(tickers, sector_map, unknown, now)
+    sectors = await asyncio.gather(*(lookup_sector(crawler, t, base_url) for t in todo))
+    for ticker, sector in zip(todo, sectors):
+        if sector is None:
+            continue  # fetch failed: counts as Unknown this run, retried next run
+        sector_map[ticker] = sector
+        if sector == UNKNOWN:
+            unknown[ticker] = now.isoformat()
+        else:
+            unknown.pop(ticker, None)
+    return len(todo)
 
-def scrape_manager_list():
+async def scrape_manager_list(crawler, base_url=BASE_URL):
     """Scrapes the list of managers."""
-    url = "https://www.dataroma.com/m/managers.php"
-    soup = get_soup(url)
-    if not soup:
-        return []
+    url = f"{base_url}/m/managers.php"
+    return await crawler.fetch_parsed(url, parse_manager_list, ('grid',)) or []
 
+def parse_manager_list(tables):
     managers = []
-    grid = soup.find('table', id='grid')
+    grid = tables.get('grid')
     if grid:
-        rows = grid.find_all('tr')
-        for row in rows:
-            man_td = row.find('td', class_='man')
+        for row in grid.rows:
+            man_td = next((cell for cell in row.cells if 'man' in cell.classes), None)
             if man_td:
-                a_tag = man_td.find('a')
-                if a_tag and 'href' in a_tag.attrs:
-                    href = a_tag['href']
+                a_tag = man_td.link
+                if a_tag and a_tag.href is not None:
+                    href = a_tag.href
                     match = re.search(r'm=([^&]+)', href)
                     if match:
                         mgr_code = match.group(1)
@@ -118,27 +149,20 @@ def scrape_manager_list():
                         managers.append({'code': mgr_code, 'name': mgr_name})
     return managers
 
-def parse_manager_history(mgr_code, sector_map):
-    """Parses historical top holdings from p_hist.php."""
-    url = f"https://www.dataroma.com/m/hist/p_hist.php?f={mgr_code}"
-    soup = get_soup(url)
-    if not soup:
-        return {}
-
-    history_data = {} # { "2024 Q3": { "sectors": { "Tech": 20.5 ... }, "total_pct": 85 } }
+def parse_history_rows(tables, max_periods=MAX_PERIODS):
+    """
+    [(period, [(ticker, pct), ...])] for the latest `max_periods` periods of a
+    p_hist.php page that list at least one holding with a positive weight.
+    """
+    periods = []
 
-    grid = soup.find('table', id='grid')
+    grid = tables.get('grid')
     if not grid:
-        return {}
-    
-    tbody = grid.find('tbody')
-    if not tbody:
-        return {}
-
-    rows = tbody.find_all('tr')
-    for row in rows:
+        return periods
+
+    for row in grid.body:
         # Row structure: Period | Value | Col3 (Holding) | Col4 (Holding)...
-        cols = row.find_all('td')
+        cols = row.cells
         if len(cols) < 3:
             continue
         
@@ -147,139 +171,181 @@ def parse_manager_history(mgr_code, sector_map):
         period = " ".join(period.split())
         
         # Iterate holdings columns (starting index 2)
-        quarter_sectors = {}
-        total_tracked_pct = 0.0
-        
+        holdings = []
         for col in cols[2:]:
             # structure: <span class="tit_ctl"> <a ...>AAPL</a> <div>... 22.69% ...</div> </span>
-            span = col.find('span', class_='tit_ctl')
-            if span:
-                a_tag = span.find('a')
-                if not a_tag: continue
-                ticker = a_tag.text.strip()
-                
-                div = span.find('div')
-                if div:
-                    text = div.text # "Apple Inc.22.69% of portfolio"
-                    # Extract percentage: requires digits
-                    pct_match = re.search(r'(\d+(?:\.\d+)?)%', text)
-                    if pct_match:
-                        try:
-                            pct = float(pct_match.group(1))
-                            
-                            # Get Sector
-                            sector = fetch_stock_sector(ticker, sector_map)
-                            
-                            if sector not in quarter_sectors:
-                                quarter_sectors[sector] = 0.0
-                            quarter_sectors[sector] += pct
-                            total_tracked_pct += pct
-                        except ValueError:
-                            print(f"Skipping bad pct: {pct_match.group(1)}")
+            a_tag = col.link
+            if not a_tag: continue
+            ticker = a_tag.text.strip()
+            
+            text = col.text # "AAPL Apple Inc.22.69% of portfolio"
+            # Extract percentage: requires digits
+            pct_match = re.search(r'(\d+(?:\.\d+)?)%', text)
+            if pct_match:
+                try:
+                    holdings.append((ticker, float(pct_match.group(1))))
+                except ValueError:
+                    print(f"Skipping bad pct: {pct_match.group(1)}")
         
-        if total_tracked_pct > 0:
-            history_data[period] = {
-                "sectors": quarter_sectors,
-                "coverage_pct": round(total_tracked_pct, 2)
-            }
+        if sum(pct for _, pct in holdings) > 0:
+            periods.append((period, holdings))
         
-        # Limit to 20 quarters (5 years)
-        if len(history_data) >= 20:
+        if len(periods) >= max_periods:
             break
             
+    return periods
+
+async def fetch_manager_rows(crawler, mgr_code, base_url=BASE_URL):
+    """Holdings per period from p_hist.php (see parse_history_rows); [] when unavailable."""
+    url = f"{base_url}/m/hist/p_hist.php?f={mgr_code}"
+    return await crawler.fetch_parsed(url, parse_history_rows, ('grid',)) or []
+
+def sector_history(periods, sector_map):
+    """Rolls a manager's holdings up by sector (tickers without a sector count as Unknown)."""
+    history_data = {} # { "2024 Q3": { "sectors": { "Tech": 20.5 ... }, "total_pct": 85 } }
+    for period, holdings in periods:
+        quarter_sectors = {}
+        total_tracked_pct = 0.0
+        for ticker, pct in holdings:
+            sector = sector_map.get(ticker, UNKNOWN)
+            if sector not in quarter_sectors:
+                quarter_sectors[sector] = 0.0
+            quarter_sectors[sector] += pct
+            total_tracked_pct += pct
+        history_data[period] = {
+            "sectors": quarter_sectors,
+            "coverage_pct": round(total_tracked_pct, 2)
+        }
     return history_data
 
-def save_aggregated_data(manager_histories):
-    """Aggregates and saves data incrementally."""
-    global_rotation = {}
-    
-    # Collect all periods
-    all_periods = set()
-    for m in manager_histories.values():
-        all_periods.update(m['history'].keys())
-        
-    for period in sorted(all_periods):
-        period_sectors = {}
-        manager_count = 0
-        
-        for m in manager_histories.values():
-            if period in m['history']:
-                h = m['history'][period]
-                cov = h['coverage_pct']
-                if cov < 10: continue # Skip if data is too thin
-                
-                # Normalize to 100%
-                factor = 100.0 / cov if cov > 0 else 0
-                
-                for sec, pct in h['sectors'].items():
-                    norm_pct = pct * factor
-                    if sec not in period_sectors:
-                        period_sectors[sec] = 0.0
-                    period_sectors[sec] += norm_pct
-                
-                manager_count += 1
-        
+class RotationAggregator:
+    """
+    Smart-money sector rotation kept as running per-period sums: adding a
+    manager only touches the periods in its history (sectors normalized to
+    100% of its coverage, periods under 10% coverage skipped). The result
+    equals averaging all managers from scratch.
+    Managers are added in crawl_managers' last phase, after every page and
+    sector has been fetched, so the file is written once by flush() at the
+    end of the run. An interrupted run writes nothing; its fetched pages stay
+    in the page cache, so a re-run resumes without refetching them.
+    """
+    def __init__(self, out_file=None):
+        self.out_file = out_file or os.path.join(DATA_DIR, "smart_money_sector_rotation.json")
+        self.managers = []
+        self.sums = {}    # period -> {sector: sum of normalized pct}
+        self.counts = {}  # period -> managers counted
+
+    def add(self, code, history):
+        self.managers.append(code)
+        for period, h in history.items():
+            cov = h['coverage_pct']
+            if cov < 10: continue # Skip if data is too thin
+            
+            # Normalize to 100%
+            factor = 100.0 / cov if cov > 0 else 0
+            
+            period_sectors = self.sums.setdefault(period, {})
+            for sec, pct in h['sectors'].items():
+                norm_pct = pct * factor
+                if sec not in period_sectors:
+                    period_sectors[sec] = 0.0
+                period_sectors[sec] += norm_pct
+            self.counts[period] = self.counts.get(period, 0) + 1
+
+    def rotation(self):
         # Average across managers
-        if manager_count > 0:
-            for sec in period_sectors:
-                period_sectors[sec] = round(period_sectors[sec] / manager_count, 2)
-            global_rotation[period] = period_sectors
-
-    # Save Output
-    output = {
-        "updated_at": datetime.now().isoformat(),
-        "managers_scraped": list(manager_histories.keys()),
-        "rotation": global_rotation
-    }
-    
-    out_file = os.path.join(DATA_DIR, "smart_money_sector_rotation.json")
-    with open(out_file, 'w') as f:
-        json.dump(output, f, indent=2)
-    print(f"Incremental save: {len(manager_histories)} managers processed.")
+        return {period: {sec: round(total / self.counts[period], 2) for sec, total in self.sums[period].items()}
+                for period in sorted(self.sums)}
+
+    def flush(self):
+        """Saves the aggregate of every manager added so far."""
+        output = {
+            "updated_at": datetime.now().isoformat(),
+            "managers_scraped": list(self.managers),
+            "rotation": self.rotation()
+        }
+        with open(self.out_file, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"Saved sector rotation: {len(self.managers)} managers.")
+
+async def crawl_managers(crawler, targets, sector_map, unknown, base_url=BASE_URL, on_manager=None):
+    """
+    Three phases: (1) every target's p_hist.php page, concurrently; (2) one
+    batched sector pass over the distinct tickers of all managers and
+    quarters; (3) per-manager sector histories, in target order.
+    on_manager(code, history) is called in phase 3 as each manager's history
+    is built (all fetching is done by then).
+    """
+    async def rows_of(mgr):
+        try:
+            return await fetch_manager_rows(crawler, mgr['code'], base_url)
+        except Exception as e:
+            print(f"Failed to process {mgr['code']}: {e}")
+            return []
+
+    # 1. Holdings pages
+    all_rows = await asyncio.gather(*(rows_of(mgr) for mgr in targets))
+
+    # 2. Sectors: lookups scale with distinct tickers, not with managers x quarters
+    tickers = list(dict.fromkeys(t for periods in all_rows for _, holdings in periods for t, _ in holdings))
+    looked_up = await resolve_sectors(crawler, tickers, sector_map, unknown, base_url)
+    print(f"Sectors: {len(tickers)} distinct tickers, {looked_up} looked up.")
+
+    # 3. Aggregate
+    manager_sector_histories = {}
+    for i, (mgr, periods) in enumerate(zip(targets, all_rows)):
+        hist = sector_history(periods, sector_map)
+        print(f"[{i+1}/{len(targets)}] === Processed {mgr['name']} ({mgr['code']}) ===")
+        if hist:
+            manager_sector_histories[mgr['code']] = {
+                "name": mgr['name'],
+                "history": hist
+            }
+            if on_manager:
+                on_manager(mgr['code'], hist)
+    return manager_sector_histories
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--managers', type=str, help='Comma separated list of manager codes to scrape (e.g. BRK,AKO)')
     parser.add_argument('--limit', type=int, default=1000, help='Limit number of managers to scrape (default=all)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_MAX_PER_HOST, help='Max in-flight requests to Dataroma')
+    parser.add_argument('--rpm', type=float, default=DEFAULT_RPM, help='Max requests per minute to Dataroma')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore and do not write the local page cache')
     args = parser.parse_args()
 
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
     sector_map = load_sector_map()
-    
-    # 1. Get List
-    all_managers = scrape_manager_list()
-    if not all_managers:
-        print("Failed to get manager list.")
-        return
-
-    # Filter
-    targets = []
-    if args.managers:
-        codes = [c.strip().upper() for c in args.managers.split(',')]
-        targets = [m for m in all_managers if m['code'] in codes]
-    else:
-        targets = all_managers[:args.limit]
+    unknown = load_unknown_sectors()
+
+    with make_crawler(args.concurrency, args.rpm, use_cache=not args.no_cache, timeout=20) as crawler:
+        # 1. Get List
+        all_managers = crawler.run(scrape_manager_list(crawler))
+        if not all_managers:
+            print("Failed to get manager list.")
+            return
+
+        # Filter
+        targets = []
+        if args.managers:
+            codes = [c.strip().upper() for c in args.managers.split(',')]
+            targets = [m for m in all_managers if m['code'] in codes]
+        else:
+            targets = all_managers[:args.limit]
+            
+        print(f"Targeting {len(targets)} managers.")
         
-    print(f"Targeting {len(targets)} managers.")
-    
-    # 2. Scrape History for each
-    manager_sector_histories = {}
-    
-    for i, mgr in enumerate(targets):
-        print(f"[{i+1}/{len(targets)}] === Processing {mgr['name']} ({mgr['code']}) ===")
-        try:
-            hist = parse_manager_history(mgr['code'], sector_map)
-            if hist:
-                manager_sector_histories[mgr['code']] = {
-                    "name": mgr['name'],
-                    "history": hist
-                }
-                # Save sector map and aggregated data every manager
-                save_sector_map(sector_map)
-                save_aggregated_data(manager_sector_histories)
-        except Exception as e:
-            print(f"Failed to process {mgr['code']}: {e}")
-            time.sleep(5) # Cooldown on error
+        # 2. Scrape History for each
+        aggregator = RotationAggregator()
+        manager_sector_histories = crawler.run(
+            crawl_managers(crawler, targets, sector_map, unknown, on_manager=aggregator.add))
+        print(crawler.summary())
+
+    aggregator.flush()
 
+    save_sector_map(sector_map)
+    save_unknown_sectors(unknown)
     print(f"Done. Processed {len(manager_sector_histories)} managers.")
 
 if __name__ == "__main__":
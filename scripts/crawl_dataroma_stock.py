@@ -1,100 +1,104 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 import json
-import time
-import random
+import sys
 import os
 import argparse
 from datetime import datetime
-import re
-
-# Risk Mitigation: Random User-Agents
-USER_AGENTS = [
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0'
-]
-
-def get_soup(url):
-    """Fetches URL with random delay and rotation headers."""
-    delay = random.uniform(3, 8)
-    print(f"Waiting {delay:.2f}s before fetching {url}...")
-    time.sleep(delay)
-    
-    headers = {'User-Agent': random.choice(USER_AGENTS)}
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        return BeautifulSoup(response.text, 'html.parser')
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching {url}: {e}")
-        return None
+
+sys.path.append(os.getcwd())
+from scripts.core.crawler import PoliteCrawler, PageCache, DEFAULT_MAX_PER_HOST, DEFAULT_RPM
+
+BASE_URL = "https://www.dataroma.com"
+OUTPUT_DIR = os.path.join("public", "data", "dataroma")
+
+# Local copies of fetched pages (body, ETag/Last-Modified, content hash, parse results)
+PAGE_CACHE_DIR = os.path.join("public", "data", "cache", "dataroma_pages")
+# Hours a cached page is used without asking the server; after that it is revalidated.
+# Holdings histories only move when a 13F lands (filings trickle in over the ~45 days
+# after quarter end, so a week rather than a full quarter); the rest follows the nightly run.
+PAGE_TTL_HOURS = {
+    "/m/hist/": 24 * 7,         # hist.php (holder history), p_hist.php (manager history)
+    "/m/stock.php": 20,
+    "/m/activity.php": 20,
+    "/m/ins/": 20,              # insider transactions
+    "/m/managers.php": 20,
+}
+
+def make_crawler(concurrency=DEFAULT_MAX_PER_HOST, rpm=DEFAULT_RPM, use_cache=True, **kwargs):
+    """PoliteCrawler for Dataroma, with the page cache unless use_cache is False."""
+    cache = PageCache(PAGE_CACHE_DIR) if use_cache else None
+    return PoliteCrawler(max_per_host=concurrency, rpm=rpm, cache=cache, ttl_hours=PAGE_TTL_HOURS, **kwargs)
 
 def clean_text(text):
     if not text:
         return ""
     return text.strip().replace('\xa0', ' ')
 
-def parse_investor_history(url_suffix):
-    """Parses history page, e.g., /m/hist/hist.php?f=MVALX&s=PL"""
+async def parse_investor_history(crawler, url_suffix, base_url=BASE_URL):
+    """Fetches and parses history page, e.g., /m/hist/hist.php?f=MVALX&s=PL"""
     if not url_suffix:
         return []
-        
-    url = f"https://www.dataroma.com{url_suffix}"
-    soup = get_soup(url)
-    if not soup:
-        return []
+    return await crawler.fetch_parsed(f"{base_url}{url_suffix}", parse_history_page, ('grid',)) or []
 
+def parse_history_page(tables):
     history = []
     # Target table #grid
-    grid = soup.find('table', id='grid')
+    grid = tables.get('grid')
     if grid:
-        tbody = grid.find('tbody')
-        if tbody:
-            for row in tbody.find_all('tr'):
-                cols = row.find_all('td')
-                # Expected: Period, Shares, % of Portfolio, Activity, % Change to Portfolio, Reported Price
-                if len(cols) >= 6:
-                    try:
-                        period = clean_text(cols[0].text)
-                        shares = int(clean_text(cols[1].text).replace(',', ''))
-                        pct_portfolio = clean_text(cols[2].text)
-                        activity = clean_text(cols[3].text)
-                        pct_change_portfolio = clean_text(cols[4].text)
-                        reported_price = clean_text(cols[5].text)
-                        
-                        history.append({
-                            "period": period,
-                            "shares": shares,
-                            "percent_portfolio": pct_portfolio,
-                            "activity": activity,
-                            "percent_change_portfolio": pct_change_portfolio,
-                            "reported_price": reported_price
-                        })
-                    except ValueError:
-                        continue
+        for row in grid.body:
+            cols = row.cells
+            # Expected: Period, Shares, % of Portfolio, Activity, % Change to Portfolio, Reported Price
+            if len(cols) >= 6:
+                try:
+                    period = clean_text(cols[0].text)
+                    shares = int(clean_text(cols[1].text).replace(',', ''))
+                    pct_portfolio = clean_text(cols[2].text)
+                    activity = clean_text(cols[3].text)
+                    pct_change_portfolio = clean_text(cols[4].text)
+                    reported_price = clean_text(cols[5].text)
+                    
+                    history.append({
+                        "period": period,
+                        "shares": shares,
+                        "percent_portfolio": pct_portfolio,
+                        "activity": activity,
+                        "percent_change_portfolio": pct_change_portfolio,
+                        "reported_price": reported_price
+                    })
+                except ValueError:
+                    continue
     return history
 
-def parse_stock_overview(ticker):
-    """Parses /m/stock.php?sym={ticker}"""
-    url = f"https://www.dataroma.com/m/stock.php?sym={ticker}"
-    soup = get_soup(url)
-    if not soup:
-        return {}
+async def parse_stock_overview(crawler, ticker, base_url=BASE_URL):
+    """Parses /m/stock.php?sym={ticker} and every holder's history page (None when the page is unavailable)."""
+    url = f"{base_url}/m/stock.php?sym={ticker}"
+    data = await crawler.fetch_parsed(url, parse_overview_page, ('t1', 'grid'))
+    if data is None:
+        return None
+
+    # Fetch history details: all holders' pages are scheduled at once under the crawler's limits
+    hist_links = data.pop("hist_links")
+    histories = await asyncio.gather(*(parse_investor_history(crawler, link, base_url) for link in hist_links))
+    for holding, history_data in zip(data["holdings"], histories):
+        holding["history"] = history_data
+    
+    return data
 
+def parse_overview_page(tables):
+    """Stats and holdings of a stock page, plus each holding's history link ("hist_links")."""
     data = {
         "stats": {},
-        "holdings": []
+        "holdings": [],
+        "hist_links": []
     }
 
     # 1. Parse Stats Table (#t1)
     # 1. 解析統計表格 (#t1)
     # Structure: <tr><td class="sect">Sector:</td><td><b>Industrials</b></td></tr>
-    t1 = soup.find('table', id='t1')
+    t1 = tables.get('t1')
     if t1:
-        rows = t1.find_all('tr')
-        for row in rows:
-            cols = row.find_all('td')
+        for row in t1.rows:
+            cols = row.cells
             if len(cols) == 2:
                 key = clean_text(cols[0].text).lower().rstrip(':')
                 val = clean_text(cols[1].text)
@@ -112,117 +116,101 @@ def parse_stock_overview(ticker):
 
     # 2. Parse Holdings Table (#grid) within #wrap
     # <thead>...</thead><tbody><tr>...</tr></tbody>
-    grid = soup.find('table', id='grid')
+    grid = tables.get('grid')
     if grid:
-        tbody = grid.find('tbody')
-        if tbody:
-            rows = tbody.find_all('tr')
-            for row in rows:
-                cols = row.find_all('td')
-                # Expected columns based on user input:
-                # 0: Hist link, 1: Portfolio Manager, 2: % of portfolio, 3: Recent Activity, 4: Shares, 5: Value
-                if len(cols) >= 6:
-                    # Extract history link
-                    hist_link = None
-                    hist_td = cols[0]
-                    a_tag = hist_td.find('a')
-                    if a_tag and 'href' in a_tag.attrs:
-                        hist_link = a_tag['href']
-
-                    manager_cell = cols[1]
-                    manager_name = clean_text(manager_cell.text)
-                    
-                    pct_port = clean_text(cols[2].text)
-                    activity = clean_text(cols[3].text)
-                    shares = clean_text(cols[4].text).replace(',', '')
-                    value = clean_text(cols[5].text).replace(',', '')
-
-                    # Fetch history details
-                    history_data = []
-                    if hist_link:
-                         history_data = parse_investor_history(hist_link)
-
-                    data["holdings"].append({
-                        "manager": manager_name,
-                        "percent_portfolio": float(pct_port) if pct_port.replace('.','').isdigit() else pct_port,
-                        "recent_activity": activity,
-                        "shares": int(shares) if shares.isdigit() else 0,
-                        "value": int(value) if value.isdigit() else 0,
-                        "history": history_data
-                    })
+        for row in grid.body:
+            cols = row.cells
+            # Expected columns based on user input:
+            # 0: Hist link, 1: Portfolio Manager, 2: % of portfolio, 3: Recent Activity, 4: Shares, 5: Value
+            if len(cols) >= 6:
+                # Extract history link
+                hist_link = cols[0].link.href if cols[0].link else None
+
+                manager_name = clean_text(cols[1].text)
+                
+                pct_port = clean_text(cols[2].text)
+                activity = clean_text(cols[3].text)
+                shares = clean_text(cols[4].text).replace(',', '')
+                value = clean_text(cols[5].text).replace(',', '')
+
+                data["hist_links"].append(hist_link)
+                data["holdings"].append({
+                    "manager": manager_name,
+                    "percent_portfolio": float(pct_port) if pct_port.replace('.','').isdigit() else pct_port,
+                    "recent_activity": activity,
+                    "shares": int(shares) if shares.isdigit() else 0,
+                    "value": int(value) if value.isdigit() else 0,
+                    "history": []
+                })
     
     return data
 
-def parse_activity(ticker):
+async def parse_activity(crawler, ticker, base_url=BASE_URL):
     """Parses /m/activity.php?sym={ticker}&typ=a"""
-    url = f"https://www.dataroma.com/m/activity.php?sym={ticker}&typ=a"
-    soup = get_soup(url)
-    if not soup:
-        return {}
-    
+    url = f"{base_url}/m/activity.php?sym={ticker}&typ=a"
+    return await crawler.fetch_parsed(url, parse_activity_page, ('grid',)) or {}
+
+def parse_activity_page(tables):
     activity_data = {}
     
     # Target: #grid with tr.q_chg headers
-    grid = soup.find('table', id='grid')
+    grid = tables.get('grid')
     if grid:
-        tbody = grid.find('tbody')
-        if tbody:
-            current_quarter = "Unknown"
+        current_quarter = "Unknown"
+        
+        # Iterate through all rows (headers and data mixed)
+        for row in grid.body:
+            # Check if it's a Quarter Header
+            # <tr class="q_chg"><td colspan="6"><b>Q3</b> &nbsp;<b>2025</b></td></tr>
+            if 'q_chg' in row.classes:
+                current_quarter = clean_text(row.text)
+                if current_quarter not in activity_data:
+                    activity_data[current_quarter] = []
+                continue
             
-            # Iterate through all rows (headers and data mixed)
-            for row in tbody.find_all('tr'):
-                # Check if it's a Quarter Header
-                # <tr class="q_chg"><td colspan="6"><b>Q3</b> &nbsp;<b>2025</b></td></tr>
-                if 'q_chg' in row.get('class', []):
-                    current_quarter = clean_text(row.text)
-                    if current_quarter not in activity_data:
-                        activity_data[current_quarter] = []
-                    continue
+            # Check if it's a Data Row
+            cols = row.cells
+            # 0: Hist, 1: Manager, 2: Activity, 3: Share change, 4: % change to portfolio (variable)
+            if len(cols) >= 5:
+                manager = clean_text(cols[1].text)
+                action = clean_text(cols[2].text)
+                share_change = clean_text(cols[3].text).replace(',', '')
                 
-                # Check if it's a Data Row
-                cols = row.find_all('td')
-                # 0: Hist, 1: Manager, 2: Activity, 3: Share change, 4: % change to portfolio (variable)
-                if len(cols) >= 5:
-                    manager = clean_text(cols[1].text)
-                    action = clean_text(cols[2].text)
-                    share_change = clean_text(cols[3].text).replace(',', '')
+                # Extract Portfolio Change (Column 4)
+                portfolio_change = "0.00"
+                if len(cols) > 4:
+                    portfolio_change = clean_text(cols[4].text)
+
+                try:
+                    # Extract share change direction from class if possible, or just parse text
+                    shares_val = int(share_change) if share_change.lstrip('-').isdigit() else 0
                     
-                    # Extract Portfolio Change (Column 4)
-                    portfolio_change = "0.00"
-                    if len(cols) > 4:
-                        portfolio_change = clean_text(cols[4].text)
-
-                    try:
-                        # Extract share change direction from class if possible, or just parse text
-                        shares_val = int(share_change) if share_change.lstrip('-').isdigit() else 0
-                        
-                        # Adjust sign based on 'sell' class or text if needed
-                        action_type = "Buy"
-                        if 'sell' in cols[2].get('class', []) or 'Reduce' in action or 'Sell' in action:
-                            action_type = "Sell"
-                            shares_val = -abs(shares_val) # Force negative for sells
-                        else:
-                            shares_val = abs(shares_val) # Force positive for buys
-
-                        activity_data[current_quarter].append({
-                            "manager": manager,
-                            "action": action,
-                            "type": action_type,
-                            "shares_changed": shares_val,
-                            "portfolio_change": portfolio_change
-                        })
-                    except ValueError:
-                        pass
+                    # Adjust sign based on 'sell' class or text if needed
+                    action_type = "Buy"
+                    if 'sell' in cols[2].classes or 'Reduce' in action or 'Sell' in action:
+                        action_type = "Sell"
+                        shares_val = -abs(shares_val) # Force negative for sells
+                    else:
+                        shares_val = abs(shares_val) # Force positive for buys
+
+                    activity_data[current_quarter].append({
+                        "manager": manager,
+                        "action": action,
+                        "type": action_type,
+                        "shares_changed": shares_val,
+                        "portfolio_change": portfolio_change
+                    })
+                except ValueError:
+                    pass
 
     return activity_data
 
-def parse_insider(ticker):
+async def parse_insider(crawler, ticker, base_url=BASE_URL):
     """Parses /m/ins/ins.php?t=y&sym={ticker}&o=fd&d=d"""
-    url = f"https://www.dataroma.com/m/ins/ins.php?t=y&sym={ticker}&o=fd&d=d"
-    soup = get_soup(url)
-    if not soup:
-        return {}
+    url = f"{base_url}/m/ins/ins.php?t=y&sym={ticker}&o=fd&d=d"
+    return await crawler.fetch_parsed(url, parse_insider_page, ('sum', 'grid')) or {}
 
+def parse_insider_page(tables):
     insider_data = {
         "summary": {"buys": {"count": 0, "amount": 0}, "sells": {"count": 0, "amount": 0}},
         "transactions": []
@@ -230,12 +218,11 @@ def parse_insider(ticker):
 
     # 1. Parse Summary (#sum)
     # <table id="sum">...<tr class="Buys">...<tr class="Sells">...
-    sum_table = soup.find('table', id='sum')
+    sum_table = tables.get('sum')
     if sum_table:
         # Only look at tbody rows or filter out headers
-        rows = sum_table.find_all('tr')
-        for row in rows:
-            cols = row.find_all('td')
+        for row in sum_table.rows:
+            cols = row.cells
             if len(cols) == 3:
                 lbl = clean_text(cols[0].text)
                 
@@ -253,63 +240,64 @@ def parse_insider(ticker):
                         insider_data["summary"]["sells"] = {"count": count, "amount": amount}
 
     # 2. Parse Transactions (#grid)
-    grid = soup.find('table', id='grid')
+    grid = tables.get('grid')
     if grid:
-        tbody = grid.find('tbody')
-        if tbody:
-            for row in tbody.find_all('tr'):
-                cols = row.find_all('td')
-                # 0: Filing Date, 1: Symbol, 2: Security, 3: Reporter, 4: Relationship
-                # 5: Trans Date, 6: Type, 7: Shares, 8: Price, 9: Amount, 10: D/I
-                if len(cols) >= 10:
-                    try:
-                        filing_date_text = clean_text(cols[0].text) # "23 Jan 2026 18:33"
-                        # Simple cleanup to keep just date part for JSON if preferred, or keep full
-                        # Let's keep raw text for now or split
-                        
-                        reporter = clean_text(cols[3].text)
-                        relationship = clean_text(cols[4].text)
-                        trans_date = clean_text(cols[5].text)
-                        trans_type = clean_text(cols[6].text)
-                        shares = int(clean_text(cols[7].text).replace(',',''))
-                        price = float(clean_text(cols[8].text).replace('$','').replace(',',''))
-                        total_val = int(clean_text(cols[9].text).replace('$','').replace(',',''))
-                        
-                        insider_data["transactions"].append({
-                            "filing_date": filing_date_text,
-                            "reporter": reporter,
-                            "relationship": relationship,
-                            "transaction_date": trans_date,
-                            "transaction_type": trans_type,
-                            "shares": shares,
-                            "price": price,
-                            "value": total_val
-                        })
-                    except (ValueError, IndexError):
-                        continue
+        for row in grid.body:
+            cols = row.cells
+            # 0: Filing Date, 1: Symbol, 2: Security, 3: Reporter, 4: Relationship
+            # 5: Trans Date, 6: Type, 7: Shares, 8: Price, 9: Amount, 10: D/I
+            if len(cols) >= 10:
+                try:
+                    filing_date_text = clean_text(cols[0].text) # "23 Jan 2026 18:33"
+                    # Simple cleanup to keep just date part for JSON if preferred, or keep full
+                    # Let's keep raw text for now or split
+                    
+                    reporter = clean_text(cols[3].text)
+                    relationship = clean_text(cols[4].text)
+                    trans_date = clean_text(cols[5].text)
+                    trans_type = clean_text(cols[6].text)
+                    shares = int(clean_text(cols[7].text).replace(',',''))
+                    price = float(clean_text(cols[8].text).replace('$','').replace(',',''))
+                    total_val = int(clean_text(cols[9].text).replace('$','').replace(',',''))
+                    
+                    insider_data["transactions"].append({
+                        "filing_date": filing_date_text,
+                        "reporter": reporter,
+                        "relationship": relationship,
+                        "transaction_date": trans_date,
+                        "transaction_type": trans_type,
+                        "shares": shares,
+                        "price": price,
+                        "value": total_val
+                    })
+                except (ValueError, IndexError):
+                    continue
 
     return insider_data
 
-def main():
-    parser = argparse.ArgumentParser(description='Crawl Dataroma data for a specific ticker.')
-    parser.add_argument('--ticker', type=str, required=True, help='Stock ticker symbol (e.g., PL)')
-    args = parser.parse_args()
-    
-    ticker = args.ticker.upper()
-    print(f"Starting crawl for {ticker}...")
-
+async def crawl_ticker(crawler, ticker, base_url=BASE_URL):
+    """
+    Overview (plus every holder's history), activity and insider pages for one
+    ticker, fetched concurrently. Raises RuntimeError when the overview page
+    cannot be fetched, so a failed crawl never overwrites good data.
+    """
     # Crawl Data
     # 爬取數據說明:
     # 1. parse_stock_overview: 獲取基本持倉概況與超級投資人持股
     # 2. parse_activity: 獲取近期的買賣活動 (Activity)
     # 3. parse_insider: 獲取內部人交易數據 (Insider Trades)
-    overview = parse_stock_overview(ticker)
-    activity = parse_activity(ticker)
-    insider = parse_insider(ticker)
+    overview, activity, insider = await asyncio.gather(
+        parse_stock_overview(crawler, ticker, base_url),
+        parse_activity(crawler, ticker, base_url),
+        parse_insider(crawler, ticker, base_url),
+    )
+
+    if overview is None:
+        raise RuntimeError(f"Could not fetch the Dataroma overview page for {ticker}")
 
     # Combine Data
     # 整合數據
-    final_data = {
+    return {
         "ticker": ticker,
         "updated_at": datetime.now().isoformat(),
         "stats": overview.get("stats", {}),
@@ -318,17 +306,35 @@ def main():
         "insiders": insider
     }
 
+def save_ticker_data(final_data, output_dir=OUTPUT_DIR):
+    """Writes {output_dir}/{TICKER}.json and returns its path."""
     # Ensure output directory exists
     # 確保輸出目錄存在
-    output_dir = os.path.join("public", "data", "dataroma")
     os.makedirs(output_dir, exist_ok=True)
     
     # Write JSON
     # 寫入 JSON 檔案
-    output_file = os.path.join(output_dir, f"{ticker}.json")
+    output_file = os.path.join(output_dir, f"{final_data['ticker']}.json")
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(final_data, f, indent=2, ensure_ascii=False)
+    return output_file
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl Dataroma data for a specific ticker.')
+    parser.add_argument('--ticker', type=str, required=True, help='Stock ticker symbol (e.g., PL)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_MAX_PER_HOST, help='Max in-flight requests to Dataroma')
+    parser.add_argument('--rpm', type=float, default=DEFAULT_RPM, help='Max requests per minute to Dataroma')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore and do not write the local page cache')
+    args = parser.parse_args()
     
+    ticker = args.ticker.upper()
+    print(f"Starting crawl for {ticker}...")
+
+    with make_crawler(args.concurrency, args.rpm, use_cache=not args.no_cache) as crawler:
+        final_data = crawler.run(crawl_ticker(crawler, ticker))
+        print(crawler.summary())
+
+    output_file = save_ticker_data(final_data)
     print(f"Data saved to {output_file}")
 
 if __name__ == "__main__":
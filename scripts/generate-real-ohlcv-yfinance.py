@@ -8,6 +8,10 @@ Outputs:
 - public/data/ohlcv/{symbol_lower}_{interval}_{days}d.json  (e.g. onds_1d_90d.json)
 - public/data/ohlcv/index.json
 
+With --from-daily, 1wk/1mo files are derived from the stored 1d files
+(scripts/core/timeframes.py) instead of downloading each interval again:
+- public/data/ohlcv/{symbol_lower}_{interval}_{days}d.json only
+
 JSON schema:
 {
   "timestamps": [epoch_ms...],
@@ -29,6 +33,8 @@ JSON schema:
 
 import argparse
 import json
+import os
+import sys
 import time
 from datetime import datetime, timezone
 from pathlib import Path
@@ -37,6 +43,9 @@ from typing import List, Dict, Any, Optional
 import pandas as pd
 import yfinance as yf
 
+sys.path.append(os.getcwd())
+from scripts.core.timeframes import resample_ohlcv
+
 DAY_MS = 24 * 60 * 60 * 1000
 
 
@@ -203,6 +212,26 @@ def fetch_ohlcv_yfinance(symbol: str, interval: str, days: int, retries: int = 3
     raise RuntimeError(f"yfinance fetch failed for {symbol} after {retries} attempts: {last_err}")
 
 
+def derive_from_daily(out_dir: Path, out_name: str, interval: str, days: int) -> pd.DataFrame:
+    """Resample the stored daily file for out_name into `interval` bars (no network)."""
+    candidates = [
+        out_dir / f"{out_name.lower()}_1d_{days}d.json",
+        out_dir / f"{out_name}.json",
+    ]
+    for path in candidates:
+        if not path.exists():
+            continue
+        payload = read_json(path)
+        if (payload.get("metadata") or {}).get("period", "1d") != "1d":
+            continue
+        df = pd.DataFrame(
+            {k: payload[k] for k in ["open", "high", "low", "close", "volume"]},
+            index=pd.to_datetime(payload["timestamps"], unit="ms", utc=True),
+        )
+        return resample_ohlcv(df, interval).rename(columns=str.capitalize)
+    raise RuntimeError(f"no stored 1d bars for {out_name} (run with --interval 1d first)")
+
+
 def df_to_payload(symbol: str, df: pd.DataFrame, interval: str, days: int) -> Dict[str, Any]:
     timestamps = to_epoch_ms_index(df.index)
     return {
@@ -231,8 +260,13 @@ def main() -> int:
     parser.add_argument("--min-rows", type=int, default=24)
     parser.add_argument("--symbols", type=str, default="", help="Comma-separated symbols override (e.g. TSM,NVDA)")
     parser.add_argument("--sleep-between", type=float, default=0.4)
+    parser.add_argument("--from-daily", action="store_true",
+                        help="Derive 1wk/1mo bars from the stored 1d files instead of downloading")
     args = parser.parse_args()
     
+    if args.from_daily and args.interval not in ("1wk", "1mo"):
+        parser.error("--from-daily only applies to --interval 1wk or 1mo")
+    
     out_dir = Path(args.output_dir)
     safe_mkdir(out_dir)
     
@@ -280,8 +314,12 @@ def main() -> int:
         target_b = out_dir / f"{out_name.lower()}_{args.interval}_{args.days}d.json"
         
         try:
-            print(f"📊 Fetching {sym} (saving as {out_name})...")
-            df = fetch_ohlcv_yfinance(sym, args.interval, args.days)
+            if args.from_daily:
+                print(f"📊 Resampling {sym} 1d -> {args.interval} (saving as {out_name})...")
+                df = derive_from_daily(out_dir, out_name, args.interval, args.days)
+            else:
+                print(f"📊 Fetching {sym} (saving as {out_name})...")
+                df = fetch_ohlcv_yfinance(sym, args.interval, args.days)
             # Pass the mapped name as symbol in metadata so frontend matches it?
             # Or keep original? Frontend likely ignores metadata symbol for logic, uses filename/request.
             # But let's use the mapped name in metadata to be safe and consistent.
@@ -292,15 +330,17 @@ def main() -> int:
             if err:
                 raise RuntimeError(err)
             
-            write_json_atomic(target_a, payload)
-            write_json_atomic(target_b, payload)
+            # {SYMBOL}.json stays the daily series; derived bars only get the variant file
+            targets = [target_b] if args.from_daily else [target_a, target_b]
+            for target in targets:
+                write_json_atomic(target, payload)
             
             ok += 1
-            files_all.extend([f"{target_a.name}", f"{target_b.name}"])
+            files_all.extend([t.name for t in targets])
             
             items.append({
                 "symbol": sym,
-                "files": [f"{target_a.name}", f"{target_b.name}"],
+                "files": [t.name for t in targets],
                 "rows": len(payload["timestamps"]),
                 "lastTimestamp": payload["timestamps"][-1] if payload["timestamps"] else None,
                 "priceRange": {
@@ -324,7 +364,13 @@ def main() -> int:
                 "error": str(e),
             })
         
-        time.sleep(args.sleep_between)
+        if not args.from_daily:
+            time.sleep(args.sleep_between)
+    
+    if args.from_daily:
+        # index.json describes the downloaded daily set; leave it untouched
+        print(f"\n📊 Derived {args.interval}: {ok}/{len(symbols)} ok, {failed} failed")
+        return 0 if ok else 2
     
     # ✅ index.json：向下相容舊前端 schema（symbols/files/totalFiles/period/dataPoints/generated）
     index_payload = {
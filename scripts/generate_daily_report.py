@@ -69,7 +69,7 @@ def main():
             
             # v2.0 Global Override
             final_signal = latest['signal']
-            final_commentary = latest['commentary']
+            final_commentary = engine.commentary(latest)
             
             if vix_panic_mode and final_signal in ["LAUNCHPAD", "DIP_BUY"]:
                 final_signal = "CRISIS_HALT"
@@ -0,0 +1,221 @@
+"""
+Backtest Core (Date-Indexed Universe)
+回測核心（以日期索引的標的池）
+
+Shared state for the Kinetic research backtests (BacktestEngine,
+ComparativeBacktestEngine, OptimizedBacktestEngine). The manifest universe is
+loaded and analyzed once; every symbol keeps plain numpy columns plus a
+calendar-position -> row index, so a daily lookup is an array read instead of
+a df[df['date'] == day] scan. Any number of periods (e.g. yearly windows) run
+from the same prepared state.
+標的池只載入與分析一次；每個標的以「交易日位置 -> 列索引」對照，日查詢為
+O(1)，多個回測期間共用同一份資料。
+
+Usage:
+    universe = load_universe(DATA_DIR)
+    for start, end, name in yearly_periods([2018, 2019]):
+        result = run_period(universe, BacktestRules(), start, end)
+"""
+
+import os
+import sys
+import json
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+try:
+    from quant_engine import KineticMarketState
+except ImportError:
+    from research.quant_engine import KineticMarketState
+
+NS_PER_DAY = 86_400_000_000_000
+ENTRY_SIGNALS = ("DIP_BUY", "LAUNCHPAD")
+
+
+class SymbolSeries:
+    """One symbol's columns as arrays; pos[d] = first row dated calendar[d] (-1 = no bar)."""
+    __slots__ = ('close', 'signal', 'x_trend', 'pos')
+
+    def __init__(self, df, calendar):
+        self.close = df['close'].to_numpy(dtype=float)
+        self.signal = df['signal'].to_numpy(dtype=object) if 'signal' in df.columns else None
+        self.x_trend = df['x_trend'].to_numpy(dtype=float) if 'x_trend' in df.columns else None
+        self.pos = np.full(len(calendar), -1, dtype=np.int64)
+        rows = calendar.get_indexer(pd.DatetimeIndex(df['date']))
+        hit = np.flatnonzero(rows >= 0)[::-1]  # reversed: the first matching row wins
+        self.pos[rows[hit]] = hit
+
+
+class BacktestUniverse:
+    """
+    Analyzed symbols aligned to one calendar (the sorted union of all dates,
+    market series included, as the per-date loops always used).
+    """
+    def __init__(self, frames, market=None):
+        market = market or {}
+        dates = [df['date'] for df in list(frames.values()) + list(market.values()) if len(df)]
+        self.calendar = pd.DatetimeIndex(pd.concat(dates).dropna().unique()).sort_values() if dates else pd.DatetimeIndex([])
+        self.day_ns = np.asarray(self.calendar, dtype='datetime64[ns]').view(np.int64)
+        self.tickers = list(frames)
+        self.series = {t: SymbolSeries(df, self.calendar) for t, df in frames.items()}
+        self.market = {t: SymbolSeries(df, self.calendar) for t, df in market.items()}
+        self._entry_masks = {}
+
+    def span(self, start=None, end=None):
+        """Calendar positions [lo, hi) with start <= date <= end."""
+        lo = 0 if start is None else self.calendar.searchsorted(pd.Timestamp(start), side='left')
+        hi = len(self.calendar) if end is None else self.calendar.searchsorted(pd.Timestamp(end), side='right')
+        return lo, hi
+
+    def entry_mask(self, signals):
+        """D x S bool: symbol has a bar that day tagged with one of `signals` (memoized)."""
+        key = tuple(signals)
+        if key not in self._entry_masks:
+            mask = np.zeros((len(self.calendar), len(self.tickers)), dtype=bool)
+            for j, t in enumerate(self.tickers):
+                s = self.series[t]
+                if s.signal is None: continue
+                tagged = np.isin(s.signal, key)
+                has = s.pos >= 0
+                mask[has, j] = tagged[s.pos[has]]
+            self._entry_masks[key] = mask
+        return self._entry_masks[key]
+
+
+def load_universe(data_dir, market_symbols=()):
+    """Load the manifest tickers (plus market series such as ^VIX) and analyze each once."""
+    with open(os.path.join(data_dir, "manifest.json"), 'r') as f:
+        manifest = json.load(f)
+    frames = {}
+    for ticker in manifest.get("success", []):
+        if ticker in market_symbols: continue
+        with open(os.path.join(data_dir, f"{ticker}.json"), 'r') as f:
+            data = json.load(f)
+        df = pd.DataFrame(data)
+        if not df.empty and 'time' in df.columns:
+            df['date'] = pd.to_datetime(df['time'])
+            frames[ticker] = KineticMarketState(df, copy=False).analyze()
+    market = {}
+    for sym in market_symbols:
+        path = os.path.join(data_dir, f"{sym}.json")
+        if not os.path.exists(path): continue
+        with open(path, 'r') as f:
+            df = pd.DataFrame(json.load(f))
+        if 'time' in df.columns:
+            df['date'] = pd.to_datetime(df['time'])
+            market[sym] = df
+    return BacktestUniverse(frames, market)
+
+
+def yearly_periods(years):
+    return [(f"{y}-01-01", f"{y}-12-31", str(y)) for y in years]
+
+
+# --- Exit Rules: (rules, days_held, pnl_pct, x_trend) -> reason or None ---
+
+def fixed_exit(rules, days_held, pnl_pct, x_trend):
+    """Time exit after holding_period days, stop loss, take profit."""
+    if days_held >= rules.holding_period: return "Time Exit"
+    if pnl_pct < -rules.stop_loss: return "Stop Loss"
+    if pnl_pct > rules.take_profit: return "Take Profit"
+    return None
+
+
+def adaptive_trend_exit(rules, days_held, pnl_pct, x_trend):
+    """Stop loss first; hold while X-trend > trend_hold, else time exit."""
+    if pnl_pct < -rules.stop_loss: return "Stop Loss"
+    if x_trend > rules.trend_hold: return None
+    if days_held >= rules.holding_period: return "Time Exit"
+    return None
+
+
+@dataclass
+class BacktestRules:
+    max_positions: int = 5
+    position_size: float = 0.10          # fraction of marked equity per entry
+    entry_signals: tuple = ENTRY_SIGNALS
+    exit_rule: object = fixed_exit
+    holding_period: int = 5
+    stop_loss: float = 0.05
+    take_profit: float = 0.10
+    trend_hold: float = 0.5
+    rank_by_trend: bool = False          # candidates strongest X-trend first
+    cap_entries: bool = False            # re-check max_positions per entry (else only once per day)
+    panic_symbol: str = None             # skip entries when this market close > panic_level
+    panic_level: float = 35.0
+
+
+@dataclass
+class PeriodResult:
+    dates: pd.DatetimeIndex
+    equity: list
+    trades: list      # {'ticker', 'entry', 'exit', 'pnl', 'reason'}
+    cash: float
+    positions: dict   # {ticker: {'qty', 'entry_price', 'entry_date'}}
+
+
+def run_period(universe, rules=None, start=None, end=None, initial_capital=100000):
+    """
+    Daily loop over calendar positions in [start, end]:
+      1. mark held symbols that have a bar today and apply the exit rule,
+      2. record equity, 3. buy tagged candidates with position_size of equity.
+    Held symbols without a bar are skipped for the day (not marked).
+    """
+    rules = rules or BacktestRules()
+    lo, hi = universe.span(start, end)
+    calendar, day_ns = universe.calendar, universe.day_ns
+    tickers, series = universe.tickers, universe.series
+    entry_mask = universe.entry_mask(rules.entry_signals)
+    panic = universe.market.get(rules.panic_symbol) if rules.panic_symbol else None
+
+    cash = initial_capital
+    positions = {}
+    equity = []
+    trades = []
+
+    for d in range(lo, hi):
+        is_panic = False
+        if panic is not None:
+            r = panic.pos[d]
+            is_panic = r >= 0 and panic.close[r] > rules.panic_level
+
+        # 1. Mark / Exit
+        current_equity = cash
+        for ticker, pos in list(positions.items()):
+            s = series[ticker]
+            r = s.pos[d]
+            if r < 0: continue
+            price = s.close[r]
+            current_equity += pos['qty'] * price
+            days_held = (day_ns[d] - pos['entry_ns']) // NS_PER_DAY
+            pnl_pct = (price - pos['entry_price']) / pos['entry_price']
+            reason = rules.exit_rule(rules, days_held, pnl_pct, s.x_trend[r] if s.x_trend is not None else 0.0)
+            if reason:
+                cash += pos['qty'] * price
+                trades.append({"ticker": ticker, "entry": pos['entry_date'], "exit": calendar[d],
+                               "pnl": pnl_pct, "reason": reason})
+                del positions[ticker]
+
+        equity.append(current_equity)
+
+        # 2. Entries
+        if is_panic or len(positions) >= rules.max_positions:
+            continue
+        cands = [(tickers[j], series[tickers[j]].pos[d]) for j in np.flatnonzero(entry_mask[d])]
+        cands = [(t, r) for t, r in cands if t not in positions]
+        if rules.rank_by_trend:
+            cands.sort(key=lambda c: series[c[0]].x_trend[c[1]], reverse=True)
+        for ticker, r in cands:
+            if rules.cap_entries and len(positions) >= rules.max_positions: break
+            allocation = current_equity * rules.position_size
+            if cash > allocation:
+                price = series[ticker].close[r]
+                cash -= allocation
+                positions[ticker] = {"qty": allocation / price, "entry_price": price,
+                                     "entry_date": calendar[d], "entry_ns": day_ns[d]}
+
+    positions = {t: {k: p[k] for k in ('qty', 'entry_price', 'entry_date')} for t, p in positions.items()}
+    return PeriodResult(calendar[lo:hi], equity, trades, cash, positions)
@@ -1,16 +1,14 @@
 import os
-import json
 import pandas as pd
-import numpy as np
 import sys
 # Fix import for local execution
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Simple try-except to handle both direct run and module run if needed, 
 # but consistent with correlation script
 try:
-    from quant_engine import KineticMarketState
+    from backtest_core import load_universe, run_period, BacktestRules
 except ImportError:
-    from research.quant_engine import KineticMarketState
+    from research.backtest_core import load_universe, run_period, BacktestRules
 
 DATA_DIR = "public/data"
 
@@ -27,114 +25,31 @@ class BacktestEngine:
         self.position_size = 0.10 # Allocate 10% per trade
         self.max_positions = 5
         self.holding_period = 5 # Days to hold
+        self.universe = None
         
     def load_data(self):
-        manifest_path = os.path.join(DATA_DIR, "manifest.json")
-        with open(manifest_path, 'r') as f:
-            manifest = json.load(f)
-            
-        tickers = manifest.get("success", [])
-        data_map = {}
-        
-        for ticker in tickers:
-            filepath = os.path.join(DATA_DIR, f"{ticker}.json")
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-            df = pd.DataFrame(data)
-            if not df.empty:
-                # Ensure date is parsed
-                if 'time' in df.columns:
-                    df['date'] = pd.to_datetime(df['time'])
-                
-                # Run Engine to get signals
-                engine = KineticMarketState(df)
-                df_processed = engine.analyze()
-                data_map[ticker] = df_processed
-                
-        return data_map
+        # Load + analyze once; reused by later runs
+        if self.universe is None:
+            self.universe = load_universe(DATA_DIR)
+        return self.universe
+    
+    def rules(self):
+        # Time exit / 5% stop / 10% target; max_positions checked once per day
+        return BacktestRules(max_positions=self.max_positions, position_size=self.position_size,
+                             holding_period=self.holding_period)
     
     def run(self):
         print(f"Starting Backtest... Capital: ${self.initial_capital}")
-        data_map = self.load_data()
-        
-        # Merge all dates to iterate chronologically
-        all_dates = sorted(list(set().union(*[df['date'].tolist() for df in data_map.values()])))
+        universe = self.load_data()
         
-        # Start from a year ago (or consistent start)
         # Using full available history from the json files
+        result = run_period(universe, self.rules(), initial_capital=self.initial_capital)
         
-        for current_date in all_dates:
-            # 1. Update Portfolio Value (Mark to Market)
-            current_equity = self.cash
-            
-            for ticker, pos in list(self.positions.items()):
-                df = data_map[ticker]
-                # Get price on current_date
-                row = df[df['date'] == current_date]
-                if row.empty:
-                    continue # No trading today for this asset?
-                    
-                price = row.iloc[0]['close']
-                current_equity += pos['qty'] * price
-                
-                # Exit Logic (Simple Time-based or Signal Reversal)
-                days_held = (current_date - pos['entry_date']).days
-                
-                # Check for exit signals
-                # For simplicity, using Time Exit (5 days) or 10% Stop Loss
-                pnl_pct = (price - pos['entry_price']) / pos['entry_price']
-                
-                should_exit = False
-                exit_reason = ""
-                
-                if days_held >= self.holding_period:
-                    should_exit = True
-                    exit_reason = "Time Exit"
-                elif pnl_pct < -0.05: # 5% Stop loss
-                    should_exit = True
-                    exit_reason = "Stop Loss"
-                elif pnl_pct > 0.10: # 10% Take Profit
-                    should_exit = True
-                    exit_reason = "Take Profit"
-                    
-                if should_exit:
-                    self.cash += pos['qty'] * price
-                    self.trade_log.append({
-                        "ticker": ticker,
-                        "entry": pos['entry_date'],
-                        "exit": current_date,
-                        "pnl": pnl_pct,
-                        "reason": exit_reason
-                    })
-                    del self.positions[ticker]
-            
-            self.equity = current_equity
-            self.history.append({"date": current_date, "equity": self.equity})
-            
-            # 2. Check for New Entries
-            if len(self.positions) < self.max_positions:
-                for ticker, df in data_map.items():
-                    row = df[df['date'] == current_date]
-                    if row.empty:
-                        continue
-                        
-                    signal = row.iloc[0]['signal']
-                    price = row.iloc[0]['close']
-                    
-                    # Entry Logic: Only enter if we don't have it and CASH is enough
-                    if ticker not in self.positions:
-                        # Strategy: Buy DIP_BUY and LAUNCHPAD
-                        if signal in ["DIP_BUY", "LAUNCHPAD"]:
-                            # Allocation amount
-                            allocation = self.equity * self.position_size
-                            if self.cash > allocation:
-                                qty = allocation / price
-                                self.cash -= allocation
-                                self.positions[ticker] = {
-                                    "qty": qty,
-                                    "entry_price": price,
-                                    "entry_date": current_date
-                                }
+        self.cash = result.cash
+        self.positions = result.positions
+        self.equity = result.equity[-1] if result.equity else self.initial_capital
+        self.history = [{"date": d, "equity": e} for d, e in zip(result.dates, result.equity)]
+        self.trade_log = result.trades
                                 
         self._print_stats()
 
@@ -0,0 +1,82 @@
+"""
+HTML Parser Benchmark (Saved Dataroma Pages)
+HTML 解析器效能比較（已保存的 Dataroma 頁面）
+
+Times the three ways a Dataroma page can be turned into table records on the
+saved research/debug_*.html fixtures and checks they agree:
+  legacy       BeautifulSoup(html, 'html.parser') full tree (what every page cost before)
+  html.parser  html_tables.extract_tables fallback (bs4 tree, targeted tables)
+  lxml         html_tables.extract_tables fast path (lxml.html, targeted tables)
+The page parsers that read each fixture's tables are run on both backends and
+must return identical output.
+以保存的頁面比較三種解析方式的耗時，並確認兩種後端的解析結果完全相同。
+
+Usage:
+    python scripts/research/bench_html_parsers.py [--repeat 20]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+from bs4 import BeautifulSoup
+
+sys.path.append(os.getcwd())
+from scripts.core.html_tables import HAS_LXML, extract_tables
+from scripts.crawl_dataroma_stock import parse_history_page, parse_overview_page
+from scripts.crawl_dataroma_managers import parse_history_rows
+
+PAGES_DIR = os.path.dirname(os.path.abspath(__file__))
+TABLE_IDS = ('grid', 't1', 't10', 'bigbets', 'low_52')
+# Fixture -> page parsers that read its tables
+FIXTURES = {
+    'debug_hist.html': [],
+    'debug_holdings.html': [parse_overview_page, parse_history_page],
+    'debug_phist.html': [parse_history_rows],
+}
+
+
+def best_of(fn, repeat):
+    """Fastest of `repeat` runs in milliseconds (after one warm-up)."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the HTML table extraction backends.')
+    parser.add_argument('--repeat', type=int, default=20, help='Timed runs per backend (best is reported)')
+    args = parser.parse_args()
+
+    if not HAS_LXML:
+        print("lxml is not installed: only the html.parser fallback can be timed (pip install lxml).")
+    backends = ['html.parser'] + (['lxml'] if HAS_LXML else [])
+
+    print(f"{'Page':<22}{'KB':>6}{'legacy ms':>12}{'html.parser ms':>16}{'lxml ms':>10}{'speedup':>9}  identical")
+    for name, parsers in FIXTURES.items():
+        with open(os.path.join(PAGES_DIR, name), encoding='utf-8') as f:
+            html = f.read()
+
+        outputs = {b: extract_tables(html, TABLE_IDS, b) for b in backends}
+        same = all(outputs[b] == outputs['html.parser'] for b in backends)
+        for parse in parsers:
+            results = [parse(outputs[b]) for b in backends]
+            same = same and all(r == results[0] for r in results)
+
+        legacy = best_of(lambda: BeautifulSoup(html, 'html.parser'), args.repeat)
+        timed = {b: best_of(lambda: extract_tables(html, TABLE_IDS, b), args.repeat) for b in backends}
+        fast = timed.get('lxml')
+        print(f"{name:<22}{len(html) / 1024:>6.0f}{legacy:>12.1f}{timed['html.parser']:>16.1f}"
+              f"{fast if fast is not None else float('nan'):>10.1f}"
+              f"{legacy / fast if fast else float('nan'):>8.1f}x  {'yes' if same else 'NO'}")
+        if not same:
+            sys.exit(f"Backends disagree on {name}")
+
+
+if __name__ == "__main__":
+    main()
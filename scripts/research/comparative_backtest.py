@@ -1,95 +1,34 @@
 import os
-import json
 import pandas as pd
-import numpy as np
 import sys
 
 # Fix import for local execution
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 try:
-    from quant_engine import KineticMarketState
+    from backtest_core import load_universe, run_period, BacktestRules
 except ImportError:
-    from research.quant_engine import KineticMarketState
+    from research.backtest_core import load_universe, run_period, BacktestRules
 
 DATA_DIR = "public/data"
 
 class ComparativeBacktestEngine:
     def __init__(self, initial_capital=100000):
         self.initial_capital = initial_capital
+        self.universe = None
         
     def load_data(self):
-        manifest_path = os.path.join(DATA_DIR, "manifest.json")
-        with open(manifest_path, 'r') as f:
-            manifest = json.load(f)
-        tickers = manifest.get("success", [])
-        data_map = {}
-        for ticker in tickers:
-            filepath = os.path.join(DATA_DIR, f"{ticker}.json")
-            with open(filepath, 'r') as f:
-                data = json.load(f)
-            df = pd.DataFrame(data)
-            if not df.empty and 'time' in df.columns:
-                df['date'] = pd.to_datetime(df['time'])
-                engine = KineticMarketState(df)
-                data_map[ticker] = engine.analyze()
-        return data_map
+        # Load + analyze once; every period reuses the same prepared universe
+        if self.universe is None:
+            self.universe = load_universe(DATA_DIR)
+        return self.universe
 
     def run_period(self, start_date, end_date, name):
         print(f"\n--- Backtesting Period: {name} ({start_date} to {end_date}) ---")
         
-        cash = self.initial_capital
-        positions = {}
-        history = []
-        trade_log = []
-        max_positions = 5
-        position_size = 0.10
-        holding_period = 5
-        
-        data_map = self.load_data()
-        all_dates = sorted(list(set().union(*[df['date'].tolist() for df in data_map.values()])))
-        period_dates = [d for d in all_dates if pd.Timestamp(start_date) <= d <= pd.Timestamp(end_date)]
-        
-        for current_date in period_dates:
-            current_equity = cash
-            
-            # 1. Update/Exit Positions
-            for ticker, pos in list(positions.items()):
-                df = data_map[ticker]
-                row = df[df['date'] == current_date]
-                if row.empty: continue
-                price = row.iloc[0]['close']
-                current_equity += pos['qty'] * price
-                
-                days_held = (current_date - pos['entry_date']).days
-                pnl_pct = (price - pos['entry_price']) / pos['entry_price']
-                
-                if days_held >= holding_period or pnl_pct < -0.05 or pnl_pct > 0.10:
-                    cash += pos['qty'] * price
-                    trade_log.append({
-                        "pnl": pnl_pct, 
-                        "year": current_date.year
-                    })
-                    del positions[ticker]
-            
-            history.append(current_equity)
-
-            # 2. Enter Positions
-            if len(positions) < max_positions:
-                for ticker, df in data_map.items():
-                    row = df[df['date'] == current_date]
-                    if row.empty: continue
-                    
-                    if ticker not in positions:
-                        # Strategy Logic
-                        if row.iloc[0]['signal'] in ["DIP_BUY", "LAUNCHPAD"]:
-                             allocation = current_equity * position_size
-                             if cash > allocation:
-                                 price = row.iloc[0]['close']
-                                 qty = allocation / price
-                                 cash -= allocation
-                                 positions[ticker] = {
-                                     "qty": qty, "entry_price": price, "entry_date": current_date
-                                 }
+        rules = BacktestRules(max_positions=5, position_size=0.10, holding_period=5)
+        result = run_period(self.load_data(), rules, start_date, end_date, self.initial_capital)
+        history = result.equity
+        trade_log = [{"pnl": t['pnl'], "year": t['exit'].year} for t in result.trades]
 
         # Analysis
         final_equity = history[-1] if history else self.initial_capital
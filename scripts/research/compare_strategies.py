@@ -1,5 +1,7 @@
 import os
+import sys
 import json
+import argparse
 import pandas as pd
 import numpy as np
 from scipy import stats
@@ -15,89 +17,43 @@ SECTOR_FILE = "public/data/sector_industry.json"
 OUTPUT_REPORT = "docs/STRATEGY_MATRIX_MAPPING.md"
 BOOTSTRAP_ITERATIONS = 2000
 CONFIDENCE_LEVEL = 0.98
+ENGINE_VERSION = 1 # bump when trade semantics change outside the fingerprinted code
 
-# --- Indicator Library ---
-class Indicators:
-    @staticmethod
-    def mcginley_dynamic(series, period=14):
-        # User formula: k = window (or window * 0.6)
-        # We use window=14 as requested
-        md = np.zeros_like(series)
-        md[0] = series.iloc[0]
-        k = float(period)
-        for i in range(1, len(series)):
-            prev = md[i-1]
-            price = series.iloc[i]
-            if prev == 0: prev = 1e-9
-            ratio = max(price / prev, 0.001)
-            # Power 4 acceleration
-            md[i] = prev + (price - prev) / (k * (ratio ** 4))
-        return pd.Series(md, index=series.index)
-
-    @staticmethod
-    def stoch_rsi(series, period=14):
-        delta = series.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        loss = loss.replace(0, 1e-9)
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        min_rsi = rsi.rolling(window=period).min()
-        max_rsi = rsi.rolling(window=period).max()
-        stoch = (rsi - min_rsi) / (max_rsi - min_rsi).replace(0, 1e-9)
-        return stoch.fillna(0.5)
-
-    @staticmethod
-    def atr(high, low, close, period=14):
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        return tr.rolling(period).mean()
-
-    @staticmethod
-    def bollinger_width(close, period=20):
-        sma = close.rolling(period).mean()
-        std = close.rolling(period).std()
-        upper = sma + 2 * std
-        lower = sma - 2 * std
-        return (upper - lower) / sma
+# Project root on path for the shared indicator planner
+sys.path.append(os.getcwd())
+from scripts.core.indicator_planner import IndicatorContext, attach, spec
+from scripts.core.bootstrap_stats import bootstrap_lower_bounds, point_metrics
+from scripts.core.result_cache import ResultCache, code_fingerprint
+
+# Research variants: Kinetic McGinley (k = window), normalized StochRSI and
+# BB width over the raw SMA. Shared specs are computed once per symbol.
+BB_WIDTH = spec('bb_width', period=20, zero_guard=False)
 
 class StrategyBase:
+    requires = {}
+
     def __init__(self, name):
         self.name = name
         self.audit = {"EMA": False, "ATR": False, "OBV": False}
 
-    def prepare(self, df):
-        return df
+    def prepare(self, df, ctx=None):
+        return attach(df, self.requires, ctx)
 
     def get_signal(self, row, prev_row, days_held, current_pnl, **kwargs):
         raise NotImplementedError
 
 class StrategyV1_Original(StrategyBase):
+    # Kinetic Logic: Buy Dip in Trend (Price > McGinley AND StochRSI < 0.2)
+    requires = {
+        'mcginley': spec('kinetic_mcginley', period=14),  # X: McGinley (14)
+        'stoch_rsi': spec('stoch_rsi', period=14),         # Y: StochRSI (14)
+        'bb_width': BB_WIDTH,                              # Z: BB Width (20)
+    }
+
     def __init__(self):
         super().__init__("V1 (Original)")
         self.audit = {"EMA": True, "ATR": False, "OBV": False}
 
-    def prepare(self, df):
-        # X: McGinley (14)
-        df['mcginley'] = Indicators.mcginley_dynamic(df['close'], 14)
-        # Y: StochRSI (14)
-        df['stoch_rsi'] = Indicators.stoch_rsi(df['close'], 14)
-        # Z: BB Width (20)
-        df['bb_width'] = Indicators.bollinger_width(df['close'], 20)
-        
-        # We need a condition. Assuming "Dip Buy" similar to V2 but with V1 indicators
-        # Or maybe "Trend Following"?
-        # Given "Trend Scale" context, likely:
-        # Buy when Trend(X) is Up AND Mom(Y) is Low (Dip) OR Mom is High (Breakout)?
-        # Let's use the Classic Kinetic Logic: X > Price (Support) or Trend Up?
-        # User said X=Trend. Usually Price > X is Bull.
-        # User said Y=Momentum. Usually oversold is buy.
-        # Let's assume Kinetic Logic: Buy Dip in Trend. 
-        # Price > McGinley AND StochRSI < 0.2
-        return df
-
     def get_signal(self, row, prev_row, days_held, current_pnl, **kwargs):
         # Entry
         is_bull = row['close'] > row['mcginley']
@@ -120,21 +76,19 @@ class StrategyV1_Original(StrategyBase):
         return entry, exit_sig, reason
 
 class StrategyV5_Sharpe(StrategyBase):
+    requires = {
+        'atr': spec('atr', period=14),
+        'bb_width': BB_WIDTH,
+        'bb_width_pct': spec('rolling_rank', source=BB_WIDTH, window=120),
+        'ma200': spec('sma', period=200),
+        'bb_upper': spec('bb_upper', period=20),
+        'highest_high': spec('rolling_max', period=22),
+    }
+
     def __init__(self):
         super().__init__("V5 (Sharpe/Squeeze)")
         self.audit = {"EMA": False, "ATR": True, "OBV": False}
 
-    def prepare(self, df):
-        df['atr'] = Indicators.atr(df['high'], df['low'], df['close'], 14)
-        df['bb_width'] = Indicators.bollinger_width(df['close'], 20)
-        df['bb_width_pct'] = df['bb_width'].rolling(120).rank(pct=True)
-        df['ma200'] = df['close'].rolling(200).mean()
-        sma = df['close'].rolling(20).mean()
-        std = df['close'].rolling(20).std()
-        df['bb_upper'] = sma + 2 * std
-        df['highest_high'] = df['high'].rolling(22).max()
-        return df
-
     def get_signal(self, row, prev_row, days_held, current_pnl, **kwargs):
         is_squeeze = (row['bb_width_pct'] < 0.20)
         is_breakout = (row['close'] > row['bb_upper'])
@@ -153,10 +107,13 @@ class StrategyV5_Sharpe(StrategyBase):
         return entry, exit_sig, reason
 
 class ComparisonEngine:
-    def __init__(self):
+    def __init__(self, use_cache=True):
         self.strategies = [StrategyV1_Original(), StrategyV5_Sharpe()]
         self.sector_map = {}
         self.results = []
+        code = code_fingerprint(StrategyBase, *[type(strat) for strat in self.strategies], ComparisonEngine.backtest_symbol)
+        requires = [strat.requires for strat in self.strategies]
+        self.cache = ResultCache('compare_strategies', ENGINE_VERSION, {'code': code, 'requires': requires}, enabled=use_cache)
 
     def load_metadata(self):
         if not os.path.exists(SECTOR_FILE): return
@@ -196,56 +153,58 @@ class ComparisonEngine:
 
         for symbol, df_raw in all_data.items():
             sector = self.sector_map.get(symbol, 'Unknown')
-            for strat in self.strategies:
-                df = df_raw.copy()
-                try:
-                    df = strat.prepare(df)
-                    df = df.dropna().reset_index(drop=True)
-                except: continue
-
-                in_pos = False
-                entry_price = 0
-                entry_idx = 0
-                local_high = 0
-                
-                for i in range(1, len(df)):
-                    row = df.iloc[i]
-                    prev_row = df.iloc[i-1]
-                    
-                    days_held = 0
-                    current_pnl = 0.0
-                    if in_pos:
-                        days_held = i - entry_idx
-                        current_pnl = (row['close'] - entry_price) / entry_price
-                        local_high = max(local_high, row['high'])
-                    
-                    ent, ext, reason = strat.get_signal(row, prev_row, days_held, current_pnl, local_high=local_high)
-                    
-                    if in_pos:
-                        if ext:
-                            self.results.append({
-                                'Symbol': symbol,
-                                'Sector': sector,
-                                'Strategy': strat.name,
-                                'PnL': current_pnl,
-                                'Days': days_held
-                            })
-                            in_pos = False
-                    elif ent:
-                        in_pos = True
-                        entry_price = row['close']
-                        entry_idx = i
-                        local_high = row['close']
-    
+            self.results.extend(self.cache.fetch_trades(symbol, (df_raw, sector), lambda: self.backtest_symbol(symbol, df_raw)))
+        print(self.cache.summary())
+
+    def backtest_symbol(self, symbol, df_raw):
+        trades = []
+        sector = self.sector_map.get(symbol, 'Unknown')
+        # One indicator pass per symbol, shared by both strategies
+        ctx = IndicatorContext(df_raw)
+        for strat in self.strategies:
+            try:
+                df = strat.prepare(df_raw, ctx)
+                df = df.dropna().reset_index(drop=True)
+            except: continue
+
+            in_pos = False
+            entry_price = 0
+            entry_idx = 0
+            local_high = 0
+
+            for i in range(1, len(df)):
+                row = df.iloc[i]
+                prev_row = df.iloc[i-1]
+
+                days_held = 0
+                current_pnl = 0.0
+                if in_pos:
+                    days_held = i - entry_idx
+                    current_pnl = (row['close'] - entry_price) / entry_price
+                    local_high = max(local_high, row['high'])
+
+                ent, ext, reason = strat.get_signal(row, prev_row, days_held, current_pnl, local_high=local_high)
+
+                if in_pos:
+                    if ext:
+                        trades.append({
+                            'Symbol': symbol,
+                            'Sector': sector,
+                            'Strategy': strat.name,
+                            'PnL': current_pnl,
+                            'Days': days_held
+                        })
+                        in_pos = False
+                elif ent:
+                    in_pos = True
+                    entry_price = row['close']
+                    entry_idx = i
+                    local_high = row['close']
+        return trades
+
     def calculate_max_drawdown(self, returns):
         # Simulate equity curve
-        equity = [1.0]
-        for r in returns:
-            equity.append(equity[-1] * (1 + r))
-        equity = np.array(equity)
-        peak = np.maximum.accumulate(equity)
-        drawdown = (equity - peak) / peak
-        return drawdown.min()
+        return point_metrics(returns, ('mdd',))['mdd']
 
     def to_md_table(self, data):
         if not data: return ""
@@ -279,13 +238,7 @@ class ComparisonEngine:
                 returns = s_df['PnL']
                 
                 # Sharpe Bootstrap
-                sharpes = []
-                for _ in range(500):
-                    sample = returns.sample(n=len(returns), replace=True)
-                    s = (sample.mean() / sample.std()) * (252**0.5) if sample.std() > 0 else 0
-                    sharpes.append(s)
-                sharpes.sort()
-                lb_sharpe = sharpes[int(500 * (1 - CONFIDENCE_LEVEL))]
+                lb_sharpe = bootstrap_lower_bounds(returns, 500, CONFIDENCE_LEVEL, ('sharpe',))['sharpe']
                 
                 # Profit Factor
                 wins = returns[returns > 0].sum()
@@ -318,6 +271,10 @@ class ComparisonEngine:
         print(f"Report written to {OUTPUT_REPORT}")
 
 if __name__ == "__main__":
-    engine = ComparisonEngine()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every symbol (ignore the result cache)")
+    args = parser.parse_args()
+
+    engine = ComparisonEngine(use_cache=not args.no_cache)
     engine.run()
     engine.generate_report()
@@ -1,7 +1,11 @@
-import yfinance as yf
+import os
+import sys
 import pandas as pd
 import numpy as np
 
+sys.path.append(os.getcwd())
+from scripts.core.fear_greed import FearGreedEngine
+
 TRUTH_TABLE = {
     "2025-10-16": 23,
     "2025-10-21": 29,
@@ -24,71 +28,12 @@ TRUTH_TABLE = {
     "2026-01-16": 62
 }
 
-def fetch_data():
-    # Proxies for Zeiierman's inputs
-    # SPX -> ^GSPC
-    # ADVN/DECN -> Not avail. Use Volume Proxy or just VIX inv? Zeiierman uses ADVN/DECN explicitly. 
-    # We don't have ADVN/DECN in yfinance easily without fetching breadth data. 
-    # For fair comparison, we use OUR best proxies but HIS formulas?
-    # No, to answer "Zeiierman's algorithm", we must implement HIS math.
-    # We will use Volume flows as proxy for Adv/Dec if needed, or just VIX proxy as fallback but applying HIS Normalization.
-    # Let's use our data but apply his MinMax Logic.
-    tickers = ["^GSPC", "^VIX", "JNK", "IEF", "^NYA"]
-    data = yf.download(tickers, period="5y", interval="1d", progress=False)
-    if isinstance(data.columns, pd.MultiIndex):
-        closes = data['Close']
-        highs = data['High']
-        lows = data['Low']
-    else:
-        closes = data
-        highs = data
-        lows = data
-    return closes.ffill(), highs.ffill(), lows.ffill()
-
 # --- Current Method (Z-Score 125d) ---
-def calc_current(closes, highs, lows):
-    def z_norm(series, invert=False, scale=20):
-        wd = 125
-        rm = series.rolling(wd).mean()
-        rstd = series.rolling(wd).std()
-        z = (series - rm) / rstd
-        if invert: z = -z
-        return (50 + z*scale).clip(0, 100)
-
-    # Momentum
-    spx = closes['^GSPC']
-    ma125 = spx.rolling(125).mean()
-    mom = z_norm(spx / ma125)
-
-    # Strength
-    nya = closes['^NYA']
-    h52 = nya.rolling(252).max()
-    l52 = nya.rolling(252).min()
-    stre = z_norm((nya - l52)/(h52-l52))
-
-    # Breadth (VIX diff)
-    vix = closes['^VIX']
-    br = z_norm(vix.diff(5), invert=True)
-
-    # Options (VIX Lvl)
-    opt = z_norm(vix, invert=True)
-
-    # Vol (VIX vs 50)
-    vma50 = vix.rolling(50).mean()
-    vol = z_norm((vix - vma50)/vma50, invert=True)
-
-    # Safe
-    sret = spx.pct_change(20)
-    bret = closes['IEF'].pct_change(20)
-    safe = z_norm(sret - bret)
-
-    # Junk
-    junk = z_norm(closes['JNK']/closes['IEF'])
-
-    return (mom+stre+br+opt+vol+safe+junk)/7
+def calc_current(engine):
+    return engine.index(engine.components(lookback=125, scale=20))
 
 # --- Zeiierman Method (MinMax) ---
-def calc_zeiierman(closes, highs, lows):
+def calc_zeiierman(closes):
     # Zeiierman uses two scaling functions:
     # Scales(input) -> MinMax over global/long window (Simulate 500)
     # Scale(input) -> MinMax over 100
@@ -168,10 +113,12 @@ def calc_zeiierman(closes, highs, lows):
     return avg
 
 if __name__ == "__main__":
-    closes, highs, lows = fetch_data()
+    engine = FearGreedEngine(period="5y")
+    closes = engine.closes
     
-    curr = calc_current(closes, highs, lows)
-    zeii = calc_zeiierman(closes, highs, lows)
+    curr = calc_current(engine)
+    # Zeiierman's algorithm applied to our proxies (ADVN/DECN, put/call and yields are unavailable)
+    zeii = calc_zeiierman(closes)
     
     print(f"{'Date':<12} | {'Target':<6} | {'Current':<8} | {'Zeiierman':<8} | {'Diff(Z-C)':<6}")
     print("-" * 60)
@@ -1,5 +1,6 @@
 import os
 import json
+import argparse
 import pandas as pd
 import numpy as np
 try:
@@ -12,6 +13,35 @@ except ImportError:
 
 DATA_DIR = "public/data"
 
+class TickerObservations:
+    """
+    One ticker's (x, y, z, forward return) observations, stored column-wise.
+    Replaces one dict per row; compact mode stores float32 columns.
+    """
+    __slots__ = ('ticker', 'x', 'y', 'z', 'ret_1d', 'ret_3d', 'ret_5d')
+
+    def __init__(self, ticker, valid_df, dtype=np.float64):
+        self.ticker = ticker
+        self.x = valid_df['x_trend'].to_numpy(dtype)
+        self.y = valid_df['y_momentum'].to_numpy(dtype)
+        self.z = valid_df['z_structure'].to_numpy(dtype)
+        self.ret_1d = valid_df['ret_1d'].to_numpy(dtype)
+        self.ret_3d = valid_df['ret_3d'].to_numpy(dtype)
+        self.ret_5d = valid_df['ret_5d'].to_numpy(dtype)
+
+    def __len__(self):
+        return len(self.x)
+
+def observations_to_frame(blocks):
+    """Concatenate per-ticker blocks into the master observation table."""
+    cols = ['x', 'y', 'z', 'ret_1d', 'ret_3d', 'ret_5d']
+    if not blocks:
+        return pd.DataFrame(columns=['ticker'] + cols)
+    data = {'ticker': pd.Categorical(np.repeat([b.ticker for b in blocks], [len(b) for b in blocks]))}
+    for col in cols:
+        data[col] = np.concatenate([getattr(b, col) for b in blocks])
+    return pd.DataFrame(data)
+
 def load_all_data():
     """Loads all JSON data into a single Dictionary of DataFrames."""
     manifest_path = os.path.join(DATA_DIR, "manifest.json")
@@ -31,17 +61,18 @@ def load_all_data():
             
     return data_map
 
-def calculate_correlations():
+def calculate_correlations(compact=False):
     print("Loading data...")
     data_map = load_all_data()
     
-    master_records = []
+    dtype = np.float32 if compact else np.float64
+    blocks = []
     
     print(f"Processing {len(data_map)} tickers...")
     for ticker, df in data_map.items():
         try:
             # 1. Run Quant Engine
-            engine = KineticMarketState(df)
+            engine = KineticMarketState(df, copy=False) # df is private to this loop
             df_analyzed = engine.analyze()
             
             # 2. Calculate Forward Returns (Ground Truth)
@@ -53,22 +84,13 @@ def calculate_correlations():
             # 3. Collect Data Points (ignoring last 5 days where future is unknown)
             valid_df = df_analyzed.dropna(subset=['ret_5d', 'x_trend', 'y_momentum', 'z_structure'])
             
-            for _, row in valid_df.iterrows():
-                master_records.append({
-                    "ticker": ticker,
-                    "x": row['x_trend'],
-                    "y": row['y_momentum'],
-                    "z": row['z_structure'],
-                    "ret_1d": row['ret_1d'],
-                    "ret_3d": row['ret_3d'],
-                    "ret_5d": row['ret_5d']
-                })
+            blocks.append(TickerObservations(ticker, valid_df, dtype))
                 
         except Exception as e:
             print(f"Error processing {ticker}: {e}")
             
     # 4. Global Correlation Analysis
-    master_df = pd.DataFrame(master_records)
+    master_df = observations_to_frame(blocks)
     print(f"\nTotal Data Points: {len(master_df)}")
     
     # Spearman Correlation (Rank Correlation - robust to outliers)
@@ -109,4 +131,7 @@ def calculate_correlations():
     print(f"Avg 5-Day Return: {climax_returns.mean():.2%}")
 
 if __name__ == "__main__":
-    calculate_correlations()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compact", action="store_true", help="Store observations as float32")
+    args = parser.parse_args()
+    calculate_correlations(compact=args.compact)
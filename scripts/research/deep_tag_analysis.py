@@ -3,6 +3,8 @@ Deep Tag Analysis (Scientific Protocol - Industrial Grade)
 Executes the "Grand Challenge" Validation: 26 Questions across 9 Core Blocks (A-I).
 Includes Vectorized Backtesting for N=2000 Bootstrapping.
 OPTIMIZED: Pre-calculates Indicators to avoid repetitive processing.
+COMPACT (--compact): float32 caches holding only the columns the blocks read.
+Use --memory-report to compare cache footprints of both modes.
 """
 
 import sys
@@ -13,11 +15,12 @@ from datetime import datetime
 import random
 from scipy import stats
 import json
+import argparse
 
 # Add parent directory to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from research.quant_engine import KineticMarketState
+from research.quant_engine import KineticMarketState, compact_frame, frame_nbytes
 from data.tag_engine import get_ticker_tags, get_strategy_mode
 from data.category_universes import get_all_category_tickers
 
@@ -28,9 +31,14 @@ CONFIDENCE_LEVEL = 0.98
 ALPHA = 1.0 - CONFIDENCE_LEVEL
 RISK_FREE_RATE = 0.04
 
+# Columns the blocks actually read (compact mode keeps only these)
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+INDICATOR_COLUMNS = ['x_trend', 'y_momentum', 'z_structure', 'signal']
+
 class AnalysisEngine:
-    def __init__(self):
+    def __init__(self, compact=False):
         self.tickers = get_all_category_tickers()
+        self.compact = compact
         self.data_cache = {}
         self.indicator_cache = {} # Pre-calculated indicators
         self.spy_returns = None
@@ -53,22 +61,40 @@ class AnalysisEngine:
                     if len(df) > 50:
                         self.data_cache[t] = df
                         
-                        # Pre-calc Indicators
+                        # Pre-calc Indicators (always from the float64 prices)
                         if t in self.tickers: # Only for analyzed tickers
-                            eng = KineticMarketState(df.reset_index())
+                            # reset_index() already returns a private frame
+                            eng = KineticMarketState(df.reset_index(), copy=False)
                             df_ind = eng.analyze()
                             if 'date_parsed' in df_ind.columns:
                                 df_ind.set_index('date_parsed', inplace=True)
                             else:
                                 df_ind.index = df.index
+                            if self.compact:
+                                df_ind = compact_frame(df_ind[INDICATOR_COLUMNS])
                             self.indicator_cache[t] = df_ind
+                        
+                        if self.compact:
+                            self.data_cache[t] = compact_frame(df[[c for c in PRICE_COLUMNS if c in df.columns]])
                             
                 except Exception as e:
                     print(f"Error loading {t}: {e}")
         
         if 'SPY' in self.data_cache:
-            self.spy_returns = self.data_cache['SPY']['close'].pct_change().fillna(0)
+            self.spy_returns = self.close('SPY').pct_change().fillna(0)
             
+    def close(self, ticker):
+        """Close series in float64 (compact caches store float32)."""
+        return self.data_cache[ticker]['close'].astype(np.float64)
+
+    def memory_report(self):
+        """Deep memory footprint (bytes) of the research caches."""
+        return {
+            "tickers": len(self.data_cache),
+            "data_cache": frame_nbytes(self.data_cache.values()),
+            "indicator_cache": frame_nbytes(self.indicator_cache.values()),
+        }
+
     def run_strategy(self, ticker, mode, params_override=None):
         """
         Runs strategy logic on PRE-CALCULATED indicators.
@@ -96,7 +122,7 @@ class AnalysisEngine:
         # 3. Vectorized Signals
         x = df_ind['x_trend'].values
         y = df_ind['y_momentum'].values
-        z = df_ind['z_structure'].values
+        z = df_ind['z_structure'].values.astype(np.float64)
         
         sig_codes = np.zeros(len(x), dtype=int)
         
@@ -114,8 +140,7 @@ class AnalysisEngine:
 
     def simulate_equity_vectorized(self, ticker, sig_codes, slippage_bps=0):
         # Use data from cache for checks/prices
-        df = self.data_cache[ticker]
-        returns = df['close'].pct_change().fillna(0).values
+        returns = self.close(ticker).pct_change().fillna(0).values
         
         # Safe length check
         n_sigs = len(sig_codes)
@@ -261,8 +286,8 @@ class AnalysisEngine:
             if t not in self.indicator_cache: continue
             df_ind = self.indicator_cache[t] # Use cache
             
-            z = df_ind['z_structure'].values
-            rets = self.data_cache[t]['close'].pct_change().values
+            z = df_ind['z_structure'].values.astype(np.float64)
+            rets = self.close(t).pct_change().values
             
             # Align lengths
             n = min(len(z), len(rets))
@@ -380,8 +405,7 @@ class AnalysisEngine:
         
         for t in self.tickers:
             if t not in self.data_cache: continue
-            df = self.data_cache[t]
-            close = df['close']
+            close = self.close(t)
             
             ma20 = close.rolling(20).mean()
             ma60 = close.rolling(60).mean()
@@ -465,6 +489,28 @@ class NpEncoder(json.JSONEncoder):
         if isinstance(obj, np.ndarray): return obj.tolist()
         return super(NpEncoder, self).default(obj)
 
+def print_memory_report():
+    """Load the universe in both modes and print the cache footprint."""
+    full = AnalysisEngine().memory_report()
+    compact = AnalysisEngine(compact=True).memory_report()
+    print(f"\n=== Cache Memory ({full['tickers']} tickers) ===")
+    print(f"{'Cache':<18}{'float64 (MB)':>14}{'compact (MB)':>14}{'Saved':>8}")
+    for key in ("data_cache", "indicator_cache"):
+        a, b = full[key], compact[key]
+        saved = 1 - b / a if a else 0
+        print(f"{key:<18}{a / 1e6:>14.2f}{b / 1e6:>14.2f}{saved:>8.1%}")
+    total_a = full["data_cache"] + full["indicator_cache"]
+    total_b = compact["data_cache"] + compact["indicator_cache"]
+    print(f"{'total':<18}{total_a / 1e6:>14.2f}{total_b / 1e6:>14.2f}{(1 - total_b / total_a) if total_a else 0:>8.1%}")
+
 if __name__ == "__main__":
-    eng = AnalysisEngine()
-    eng.execute()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--compact", action="store_true", help="float32 caches with only the columns the blocks read")
+    parser.add_argument("--memory-report", action="store_true", help="Compare cache memory of float64 vs compact mode and exit")
+    args = parser.parse_args()
+    
+    if args.memory_report:
+        print_memory_report()
+    else:
+        eng = AnalysisEngine(compact=args.compact)
+        eng.execute()
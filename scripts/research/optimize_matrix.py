@@ -1,7 +1,16 @@
 import os
 import json
+import sys
+import time
+import argparse
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+sys.path.append(os.getcwd())
+from scripts.core.bootstrap_stats import bootstrap_lower_bounds, point_metrics
+from scripts.core.result_cache import ResultCache, code_fingerprint
 
 # Constants
 DATA_DIR = "public/data"
@@ -10,6 +19,14 @@ OUTPUT_REPORT = "docs/OPTIMIZED_STRATEGY_MATRIX.md"
 BOOTSTRAP_ITERATIONS = 2000 # Reduced slightly for grid search speed, can increase for final verify
 CONFIDENCE_LEVEL = 0.98
 START_DATE = "2018-01-01"
+ENGINE_VERSION = 1 # bump when prepared arrays change outside the fingerprinted code
+
+# Walk-forward mode
+WF_REPORT = "docs/WALK_FORWARD_MATRIX.md"
+WF_TRAIN_YEARS = 3
+WF_TEST_YEARS = 1
+WF_BOOTSTRAP_ITERATIONS = 500
+WF_TIME_BUDGET = 600 # seconds; selections after the deadline fall back to point estimates
 
 # --- Variations ---
 CONFIGS = [
@@ -44,102 +61,280 @@ class Indicators:
         width = (upper - lower) / sma
         return sma, upper, width
 
+# --- Prepared Indicators (config-independent, computed once per symbol) ---
+def base_indicators(df):
+    df['atr'] = Indicators.atr(df['high'], df['low'], df['close'], 14)
+    df['ma20'], df['bb_upper'], df['bb_width'] = Indicators.bollinger_bands(df['close'], 20)
+    df['bb_width_pct'] = df['bb_width'].rolling(120).rank(pct=True)
+    df['ma200'] = df['close'].rolling(200).mean()
+    return df
+
+def market_filters(dates, market_data):
+    """Filter masks aligned (ffill) to one symbol's dates. Missing market data = no filter."""
+    filters = {}
+    if 'SPY' in market_data:
+        spy = market_data['SPY'].reindex(dates, method='ffill')
+        filters['SPY_MA200'] = (spy > spy.rolling(200).mean()).to_numpy()
+    if '^VIX' in market_data:
+        vix = market_data['^VIX'].reindex(dates, method='ffill')
+        filters['VIX_25'] = (vix < 25).to_numpy()
+    return filters
+
+@dataclass
+class PreparedSymbol:
+    """
+    Arrays every config reads for one symbol: indicators, the setup mask
+    (squeeze & breakout & above MA200) and the aligned market-filter masks.
+    每個標的只計算一次的指標與濾網，所有參數組合共用。
+    """
+    symbol: str
+    dates: np.ndarray
+    close: np.ndarray
+    high: np.ndarray
+    atr: np.ndarray
+    setup: np.ndarray
+    filters: dict
+
+    @classmethod
+    def build(cls, symbol, df, market_data):
+        df = base_indicators(df.copy())
+        setup = (df['bb_width_pct'] < 0.20) & (df['close'] > df['bb_upper']) & (df['close'] > df['ma200'])
+        return cls(
+            symbol=symbol,
+            dates=df['date'].to_numpy(),
+            close=df['close'].to_numpy(dtype=float),
+            high=df['high'].to_numpy(dtype=float),
+            atr=df['atr'].to_numpy(dtype=float),
+            setup=setup.to_numpy(),
+            filters=market_filters(df['date'], market_data),
+        )
+
+    def arrays(self):
+        """Flat {name: array} form for the result cache (filters as filter_<name>)."""
+        out = {'dates': self.dates, 'close': self.close, 'high': self.high, 'atr': self.atr, 'setup': self.setup}
+        out.update({f'filter_{k}': v for k, v in self.filters.items()})
+        return out
+
+    @classmethod
+    def from_arrays(cls, symbol, arrays):
+        filters = {k[len('filter_'):]: v for k, v in arrays.items() if k.startswith('filter_')}
+        return cls(symbol=symbol, dates=arrays['dates'], close=arrays['close'], high=arrays['high'],
+                   atr=arrays['atr'], setup=arrays['setup'], filters=filters)
+
+    def entries(self, filter_name):
+        mask = self.filters.get(filter_name)
+        return self.setup if mask is None else self.setup & mask
+
+    def window(self, start, end):
+        """Rows with start <= date < end (views; indicators keep their full-history warm-up)."""
+        lo, hi = np.searchsorted(self.dates, [np.datetime64(start), np.datetime64(end)])
+        return PreparedSymbol(
+            symbol=self.symbol, dates=self.dates[lo:hi], close=self.close[lo:hi], high=self.high[lo:hi],
+            atr=self.atr[lo:hi], setup=self.setup[lo:hi],
+            filters={k: v[lo:hi] for k, v in self.filters.items()},
+        )
+
+def simulate_trades(dates, close, high, atr, entry_mask, stop_mult, time_limit, close_open=False):
+    """
+    V5 trade loop: trailing ATR stop from the local high plus a stagnation stop.
+    close_open: exit a position still open on the last bar at that bar's close
+    (walk-forward test windows); otherwise it is dropped.
+    """
+    trades = []
+    in_pos = False
+    entry_price = 0
+    entry_idx = 0
+    local_high = 0
+    
+    for i in range(1, len(close)):
+        if in_pos:
+            # Numpy timedelta64 to float days
+            days_held = (dates[i] - dates[entry_idx]) / np.timedelta64(1, 'D')
+            
+            # Update High
+            if high[i] > local_high: local_high = high[i]
+            
+            # Exit Logic
+            stop_price = local_high - (stop_mult * atr[i])
+            
+            exit_signal = False
+            if close[i] < stop_price:
+                exit_signal = True
+            elif days_held > time_limit:
+                # Check PnL? V5 Original: days > 10 and PnL < small gain
+                current_pnl = (close[i] - entry_price) / entry_price
+                if current_pnl < (0.5 * atr[i] / close[i]):
+                    exit_signal = True
+            
+            if exit_signal:
+                pnl = (close[i] - entry_price) / entry_price
+                trades.append({
+                    'EntryDate': dates[entry_idx],
+                    'ExitDate': dates[i],
+                    'PnL': pnl
+                })
+                in_pos = False
+        
+        elif entry_mask[i]: # New Entry
+            in_pos = True
+            entry_price = close[i]
+            entry_idx = i
+            local_high = close[i]
+    
+    if in_pos and close_open:
+        trades.append({
+            'EntryDate': dates[entry_idx],
+            'ExitDate': dates[-1],
+            'PnL': (close[-1] - entry_price) / entry_price
+        })
+    return trades
+
 # --- Strategy Engine ---
 class StrategySimulator:
     def __init__(self, config):
         self.config = config
     
     def prepare(self, df, spy_df=None, vix_df=None):
-        # Base Indicators
-        df['atr'] = Indicators.atr(df['high'], df['low'], df['close'], 14)
-        df['ma20'], df['bb_upper'], df['bb_width'] = Indicators.bollinger_bands(df['close'], 20)
-        df['bb_width_pct'] = df['bb_width'].rolling(120).rank(pct=True)
-        df['ma200'] = df['close'].rolling(200).mean()
-        
-        # Merge External Data for Filters (approximate alignment by index/date)
-        if self.config['filter'] == 'SPY_MA200' and spy_df is not None:
-            # Need to align by date. For speed, we assume alignment or use reindex.
-            # Merging inside a loop is slow. Better is to pass aligned Series.
-            pass 
-        return df
+        return base_indicators(df)
 
     def run(self, df, spy_series=None, vix_series=None):
-        # Optimized vectorized-like loop
-        signals = []
-        
         # Entry Logic (Vectorized Pre-calc)
         is_squeeze = (df['bb_width_pct'] < 0.20)
         is_breakout = (df['close'] > df['bb_upper'])
         is_bull = (df['close'] > df['ma200'])
+        entries = (is_squeeze & is_breakout & is_bull).to_numpy()
         
-        # Filter Logic
-        filter_mask = pd.Series(True, index=df.index)
+        # Filter Logic (positional: filter series are aligned to df's rows)
         if self.config['filter'] == 'SPY_MA200' and spy_series is not None:
              # SPY > MA200
-             filter_mask = (spy_series > spy_series.rolling(200).mean())
+             entries = entries & (spy_series > spy_series.rolling(200).mean()).to_numpy()
         elif self.config['filter'] == 'VIX_25' and vix_series is not None:
-             filter_mask = (vix_series < 25)
-             
-        entries = is_squeeze & is_breakout & is_bull & filter_mask
+             entries = entries & (vix_series < 25).to_numpy()
         
-        # Trade Simulation Loop
-        trades = []
-        in_pos = False
-        entry_price = 0
-        entry_idx = 0
-        local_high = 0
+        return self.simulate(df['date'].to_numpy(), df['close'].to_numpy(dtype=float),
+                             df['high'].to_numpy(dtype=float), df['atr'].to_numpy(dtype=float), entries)
+
+    def simulate(self, dates, close, high, atr, entry_mask, close_open=False):
+        return simulate_trades(dates, close, high, atr, entry_mask, self.config['stop_atr'], self.config['time_stop'], close_open)
+
+    def run_prepared(self, prepared, close_open=False):
+        p = prepared
+        return self.simulate(p.dates, p.close, p.high, p.atr, p.entries(self.config['filter']), close_open)
+
+def choose_config(prepared, iterations=None):
+    """Best config for a group of prepared symbols: (config, (pf_lb, sharpe_lb, mdd_lb))."""
+    best_score = -999
+    best_config = None
+    best_metrics = None
+    
+    for config in CONFIGS:
+        # Accumulate trades for this config across all sector symbols
+        simulator = StrategySimulator(config)
+        sector_trades = []
+        for p in prepared:
+            sector_trades.extend(simulator.run_prepared(p))
         
-        stop_mult = self.config['stop_atr']
-        time_limit = self.config['time_stop']
+        # Score this Config
+        pf_lb, sharpe_lb, mdd_lb = MatrixOptimizer.bootstrap_score(sector_trades, iterations)
         
-        # Convert to numpy for speed
-        close_arr = df['close'].values
-        high_arr = df['high'].values
-        atr_arr = df['atr'].values
-        date_arr = df['date'].values
-        entry_mask = entries.values
+        # Scoring Logic: Maximize PF, but must have PF > 1.0. Prefer PF > |MaxDD|
+        # Score = PF Lower Bound.
+        # Penalty if MaxDD is too deep (-50%?)
         
-        for i in range(1, len(df)):
-            if in_pos:
-                # Numpy timedelta64 to float days
-                days_held = (date_arr[i] - date_arr[entry_idx]) / np.timedelta64(1, 'D')
-                
-                # Update High
-                if high_arr[i] > local_high: local_high = high_arr[i]
-                
-                # Exit Logic
-                stop_price = local_high - (stop_mult * atr_arr[i])
-                
-                exit_signal = False
-                if close_arr[i] < stop_price:
-                    exit_signal = True
-                elif days_held > time_limit:
-                    # Check PnL? V5 Original: days > 10 and PnL < small gain
-                    current_pnl = (close_arr[i] - entry_price) / entry_price
-                    if current_pnl < (0.5 * atr_arr[i] / close_arr[i]):
-                        exit_signal = True
-                
-                if exit_signal:
-                    pnl = (close_arr[i] - entry_price) / entry_price
-                    trades.append({
-                        'EntryDate': date_arr[entry_idx],
-                        'ExitDate': date_arr[i],
-                        'PnL': pnl
-                    })
-                    in_pos = False
-            
-            elif entry_mask[i]: # New Entry
-                in_pos = True
-                entry_price = close_arr[i]
-                entry_idx = i
-                local_high = close_arr[i]
-                
-        return trades
+        score = pf_lb
+        if mdd_lb < -0.5: score -= 1.0 # Penalize deep drawdowns
+        
+        if score > best_score:
+            best_score = score
+            best_config = config
+            best_metrics = (pf_lb, sharpe_lb, mdd_lb)
+    return best_config, best_metrics
+
+def optimize_sector(task):
+    """
+    Pick the best config for one sector (runs in a worker process).
+    Only the trade simulation and scoring run per config.
+    """
+    sector, prepared = task
+    best_config, best_metrics = choose_config(prepared)
+    if not best_config:
+        return None
+    return {
+        "Sector": sector,
+        "Best Strategy": best_config['name'],
+        "Filter": best_config['filter'],
+        "PF (98% LB)": best_metrics[0],
+        "Sharpe (98% LB)": best_metrics[1],
+        "MaxDD (Worst)": best_metrics[2]
+    }
+
+# --- Walk-Forward ---
+def walk_forward_windows(first_date, last_date, train_years=WF_TRAIN_YEARS, test_years=WF_TEST_YEARS):
+    """Rolling (train_start, test_start, test_end) windows; test periods tile the sample after the first train span."""
+    windows = []
+    train_start = pd.Timestamp(first_date).normalize()
+    last_date = pd.Timestamp(last_date)
+    while True:
+        test_start = train_start + pd.DateOffset(years=train_years)
+        if test_start > last_date: break
+        test_end = test_start + pd.DateOffset(years=test_years)
+        windows.append((train_start, test_start, test_end))
+        train_start = train_start + pd.DateOffset(years=test_years)
+    return windows
+
+_WF_STATE = {}
+
+def _init_walk_forward(prepared, deadline, iterations):
+    _WF_STATE.update(prepared=prepared, deadline=deadline, iterations=iterations)
+
+def walk_forward_task(task):
+    """
+    Optimize one (window, sector) on the train span, then trade the chosen
+    config out-of-sample on the test span. Past the deadline the selection
+    uses point estimates instead of the bootstrap (flagged in the result).
+    單一 (窗口, 產業) 任務：訓練期選參數，測試期做樣本外交易。
+    """
+    window_id, (train_start, test_start, test_end), sector, symbols = task
+    prepared = _WF_STATE['prepared']
+    degraded = time.time() > _WF_STATE['deadline']
+    iterations = 0 if degraded else _WF_STATE['iterations']
+    
+    train = [prepared[s].window(train_start, test_start) for s in symbols]
+    config, metrics = choose_config(train, iterations)
+    if not config:
+        return None
+    
+    simulator = StrategySimulator(config)
+    oos = []
+    for s in symbols:
+        for t in simulator.run_prepared(prepared[s].window(test_start, test_end), close_open=True):
+            t['Symbol'] = s
+            oos.append(t)
+    return {
+        "Window": window_id, "Test Start": test_start, "Test End": test_end, "Sector": sector,
+        "Strategy": config['name'], "Filter": config['filter'], "Train PF (LB)": metrics[0],
+        "Degraded": degraded, "Trades": oos,
+    }
+
+def oos_equity_curve(trades):
+    """
+    Stitched out-of-sample curve: compounds the mean PnL of the trades that
+    close each day (equal weight per trade, one slot per exit day).
+    """
+    if not trades:
+        return pd.Series(dtype=float)
+    df = pd.DataFrame(trades)
+    daily = df.groupby(pd.to_datetime(df['ExitDate']))['PnL'].mean().sort_index()
+    return (1 + daily).cumprod()
 
 # --- Optimization Wrapper ---
 class MatrixOptimizer:
-    def __init__(self):
+    def __init__(self, workers=None, use_cache=True):
+        self.workers = workers
         self.sector_map = {}
+        self.prepared = {} # symbol -> PreparedSymbol (memoized across configs / runs)
+        code = code_fingerprint(Indicators, base_indicators, market_filters, PreparedSymbol)
+        self.cache = ResultCache('optimize_matrix', ENGINE_VERSION, {'code': code}, enabled=use_cache)
         self.load_metadata()
         self.market_data = self.load_market_data()
         
@@ -194,114 +389,134 @@ class MatrixOptimizer:
             except: pass
         return data
 
-    def bootstrap_score(self, trades):
+    @staticmethod
+    def bootstrap_score(trades, iterations=None):
+        """98% lower bounds of (PF, Sharpe, MaxDD); iterations=0 scores the trades as-is."""
         if len(trades) < 5: return -1, -1, -1 # Invalid
+        iterations = BOOTSTRAP_ITERATIONS if iterations is None else iterations
         
-        returns = pd.Series([t['PnL'] for t in trades])
-        metrics = {'pf': [], 'sharpe': [], 'mdd': []}
-        
-        for _ in range(BOOTSTRAP_ITERATIONS):
-            sample = returns.sample(n=len(returns), replace=True)
-            
-            # Sharpe (Simple)
-            s = (sample.mean() / sample.std()) * (252**0.5) if sample.std() > 0 else 0
-            
-            # PF
-            w = sample[sample > 0].sum()
-            l = abs(sample[sample <= 0].sum())
-            pf = w / l if l > 0 else 0
-            
-            # MaxDD (Simple)
-            # Just approximate from sum of neg runs? 
-            # Reconstruct equity curve for accurate MDD
-            equity = [1.0]
-            for r in sample: equity.append(equity[-1] * (1+r))
-            equity = np.array(equity)
-            mdd = ((equity - np.maximum.accumulate(equity))/np.maximum.accumulate(equity)).min()
-            
-            metrics['pf'].append(pf)
-            metrics['sharpe'].append(s)
-            metrics['mdd'].append(mdd)
+        returns = [t['PnL'] for t in trades]
+        if iterations <= 0:
+            m = point_metrics(returns)
+        else:
+            m = bootstrap_lower_bounds(returns, iterations, CONFIDENCE_LEVEL) # 98% Lower Bound
+        return m['pf'], m['sharpe'], m['mdd']
+
+    def prepare_universe(self, symbol_data):
+        """Indicators and aligned market filters per symbol, computed once (and cached on disk)."""
+        for sym, df in symbol_data.items():
+            if sym not in self.prepared:
+                build = lambda: ([], PreparedSymbol.build(sym, df, self.market_data).arrays())
+                cached = self.cache.fetch(sym, (df, self.market_data), build)
+                self.prepared[sym] = PreparedSymbol.from_arrays(sym, cached.arrays)
+        print(self.cache.summary())
+        return self.prepared
+
+    def sector_tasks(self, symbol_data):
+        tasks = []
+        for sector in sorted(set(self.sector_map.values())):
+            if sector == "Unknown": continue # Skip for now or handle later
             
-        idx = int(BOOTSTRAP_ITERATIONS * (1 - CONFIDENCE_LEVEL)) # 98% Lower Bound
-        # Sort
-        for k in metrics: metrics[k].sort()
-        
-        return metrics['pf'][idx], metrics['sharpe'][idx], metrics['mdd'][idx]
+            sector_syms = [s for s, sec in self.sector_map.items() if sec == sector and s in symbol_data]
+            if not sector_syms: continue
+            tasks.append((sector, [self.prepared[s] for s in sector_syms]))
+        return tasks
 
     def run_optimization(self):
         print("Loading Data...")
         symbol_data = self.load_symbol_data()
         
-        print("Running Matrix Optimization...")
-        results = []
+        print("Preparing Indicators...")
+        self.prepare_universe(symbol_data)
         
-        # Prepare Market Series reindexed to each symbol (expensive, optimize later)
-        # Simply pass full series and use .reindex in simulator if needed
-        # Or simpler: merge once.
+        print("Running Matrix Optimization...")
+        tasks = self.sector_tasks(symbol_data)
+        for sector, prepared in tasks:
+            print(f"Optimizing Sector: {sector} ({len(prepared)} symbols)")
         
-        for sector in set(self.sector_map.values()):
-            if sector == "Unknown": continue # Skip for now or handle later
-            
-            sector_syms = [s for s, sec in self.sector_map.items() if sec == sector and s in symbol_data]
-            if not sector_syms: continue
-            
-            print(f"Optimizing Sector: {sector} ({len(sector_syms)} symbols)")
-            
-            best_score = -999
-            best_config = None
-            best_metrics = None
-            
-            for config in CONFIGS:
-                # Accumulate trades for this config across all sector symbols
-                sector_trades = []
-                
-                simulator = StrategySimulator(config)
-                
-                for sym in sector_syms:
-                    df = symbol_data[sym].copy()
-                    
-                    # Align Market Filter
-                    spy_aligned = None
-                    vix_aligned = None
-                    
-                    if config['filter'] == 'SPY_MA200' and 'SPY' in self.market_data:
-                        spy_aligned = self.market_data['SPY'].reindex(df['date'], method='ffill')
-                    elif config['filter'] == 'VIX_25' and '^VIX' in self.market_data:
-                        vix_aligned = self.market_data['^VIX'].reindex(df['date'], method='ffill')
-                        
-                    df_res = simulator.prepare(df, spy_aligned, vix_aligned)
-                    trades = simulator.run(df_res, spy_aligned, vix_aligned)
-                    sector_trades.extend(trades)
-                
-                # Score this Config
-                pf_lb, sharpe_lb, mdd_lb = self.bootstrap_score(sector_trades)
-                
-                # Scoring Logic: Maximize PF, but must have PF > 1.0. Prefer PF > |MaxDD|
-                # Score = PF Lower Bound.
-                # Penalty if MaxDD is too deep (-50%?)
-                
-                score = pf_lb
-                if mdd_lb < -0.5: score -= 1.0 # Penalize deep drawdowns
-                
-                if score > best_score:
-                    best_score = score
-                    best_config = config
-                    best_metrics = (pf_lb, sharpe_lb, mdd_lb)
-            
-            if best_config:
-                results.append({
-                    "Sector": sector,
-                    "Best Strategy": best_config['name'],
-                    "Filter": best_config['filter'],
-                    "PF (98% LB)": best_metrics[0],
-                    "Sharpe (98% LB)": best_metrics[1],
-                    "MaxDD (Worst)": best_metrics[2]
-                })
+        # Sectors are independent: optimize them in parallel
+        if self.workers == 1 or len(tasks) <= 1:
+            results = [optimize_sector(t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(optimize_sector, tasks))
+        results = [r for r in results if r]
 
         # Generate Report
         self.generate_report(results)
 
+    def run_walk_forward(self, train_years=WF_TRAIN_YEARS, test_years=WF_TEST_YEARS,
+                         time_budget=WF_TIME_BUDGET, iterations=WF_BOOTSTRAP_ITERATIONS):
+        """
+        Rolling train/test optimization. Indicators are prepared once on the
+        full history (all trailing) and sliced per window; (window, sector)
+        tasks run on a process pool within time_budget seconds.
+        滾動式訓練/測試最佳化；指標只計算一次，各窗口切片重複使用。
+        """
+        t0 = time.time()
+        print("Loading Data...")
+        symbol_data = self.load_symbol_data()
+        print("Preparing Indicators...")
+        self.prepare_universe(symbol_data)
+        
+        first = min(p.dates[0] for p in self.prepared.values())
+        last = max(p.dates[-1] for p in self.prepared.values())
+        windows = walk_forward_windows(first, last, train_years, test_years)
+        sectors = [(sector, [p.symbol for p in prepared]) for sector, prepared in self.sector_tasks(symbol_data)]
+        tasks = [(w, span, sector, syms) for w, span in enumerate(windows) for sector, syms in sectors]
+        print(f"Walk-Forward: {len(windows)} windows x {len(sectors)} sectors ({len(tasks)} tasks, budget {time_budget:g}s)")
+        
+        deadline = t0 + time_budget
+        init = (self.prepared, deadline, iterations)
+        if self.workers == 1:
+            _init_walk_forward(*init)
+            results = [walk_forward_task(t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_walk_forward, initargs=init) as pool:
+                results = list(pool.map(walk_forward_task, tasks))
+        results = [r for r in results if r]
+        
+        self.generate_walk_forward_report(results, windows, train_years, test_years, time.time() - t0, time_budget)
+        return results
+
+    def generate_walk_forward_report(self, results, windows, train_years, test_years, elapsed, time_budget):
+        trades = [t for r in results for t in r['Trades']]
+        curve = oos_equity_curve(trades)
+        degraded = sum(1 for r in results if r['Degraded'])
+        
+        md = "# Walk-Forward Strategy Matrix (Out-of-Sample)\n\n"
+        md += "### Parameters\n"
+        md += f"- **Train / Test**: {train_years}y / {test_years}y rolling ({len(windows)} windows)\n"
+        md += f"- **Runtime**: {elapsed:.0f}s (budget {time_budget:g}s)\n"
+        if degraded:
+            md += f"- **Budget Fallback**: {degraded} of {len(results)} selections used point estimates\n"
+        md += "\n### Per-Window Choices\n"
+        md += "| Test Period | Sector | Chosen Strategy | Filter | Train PF (LB) | OOS Trades | OOS Win % | OOS Avg PnL |\n"
+        md += "| --- | --- | --- | --- | --- | --- | --- | --- |\n"
+        for r in sorted(results, key=lambda r: (r['Window'], r['Sector'])):
+            pnl = np.array([t['PnL'] for t in r['Trades']])
+            win = (pnl > 0).mean() if len(pnl) else 0
+            avg = pnl.mean() if len(pnl) else 0
+            flag = " *" if r['Degraded'] else ""
+            md += (f"| {r['Test Start']:%Y-%m-%d} - {r['Test End']:%Y-%m-%d} | {r['Sector']} | {r['Strategy']}{flag} | "
+                   f"{r['Filter']} | {r['Train PF (LB)']:.2f} | {len(pnl)} | {win:.0%} | {avg:.2%} |\n")
+        
+        md += "\n### Combined OOS Equity (mean PnL of trades closing each day, compounded)\n"
+        if curve.empty:
+            md += "No out-of-sample trades.\n"
+        else:
+            pnl = np.array([t['PnL'] for t in trades])
+            wins, losses = pnl[pnl > 0].sum(), abs(pnl[pnl <= 0].sum())
+            mdd = (curve / curve.cummax() - 1).min()
+            md += f"- **Trades**: {len(pnl)} | **Win Rate**: {(pnl > 0).mean():.0%} | **PF**: {wins / losses if losses > 0 else 0:.2f}\n"
+            md += f"- **Final Equity**: {curve.iloc[-1]:.2f}x | **Max Drawdown**: {mdd:.1%}\n\n"
+            md += "| Quarter End | Equity |\n| --- | --- |\n"
+            for date, value in curve.resample('QE').last().dropna().items():
+                md += f"| {date:%Y-%m-%d} | {value:.3f} |\n"
+        
+        with open(WF_REPORT, 'w', encoding='utf-8') as f: f.write(md)
+        print(f"Report: {WF_REPORT}")
+
     def generate_report(self, results):
         df = pd.DataFrame(results)
         md = "# Optimized Strategy Matrix (98% Confidence)\n\n"
@@ -314,5 +529,18 @@ class MatrixOptimizer:
         print(f"Report: {OUTPUT_REPORT}")
 
 if __name__ == "__main__":
-    opt = MatrixOptimizer()
-    opt.run_optimization()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=None, help="Sector worker processes (default: CPU count, 1 = serial)")
+    parser.add_argument("--walk-forward", action="store_true", help="Rolling train/test optimization with out-of-sample stitching")
+    parser.add_argument("--train-years", type=int, default=WF_TRAIN_YEARS)
+    parser.add_argument("--test-years", type=int, default=WF_TEST_YEARS)
+    parser.add_argument("--time-budget", type=float, default=WF_TIME_BUDGET, help="Walk-forward time budget in seconds")
+    parser.add_argument("--iterations", type=int, default=WF_BOOTSTRAP_ITERATIONS, help="Walk-forward bootstrap iterations per selection")
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every symbol's indicators (ignore the result cache)")
+    args = parser.parse_args()
+    
+    opt = MatrixOptimizer(workers=args.workers, use_cache=not args.no_cache)
+    if args.walk_forward:
+        opt.run_walk_forward(args.train_years, args.test_years, args.time_budget, args.iterations)
+    else:
+        opt.run_optimization()
@@ -1,13 +1,33 @@
 import pandas as pd
 import numpy as np
 
+SIGNAL_TAGS = ["LAUNCHPAD", "DIP_BUY", "MOMENTUM_RUN", "AVOID", "WAIT"]
+
+def compact_frame(df, float_dtype=np.float32):
+    """
+    Downcast float64 columns to float32 and the signal tag to a category.
+    Call after all calculations are done (compute in float64, store in float32).
+    將 float64 欄位降為 float32、訊號欄轉為 category；應於計算完成後呼叫。
+    """
+    casts = {c: float_dtype for c in df.columns if df[c].dtype == np.float64}
+    if 'signal' in df.columns:
+        casts['signal'] = 'category'
+    return df.astype(casts) if casts else df
+
+def frame_nbytes(frames):
+    """Deep memory footprint (bytes) of an iterable of DataFrames."""
+    return int(sum(df.memory_usage(deep=True).sum() for df in frames))
+
 class KineticMarketState:
-    def __init__(self, df):
+    def __init__(self, df, compact=False, copy=True):
         """
         Initialize with a DataFrame containing 'close' column.
         Expects columns in lowercase: 'open', 'high', 'low', 'close', 'volume'
+        compact: return float32 columns from analyze() (math stays float64).
+        copy: pass False when df is already a private frame (skips a redundant copy).
         """
-        self.df = df.copy()
+        self.df = df.copy() if copy else df
+        self.compact = compact
         # Sort by date just in case
         if 'time' in self.df.columns:
             self.df['date_parsed'] = pd.to_datetime(self.df['time'])
@@ -99,21 +119,38 @@ class KineticMarketState:
         self.df['y_momentum'] = self.calc_stoch_rsi(14)
         self.df['z_structure'] = self.calc_structure_z(20)
         
-        # Generate Signals based on Dossier Logic
-        self.df['signal'] = self.df.apply(self._get_signal_tag, axis=1)
-        self.df['commentary'] = self.df.apply(self._get_commentary, axis=1)
+        # Generate Signals based on Dossier Logic (commentary is rendered on demand, see commentary())
+        self.df['signal'] = self.tag_signals(self.df)
         
+        if self.compact:
+            self.df = compact_frame(self.df)
         return self.df
 
-    def _get_signal_tag(self, row):
-        x, y, z = row['x_trend'], row['y_momentum'], row['z_structure']
-        
-        if z > 0.8 and x > 0: return "LAUNCHPAD" # Breakout Setup
-        if x > 0.5 and y < 0.2: return "DIP_BUY"   # Trend Pullback
-        # v2.0 Optimization: CLIMAX -> MOMENTUM_RUN (Bullish Inertia)
-        if x > 1.0 and y > 0.9: return "MOMENTUM_RUN" 
-        if x < -0.5: return "AVOID"                # Downtrend
-        return "WAIT"                              # Noise
+    def _signal_masks(self, x, y, z):
+        """(tag, mask) pairs in precedence order: the first matching tag wins."""
+        return [
+            ("LAUNCHPAD", (z > 0.8) & (x > 0)),       # Breakout Setup
+            ("DIP_BUY", (x > 0.5) & (y < 0.2)),       # Trend Pullback
+            # v2.0 Optimization: CLIMAX -> MOMENTUM_RUN (Bullish Inertia)
+            ("MOMENTUM_RUN", (x > 1.0) & (y > 0.9)),
+            ("AVOID", x < -0.5),                      # Downtrend
+        ]
+
+    def tag_signals(self, df):
+        """Categorical signal column; rows matching no mask are WAIT (Noise)."""
+        x, y, z = (df[c].to_numpy(dtype=np.float64) for c in ('x_trend', 'y_momentum', 'z_structure'))
+        masks = self._signal_masks(x, y, z)
+        tags = np.select([m for _, m in masks], [t for t, _ in masks], default="WAIT")
+        return pd.Categorical(tags, categories=SIGNAL_TAGS)
+
+    def commentary(self, row=-1):
+        """
+        Commentary for one analyzed row (a position, default the latest bar,
+        or a row Series). Only rows that are published need the text.
+        """
+        if not isinstance(row, pd.Series):
+            row = self.df.iloc[row]
+        return self._get_commentary(row)
 
     def _get_commentary(self, row):
         tag = row['signal']
@@ -1,5 +1,6 @@
 import os
 import json
+import argparse
 import pandas as pd
 import numpy as np
 import sys
@@ -8,11 +9,17 @@ from datetime import datetime
 # Add project root to path
 sys.path.append(os.getcwd())
 try:
-    from scripts.core.strategy_selector import Indicators, MarketRegime, DataProvider
+    from scripts.core.strategy_selector import MarketRegime, DataProvider, EngineV5_Growth, EngineV1_Defensive
+    from scripts.core.indicator_planner import IndicatorContext, spec
+    from scripts.core.portfolio_kernel import MarketPanel, PortfolioConfig, run_portfolio, STRATEGY_EXITS, EXIT_V5, REASON_NAMES
+    from scripts.core.monte_carlo import portfolio_returns, run_monte_carlo, summarize
 except ImportError:
     # Handle case where run from scripts/research
     sys.path.append(os.path.join(os.getcwd(), "../../"))
-    from scripts.core.strategy_selector import Indicators, MarketRegime, DataProvider
+    from scripts.core.strategy_selector import MarketRegime, DataProvider, EngineV5_Growth, EngineV1_Defensive
+    from scripts.core.indicator_planner import IndicatorContext, spec
+    from scripts.core.portfolio_kernel import MarketPanel, PortfolioConfig, run_portfolio, STRATEGY_EXITS, EXIT_V5, REASON_NAMES
+    from scripts.core.monte_carlo import portfolio_returns, run_monte_carlo, summarize
 
 DATA_DIR = "public/data"
 SECTOR_FILE = "public/data/sector_industry.json"
@@ -25,6 +32,10 @@ POS_SIZE_PCT = 0.10  # 10% per trade
 START_DATE = "2018-01-01"
 END_DATE = "2025-12-31" 
 
+# Monte Carlo stress test (--monte-carlo N)
+MC_BLOCK_SIZE = 20     # mean block length in trading days (~1 month)
+MC_HORIZON_YEARS = 5
+
 # Metadata Loading
 SECTOR_MAP = {}
 try:
@@ -49,8 +60,12 @@ class PortfolioSimulator:
         # Portfolio State
         self.cash = INITIAL_CAPITAL
         self.equity_curve = []
+        self.stale_days = 0
         self.positions = {} # {Ticker: {EntryPrice, Size, Shares, EntryDate, StopPrice, Strategy}}
         self.trade_history = []
+        self.daily_returns = None # rebuilt from the kernel run (Monte Carlo input)
+        self.regimes = None
+        self.monte_carlo = {} # {label: MonteCarloResult}
         
         self.load_data()
         self.prepare_data()
@@ -110,6 +125,7 @@ class PortfolioSimulator:
 
     def prepare_data(self):
         print(f"Preparing Indicators for {len(self.symbol_data)} symbols...")
+        v5, v1 = EngineV5_Growth(), EngineV1_Defensive()
         # Pre-calc indicators for everyone
         for sym in list(self.symbol_data.keys()):
             df = self.symbol_data[sym]
@@ -120,16 +136,15 @@ class PortfolioSimulator:
                 del self.symbol_data[sym]
                 continue
                 
-            # Calc Tech Indicators
-            df['atr'] = Indicators.atr(df['high'], df['low'], df['close'], 14)
+            # Calc Tech Indicators (engine-declared specs, computed once per symbol)
+            ctx = IndicatorContext(df)
+            df = df.assign(atr=ctx.get(spec('atr', period=14)))
             
             # Strategy Logic
             strategy = "V1"
             if sector in GROUPS["GROWTH"]:
                 strategy = "V5"
-                df['ma20'], df['bb_upper'], df['bb_width'] = Indicators.bollinger_bands(df['close'], 20)
-                df['bb_width_pct'] = df['bb_width'].rolling(120).rank(pct=True)
-                df['stoch_k'], _ = Indicators.stoch_rsi(df['close'], 14)
+                df = v5.prepare(df, ctx)
                 
                 # Pre-calc Entry Signal (Part 1: Tech)
                 # Squeeze: Current or Prev < 20%
@@ -139,15 +154,11 @@ class PortfolioSimulator:
                 df['signal_tech'] = is_squeeze & is_breakout
                 
                 # Pre-calc Climax (for Exit)
-                width_mean = df['bb_width'].rolling(120).mean()
-                width_std = df['bb_width'].rolling(120).std()
-                width_z = (df['bb_width'] - width_mean) / width_std
-                df['is_climax'] = (df['stoch_k'] > 95) & (width_z > 2.0)
+                df['is_climax'] = (df['stoch_k'] > 95) & (df['width_zscore'] > 2.0)
                 
             else: # Defensive V1
                 strategy = "V1"
-                df['mcginley'] = Indicators.mcginley_dynamic(df['close'], 14)
-                df['stoch_k'], _ = Indicators.stoch_rsi(df['close'], 14)
+                df = v1.prepare(df, ctx)
                 is_uptrend = df['close'] > df['mcginley']
                 is_oversold = df['stoch_k'] < 20
                 df['signal_tech'] = is_uptrend & is_oversold
@@ -158,6 +169,31 @@ class PortfolioSimulator:
             df.set_index('date', inplace=True)
             self.symbol_data[sym] = df
 
+    def build_panel(self, calendar):
+        """
+        Align prepared symbols to the calendar and fold the context filters
+        (V5 needs SPY bull; everyone needs an up-trending sector ETF when one
+        is loaded) into a single entry-candidate matrix.
+        """
+        strategy = {sym: STRATEGY_EXITS[df['Strategy'].iloc[0]] for sym, df in self.symbol_data.items()}
+        sectors = [df['Sector'].iloc[0] for df in self.symbol_data.values()]
+        panel = MarketPanel.from_frames(self.symbol_data, calendar, entry_col='signal_tech',
+                                        exit_col='is_climax', atr_col='atr', strategy=strategy)
+        
+        spy_bull = self.market_data['is_bull'].reindex(calendar).fillna(False).to_numpy(dtype=bool)
+        is_v5 = panel.strategy == EXIT_V5
+        entry = panel.entry & panel.avail & (spy_bull[:, None] | ~is_v5[None, :])
+        
+        # Peer Filter: block where the sector ETF has a bar and is not up-trending
+        for sec_name, sec_df in self.sector_data.items():
+            cols = [j for j, sec in enumerate(sectors) if sec == sec_name]
+            if not cols: continue
+            up = sec_df['is_uptrend'].reindex(calendar)
+            blocked = (up.notna() & up.eq(False)).to_numpy()
+            entry[:, cols] &= ~blocked[:, None]
+        panel.entry = entry
+        return panel
+
     def run_simulation(self):
         print(f"Running Event Loop ({START_DATE} to {END_DATE})...")
         
@@ -165,136 +201,57 @@ class PortfolioSimulator:
         calendar = self.market_data.index
         calendar = calendar[(calendar >= START_DATE) & (calendar <= END_DATE)]
         
-        for date in calendar:
-            # 1. Update Equity
-            daily_total = self.cash
-            holdings_val = 0
-            
-            # --- Manage Existing Positions ---
-            tickers_to_close = []
-            
-            for sym, pos in self.positions.items():
-                if date not in self.symbol_data[sym].index:
-                    holdings_val += pos['Size'] # No data, assume unchanged (rare)
-                    continue
-                    
-                row = self.symbol_data[sym].loc[date]
-                current_val = pos['Shares'] * row['close']
-                holdings_val += current_val
-                days_held = (date - pos['EntryDate']).days
-                pnl_pct = (row['close'] - pos['EntryPrice']) / pos['EntryPrice']
-                
-                exit_reason = None
-                
-                # Update Trailing High (for Stop)
-                # In V5 we use ATR stop. V1 uses 5% fixed.
-                # Simplified: Just verify exit conditions daily.
-                
-                if pos['Strategy'] == "V5":
-                    # Dynamic Stop loss Logic (Recalculated on entry, fixed or trailing?)
-                    # Script said: "Stop 2 ATR" from entry or local high?
-                    # Let's use the stop_price stored in pos (Fixed Initial Risk) OR Trailing?
-                    # Profitable Trend Following usually trails. Let's trail if price moves up.
-                    # Wait, simple validation script used Fixed Stop or Time. Let's stick to simple logic to match validate.py
-                    # "if row['close'] < stop_price: SELL_STOP"
-                    
-                    if row['close'] < pos['StopPrice']: 
-                        exit_reason = "Loss (Stop)"
-                    elif days_held > 5 and pnl_pct < (0.5 * row['atr'] / row['close']):
-                        exit_reason = "Stagnation (Time)"
-                    elif row['is_climax']:
-                        exit_reason = "Profit (Climax)"
-                        
-                elif pos['Strategy'] == "V1":
-                    if pnl_pct < -0.05: exit_reason = "Loss (Stop)"
-                    elif pnl_pct > 0.10: exit_reason = "Profit (Target)"
-                    elif days_held > 10: exit_reason = "Stagnation (Time)"
-                
-                if exit_reason:
-                    # Sell
-                    self.cash += current_val
-                    self.trade_history.append({
-                        'Symbol': sym, 'EntryDate': pos['EntryDate'], 'ExitDate': date,
-                        'EntryPrice': pos['EntryPrice'], 'ExitPrice': row['close'],
-                        'PnL': current_val - pos['Size'], 'PnL_Pct': pnl_pct,
-                        'Reason': exit_reason, 'Strategy': pos['Strategy']
-                    })
-                    tickers_to_close.append(sym)
-                    
-            for sym in tickers_to_close:
-                del self.positions[sym]
-                
-            # Update Daily Equity Record (After sells)
-            portfolio_val = self.cash + sum(self.positions[s]['Shares'] * self.symbol_data[s].loc[date]['close'] for s in self.positions if date in self.symbol_data[s].index)
-            self.equity_curve.append({'date': date, 'equity': portfolio_val})
-            
-            # --- Check New Entries ---
-            # Max positions reached?
-            if len(self.positions) >= MAX_POSITIONS: continue
-            if self.cash < (portfolio_val * POS_SIZE_PCT * 0.9): continue # Not enough cash
-            
-            # Market Context
-            if date not in self.market_data.index: continue
-            spy_in_bull = self.market_data.loc[date]['is_bull']
-            
-            # Filter Candidates
-            candidates = []
-            
-            for sym, df in self.symbol_data.items():
-                if sym in self.positions: continue
-                if date not in df.index: continue
-                
-                row = df.loc[date]
-                if not row['signal_tech']: continue # No technical signal
-                
-                # Context Filters
-                # V5: Needs Bull + Sector Up
-                # V1: Needs Sector Up (Defensive)
-                
-                if row['Strategy'] == "V5":
-                    if not spy_in_bull: continue # Global Filter
-                
-                # Peer Filter
-                sec_name = row['Sector']
-                if sec_name in self.sector_data:
-                    sec_df = self.sector_data[sec_name]
-                    if date in sec_df.index:
-                        if not sec_df.loc[date]['is_uptrend']: continue # Sector Down Block
-                
-                candidates.append(sym)
-            
-            # Execute Buys
-            # Shuffle to avoid alphabetical bias
-            np.random.shuffle(candidates)
-            
-            for sym in candidates:
-                if len(self.positions) >= MAX_POSITIONS: break
-                
-                # Position Sizing
-                target_size = portfolio_val * POS_SIZE_PCT
-                if self.cash < target_size: target_size = self.cash # Take remainder
-                if target_size < 1000: break # Dust
-                
-                row = self.symbol_data[sym].loc[date]
-                price = row['close']
-                shares = target_size / price
-                
-                # Stop Loss Calc
-                stop_price = 0
-                if row['Strategy'] == "V5":
-                    stop_price = price - (2.0 * row['atr'])
-                else: 
-                    stop_price = price * 0.95 # 5% Stop
-                
-                self.positions[sym] = {
-                    'EntryPrice': price,
-                    'Size': target_size,
-                    'Shares': shares,
-                    'EntryDate': date,
-                    'StopPrice': stop_price,
-                    'Strategy': row['Strategy']
-                }
-                self.cash -= target_size
+        # Sells first (V5: stop/time/climax, V1: -5%/+10%/10d), mark after
+        # sells (no-bar holdings keep their last close), then shuffled candidates sized at
+        # 10% of equity until cash or the dust threshold runs out.
+        config = PortfolioConfig(
+            initial_capital=INITIAL_CAPITAL,
+            max_positions=MAX_POSITIONS,
+            sizing='percent', pos_size_pct=POS_SIZE_PCT, cash_gate=0.9, dust=1000,
+            shuffle=True, mark_after='sells',
+        )
+        panel = self.build_panel(calendar)
+        result = run_portfolio(panel, config)
+        self.daily_returns = portfolio_returns(panel, result, INITIAL_CAPITAL)
+        self.regimes = np.where(self.market_data['is_bull'].reindex(calendar).fillna(False).to_numpy(dtype=bool), "BULL", "BEAR")
+        
+        self.cash = result.cash
+        self.equity_curve = [{'date': d, 'equity': e} for d, e in zip(calendar, result.equity)]
+        self.stale_days = result.stale_days
+        for s, e, x, entry_px, exit_px, size, proceeds, reason in result.trades:
+            sym = result.symbols[s]
+            self.trade_history.append({
+                'Symbol': sym, 'EntryDate': calendar[e], 'ExitDate': calendar[x],
+                'EntryPrice': entry_px, 'ExitPrice': exit_px,
+                'PnL': proceeds - size, 'PnL_Pct': (exit_px - entry_px) / entry_px,
+                'Reason': REASON_NAMES[reason], 'Strategy': self.symbol_data[sym]['Strategy'].iloc[0]
+            })
+        self.positions = {
+            sym: {'EntryPrice': p['entry'], 'Size': p['size'], 'Shares': p['shares'],
+                  'EntryDate': p['entry_date'], 'StopPrice': p['stop'], 'Strategy': self.symbol_data[sym]['Strategy'].iloc[0]}
+            for sym, p in result.positions.items()
+        }
+
+    def run_monte_carlo(self, n_paths, horizon_years=MC_HORIZON_YEARS, block_size=MC_BLOCK_SIZE, workers=1, seed=None):
+        """Block-resampled equity paths: all days, then bear-regime days only (SPY < MA200)."""
+        horizon = int(round(horizon_years * 252))
+        print(f"Monte Carlo: {n_paths} paths x {horizon} days (stationary blocks of {block_size})...")
+        kw = dict(horizon=horizon, method='stationary', block_size=block_size, seed=seed, workers=workers)
+        self.monte_carlo = {"All Days": run_monte_carlo(self.daily_returns, n_paths, **kw)}
+        if (self.regimes == "BEAR").sum() >= block_size:
+            self.monte_carlo["Bear Regime Only"] = run_monte_carlo(self.daily_returns, n_paths, regimes=self.regimes, condition="BEAR", **kw)
+
+    def monte_carlo_section(self):
+        md = "\n## 5. Monte Carlo Stress Test\n"
+        for label, mc in self.monte_carlo.items():
+            table = summarize(mc.stats)
+            md += f"\n### {label} ({mc.paths:,} paths x {mc.horizon} days, {mc.method} blocks of {mc.block_size})\n"
+            md += "| Metric | " + " | ".join(table.columns) + " |\n"
+            md += "| --- |" + " --- |" * len(table.columns) + "\n"
+            for metric, row in table.iterrows():
+                fmt = (lambda v: f"{v:.0f}") if "days" in metric else ((lambda v: f"{v:.2f}x") if "Multiple" in metric else (lambda v: f"{v:.1%}"))
+                md += f"| {metric} | " + " | ".join(fmt(v) for v in row) + " |\n"
+        return md
 
     def generate_report(self):
         # Convert Equity Curve
@@ -356,6 +313,7 @@ class PortfolioSimulator:
             f.write(f"- **Win Rate**: {win_rate:.1%} ({len(df_trades[df_trades['PnL']>0])} wins / {len(df_trades[df_trades['PnL']<=0])} losses)\n")
             f.write(f"- **Best Trade**: {df_trades.loc[df_trades['PnL'].idxmax()]['Symbol']} ({df_trades['PnL'].max():.0f}$)\n" if len(df_trades)>0 else "")
             f.write(f"- **Worst Trade**: {df_trades.loc[df_trades['PnL'].idxmin()]['Symbol']} ({df_trades['PnL'].min():.0f}$)\n" if len(df_trades)>0 else "")
+            f.write(f"- **Stale-Price Days**: {self.stale_days} (holdings without a fresh bar, valued at last close)\n")
             
             f.write(f"\n## 3. Yearly Breakdown\n")
             f.write(f"| Year | Portfolio Return | SPY Return |\n")
@@ -379,10 +337,23 @@ class PortfolioSimulator:
                 f.write(f"⚠️ **High Return / High Risk**: System beat SPY in returns but had deeper drawdowns.\n")
             else:
                 f.write(f"❌ **System Underperformed**: Failed to beat SPY Buy & Hold.\n")
+            
+            if self.monte_carlo:
+                f.write(self.monte_carlo_section())
 
         print(f"Report Generated: {OUTPUT_REPORT}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--monte-carlo", type=int, default=0, metavar="PATHS", help="Add a Monte Carlo stress test with this many paths")
+    parser.add_argument("--horizon-years", type=float, default=MC_HORIZON_YEARS)
+    parser.add_argument("--block-size", type=int, default=MC_BLOCK_SIZE, help="Mean block length in trading days")
+    parser.add_argument("--workers", type=int, default=1, help="Monte Carlo processes (0 = all cores)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
     sim = PortfolioSimulator()
     sim.run_simulation()
+    if args.monte_carlo > 0:
+        sim.run_monte_carlo(args.monte_carlo, args.horizon_years, args.block_size, args.workers, args.seed)
     sim.generate_report()
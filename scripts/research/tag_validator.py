@@ -35,16 +35,16 @@ class ParametricMarketState(KineticMarketState):
         if params:
             self.params.update(params)
 
-    def _get_signal_tag(self, row):
-        x, y, z = row['x_trend'], row['y_momentum'], row['z_structure']
+    def _signal_masks(self, x, y, z):
         p = self.params
         
         # Modified Logic using injected parameters
-        if z > 0.8 and x > 0: return "LAUNCHPAD"
-        if x > p['dip_buy_x'] and y < p['dip_buy_y']: return "DIP_BUY"
-        if x > p['momentum_x'] and y > p['momentum_y']: return "MOMENTUM_RUN"
-        if x < p['avoid_x']: return "AVOID"
-        return "WAIT"
+        return [
+            ("LAUNCHPAD", (z > 0.8) & (x > 0)),
+            ("DIP_BUY", (x > p['dip_buy_x']) & (y < p['dip_buy_y'])),
+            ("MOMENTUM_RUN", (x > p['momentum_x']) & (y > p['momentum_y'])),
+            ("AVOID", x < p['avoid_x']),
+        ]
 
 # --- 2. Backtest Engine (Simplified for Speed) ---
 
@@ -1,5 +1,6 @@
 import os
 import json
+import argparse
 import pandas as pd
 import numpy as np
 import sys
@@ -8,15 +9,20 @@ from concurrent.futures import ProcessPoolExecutor
 # Add project root to path
 sys.path.append(os.getcwd())
 from scripts.core.strategy_selector import QuantSystem
+from scripts.core.bootstrap_stats import bootstrap_lower_bounds
+from scripts.core.result_cache import ResultCache, code_fingerprint
 
 DATA_DIR = "public/data"
 OUTPUT_REPORT = "docs/QUANT_SYSTEM_GRANULAR_REPORT.md"
 BOOTSTRAP_ITERATIONS = 5000
 CONFIDENCE_LEVEL = 0.98
+ENGINE_VERSION = 1 # bump when trade semantics change outside the fingerprinted code
 
 class GranularValidator:
-    def __init__(self):
+    def __init__(self, use_cache=True):
         self.qs = QuantSystem()
+        code = code_fingerprint(type(self.qs.v5), type(self.qs.v1), GranularValidator.simulate_symbol)
+        self.cache = ResultCache('quant_system_granular', ENGINE_VERSION, {'code': code}, enabled=use_cache)
         self.market_data = self.load_market_data()
         self.symbol_data = self.load_symbol_data()
         
@@ -76,7 +82,7 @@ class GranularValidator:
         else: return [] # Avoid
         
         # Prepare Data
-        df = engine.prepare(df_raw.copy())
+        df = engine.prepare(df_raw)
         
         # Regime Map
         spy_df = self.market_data
@@ -140,33 +146,12 @@ class GranularValidator:
             }
         
         returns = pd.Series(returns)
-        sharpes, pfs, mdds = [], [], []
-        
-        for _ in range(BOOTSTRAP_ITERATIONS):
-            sample = returns.sample(n=len(returns), replace=True)
-            s = (sample.mean() / sample.std()) * (252**0.5) if sample.std() > 0 else 0
-            w = sample[sample > 0].sum()
-            l = abs(sample[sample <= 0].sum())
-            pf = w / l if l > 0 else 0
-            
-            equity = [1.0]
-            for r in sample: equity.append(equity[-1] * (1+r))
-            equity = np.array(equity)
-            mdd = ((equity - np.maximum.accumulate(equity))/np.maximum.accumulate(equity)).min()
-            
-            sharpes.append(s)
-            pfs.append(pf)
-            mdds.append(mdd)
-            
-        idx = int(BOOTSTRAP_ITERATIONS * (1 - CONFIDENCE_LEVEL))
-        sharpes.sort()
-        pfs.sort()
-        mdds.sort()
+        lb = bootstrap_lower_bounds(returns, BOOTSTRAP_ITERATIONS, CONFIDENCE_LEVEL)
         
         return {
-            "PF": pfs[idx],
-            "Sharpe": sharpes[idx],
-            "MaxDD": mdds[idx],
+            "PF": lb['pf'],
+            "Sharpe": lb['sharpe'],
+            "MaxDD": lb['mdd'],
             "AvgWin": returns[returns > 0].mean() if not returns[returns > 0].empty else 0,
             "AvgLoss": returns[returns <= 0].mean() if not returns[returns <= 0].empty else 0,
             "Trades": len(returns),
@@ -177,11 +162,12 @@ class GranularValidator:
         results = []
         print(f"Validating {len(self.symbol_data)} symbols...")
         
+        spy = None if self.market_data is None else self.market_data['close']
         for sym, df in self.symbol_data.items():
-            trades = self.simulate_symbol(sym, df)
+            sector = self.qs.sector_map.get(sym, "Unknown")
+            trades = self.cache.fetch_trades(sym, (df, sector, spy), lambda: self.simulate_symbol(sym, df))
             metrics = self.bootstrap_metrics(trades)
             
-            sector = self.qs.sector_map.get(sym, "Unknown")
             strat = "V5_Growth" if sector in self.qs.GROUPS["GROWTH"] else ("V1_Defensive" if sector in self.qs.GROUPS["DEFENSIVE"] else "Avoid")
             
             results.append({
@@ -197,6 +183,8 @@ class GranularValidator:
                 "Trades": metrics['Trades']
             })
             
+        print(self.cache.summary())
+
         # Create Report
         df_res = pd.DataFrame(results)
         df_res = df_res.sort_values(['Strategy', 'PF (98% LB)'], ascending=[True, False])
@@ -222,5 +210,9 @@ class GranularValidator:
         print(f"Report: {OUTPUT_REPORT}")
 
 if __name__ == "__main__":
-    v = GranularValidator()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every symbol (ignore the result cache)")
+    args = parser.parse_args()
+
+    v = GranularValidator(use_cache=not args.no_cache)
     v.run()
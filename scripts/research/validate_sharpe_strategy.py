@@ -1,16 +1,23 @@
 import os
+import sys
 import json
+import argparse
 import pandas as pd
 import numpy as np
 import random
 from typing import Dict, List, Any
 
+sys.path.append(os.getcwd())
+from scripts.core.bootstrap_stats import bootstrap_distribution, lower_bound
+from scripts.core.result_cache import ResultCache, code_fingerprint
+
 # Constants
 DATA_DIR = "public/data"
 OUTPUT_REPORT = "docs/validation_reports/v5_sharpe_results.md"
 TARGET_PF = 2.0
 TARGET_SHARPE = 1.5
 CONFIDENCE_LEVEL = 0.98
+ENGINE_VERSION = 1 # bump when trade semantics change outside the fingerprinted code
 
 class SharpeEngine:
     """Calculates volatility-based indicators for Sharpe optimization."""
@@ -55,10 +62,12 @@ class SharpeEngine:
 class StrategyValidator:
     """Runs the backtest and validation logic."""
     
-    def __init__(self):
+    def __init__(self, use_cache=True):
         self.trades = []
         self.equity_curve = []
-        self.data_map = {}
+        self.data_map = {}  # raw OHLCV; indicators are added per symbol on a cache miss
+        code = code_fingerprint(SharpeEngine, StrategyValidator._backtest_symbol)
+        self.cache = ResultCache('sharpe_strategy', ENGINE_VERSION, {'code': code}, enabled=use_cache)
 
     def load_data(self):
         """Loads data from public/data with robust error handling."""
@@ -90,8 +99,6 @@ class StrategyValidator:
                 if df is not None:
                     # Filter for decent volume/liquid stocks if needed, but we take all for now
                     df = df.sort_values('date').reset_index(drop=True)
-                    df = SharpeEngine.add_indicators(df)
-                    df = df.dropna()
                     symbol = filename.replace('.json', '').upper()
                     self.data_map[symbol] = df
                     loaded_count += 1
@@ -104,12 +111,15 @@ class StrategyValidator:
         """Executes the strategy logic."""
         print("Running Squeeze & Chandelier Backtest...")
         
-        for symbol, df in self.data_map.items():
-            self._backtest_symbol(symbol, df)
+        for symbol, df_raw in self.data_map.items():
+            self.trades.extend(self.cache.fetch_trades(symbol, (df_raw,), lambda: self._backtest_symbol(symbol, df_raw)))
+        print(self.cache.summary())
             
         print(f"Backtest Complete. Total Trades: {len(self.trades)}")
 
-    def _backtest_symbol(self, symbol, df):
+    def _backtest_symbol(self, symbol, df_raw):
+        df = SharpeEngine.add_indicators(df_raw).dropna()
+        trades = []
         in_position = False
         entry_price = 0
         entry_date = None
@@ -163,7 +173,7 @@ class StrategyValidator:
                     
                 if exit_signal:
                     pnl_pct = (row['close'] - entry_price) / entry_price
-                    self.trades.append({
+                    trades.append({
                         'Symbol': symbol,
                         'EntryDate': entry_date,
                         'ExitDate': row['date'],
@@ -173,6 +183,7 @@ class StrategyValidator:
                         'R_Multiple': unrealized_pnl / row['atr'] # Approximation
                     })
                     in_position = False
+        return trades
 
     def generate_report(self):
         if not self.trades:
@@ -209,17 +220,8 @@ class StrategyValidator:
         
         # Bootstrap
         n_iterations = 10000
-        boot_metrics = []
-        for _ in range(n_iterations):
-            sample = returns.sample(n=len(returns), replace=True)
-            s_mean = sample.mean()
-            s_std = sample.std()
-            sh = (s_mean / s_std) * (252 ** 0.5) if s_std != 0 else 0
-            boot_metrics.append(sh)
-            
-        boot_metrics = sorted(boot_metrics)
-        alpha_idx = int(n_iterations * (1 - CONFIDENCE_LEVEL))
-        lower_bound_sharpe = boot_metrics[alpha_idx]
+        boot_sharpes = bootstrap_distribution(returns, n_iterations, ('sharpe',))['sharpe']
+        lower_bound_sharpe = lower_bound(boot_sharpes, CONFIDENCE_LEVEL)
         
         # Output Generation
         report_content = f"""# Sharpe Strategy Validation (Protocol 5.0)
@@ -262,7 +264,11 @@ class StrategyValidator:
         print(f"Report written to {OUTPUT_REPORT}")
 
 if __name__ == "__main__":
-    validator = StrategyValidator()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every symbol (ignore the result cache)")
+    args = parser.parse_args()
+
+    validator = StrategyValidator(use_cache=not args.no_cache)
     validator.load_data()
     validator.run_backtest()
     validator.generate_report()
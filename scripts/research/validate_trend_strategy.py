@@ -1,13 +1,19 @@
 import os
 import json
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import sys
 
+sys.path.append(os.getcwd())
+from scripts.core.result_cache import ResultCache, code_fingerprint
+from scripts.core.rolling_stats import rolling_log_trend
+
 # Constants
 DATA_DIR = "public/data"
 OUTPUT_REPORT = "docs/validation_reports/v4_trend_scale_results.md"
+ENGINE_VERSION = 1 # bump when trade semantics change outside the fingerprinted code
 
 def load_all_data(limit=None):
     """Loads all OHLCV JSON files from public/data."""
@@ -88,77 +94,9 @@ class TrendEngine:
         df['ma120'] = close.rolling(120).mean()
         
         # 2. Trend Clock (1-Year Log Slope)
-        # We need a rolling apply for this. It's slow, so we might optimize or accept it.
-        # Vectorized approach: It's hard to do rolling linregress purely vectorized without stride_tricks.
-        # We will use a simplified approach or a custom rolling function.
-        
-        def rolling_log_slope(series, window=250):
-            # This is still slow. For backtest on 70 stocks, it's acceptable.
-            # Optimization: Polyfit is faster than linregress
-            x = np.arange(window)
-            
-            def slopes(y):
-                if len(y) < window: return np.nan
-                # Log transformation
-                log_y = np.log(y + 1e-9)
-                # Slope = (Mean(xy) - Mean(x)Mean(y)) / Var(x)
-                # Covariance approach is faster than polyfit in loop
-                # slope, intercept = np.polyfit(x, log_y, 1)
-                
-                # Fast linear regression line
-                n = len(x)
-                m_x = np.mean(x)
-                m_y = np.mean(log_y)
-                ss_xy = np.sum(y * x) - n * m_y * m_x # Wait, this is raw y, need log_y
-                ss_xy = np.sum(log_y * x) - n * m_y * m_x
-                ss_xx = np.sum(x * x) - n * m_x * m_x
-                
-                if ss_xx == 0: return 0
-                slope = ss_xy / ss_xx
-                
-                # R-Squared
-                # r = ss_xy / sqrt(ss_xx * ss_yy)
-                ss_yy = np.sum(log_y * log_y) - n * m_y * m_y
-                if ss_yy == 0: return 0
-                r2 = (ss_xy * ss_xy) / (ss_xx * ss_yy)
-                
-                return slope * 252, r2 # Annualized
-            
-            # Using pandas rolling apply requires mapping to custom object or two columns
-            # For simplicity in this script, we'll iterate or use a simpler momentum proxy if it takes too long.
-            # Let's try to implement a rolling window iterator for speed.
-            
-            results = [ (np.nan, np.nan) ] * (window - 1)
-            arr = series.values
-            
-            # Precompute X stats
-            n = window
-            x_vals = np.arange(n)
-            m_x = np.mean(x_vals)
-            ss_xx = np.sum(x_vals**2) - n * m_x**2
-            
-            for i in range(window, len(arr) + 1):
-                chunk = arr[i-window:i]
-                log_chunk = np.log(chunk + 1e-9)
-                
-                m_y = np.mean(log_chunk)
-                ss_xy = np.sum(log_chunk * x_vals) - n * m_y * m_x
-                ss_yy = np.sum(log_chunk**2) - n * m_y**2
-                
-                if ss_xx == 0 or ss_yy == 0:
-                    results.append((0, 0))
-                else:
-                    slope = ss_xy / ss_xx
-                    r2 = (ss_xy**2) / (ss_xx * ss_yy)
-                    results.append((slope * 252, r2))
-                    
-            return results
-
-        # Run calculation
+        # Annualized slope and R^2 of log(close) over 250 bars (O(n) cumulative-sum kernel)
         if len(df) > 250:
-            trend_data = rolling_log_slope(close, 250)
-            df['trend_slope'] = [x[0] for x in trend_data]
-            df['trend_r2'] = [x[1] for x in trend_data]
+            df['trend_slope'], df['trend_r2'] = rolling_log_trend(close, 250)
         else:
             df['trend_slope'] = 0
             df['trend_r2'] = 0
@@ -178,25 +116,32 @@ class TrendEngine:
         return df
 
 class StrategyValidator:
-    def __init__(self, data_map):
+    def __init__(self, data_map, use_cache=True):
         self.data_map = data_map
         self.results = []
+        code = code_fingerprint(TrendEngine, StrategyValidator.backtest_symbol, StrategyValidator._test_strategy_pullback)
+        self.cache = ResultCache('trend_strategy', ENGINE_VERSION, {'code': code}, enabled=use_cache)
         
     def run_backtest(self):
         print("Running Backtest...")
         
         for symbol, df_raw in self.data_map.items():
             if len(df_raw) < 300: continue # Need warm up
-            
-            df = TrendEngine.add_indicators(df_raw)
-            
-            # --- STRATEGY A: TREND PULLBACK ---
-            self._test_strategy_pullback(symbol, df)
-            
-            # --- STRATEGY B: COIL BREAKOUT ---
-            # self._test_strategy_breakout(symbol, df) # TODO: Implement later
+            self.results.extend(self.cache.fetch_trades(symbol, (df_raw,), lambda: self.backtest_symbol(symbol, df_raw)))
+        print(self.cache.summary())
+
+    def backtest_symbol(self, symbol, df_raw):
+        df = TrendEngine.add_indicators(df_raw)
+        
+        # --- STRATEGY A: TREND PULLBACK ---
+        trades = self._test_strategy_pullback(symbol, df)
+        
+        # --- STRATEGY B: COIL BREAKOUT ---
+        # trades += self._test_strategy_breakout(symbol, df) # TODO: Implement later
+        return trades
             
     def _test_strategy_pullback(self, symbol, df):
+        trades = []
         # State
         in_position = False
         entry_price = 0
@@ -240,7 +185,7 @@ class StrategyValidator:
                     exit_price = row['close']
                     pnl = (exit_price - entry_price) / entry_price
                     
-                    self.results.append({
+                    trades.append({
                         'Symbol': symbol,
                         'Strategy': 'Pullback',
                         'EntryDate': df.iloc[entry_idx]['date'],
@@ -251,6 +196,7 @@ class StrategyValidator:
                         'TrendR2': df.iloc[entry_idx]['trend_r2']
                     })
                     in_position = False
+        return trades
 
     def generate_report(self):
         if not self.results:
@@ -299,10 +245,14 @@ Does higher R-Squared (Cleaner Trend) lead to better results?
         print(f"Report written to {OUTPUT_REPORT}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every symbol (ignore the result cache)")
+    args = parser.parse_args()
+
     print("Step 1: Loading Data...")
     data = load_all_data()
     print(f"Loaded {len(data)} symbols.")
     
-    validator = StrategyValidator(data)
+    validator = StrategyValidator(data, use_cache=not args.no_cache)
     validator.run_backtest()
     validator.generate_report()
@@ -1,5 +1,7 @@
 import os
+import sys
 import json
+import argparse
 import pandas as pd
 import numpy as np
 from scipy import stats
@@ -10,38 +12,33 @@ OUTPUT_REPORT = "docs/V5_FINAL_VALIDATION_REPORT.md"
 BOOTSTRAP_ITERATIONS = 5000
 CONFIDENCE_LEVEL = 0.98
 START_DATE = "2018-01-01"
+ENGINE_VERSION = 1 # bump when trade semantics change outside the fingerprinted code
 
-# --- Indicator Library (V5 Specific) ---
-class Indicators:
-    @staticmethod
-    def atr(high, low, close, period=14):
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        return tr.rolling(period).mean()
+# --- Indicator Specs (V5 Specific, shared planner) ---
+sys.path.append(os.getcwd())
+from scripts.core.indicator_planner import attach, spec
+from scripts.core.result_cache import ResultCache, code_fingerprint
+from scripts.core.bootstrap_stats import METHODS, lower_bound, point_metrics, run_bootstrap
 
-    @staticmethod
-    def bollinger_bands(close, period=20):
-        sma = close.rolling(period).mean()
-        std = close.rolling(period).std()
-        upper = sma + 2 * std
-        lower = sma - 2 * std
-        width = (upper - lower) / sma
-        return sma, upper, width
+BB_WIDTH = spec('bb_width', period=20, zero_guard=False)
 
 # --- Strategy Logic ---
 class StrategyV5:
     def __init__(self):
         self.name = "V5 (Sharpe/Squeeze) 2018-2025"
 
-    def prepare(self, df):
-        df['atr'] = Indicators.atr(df['high'], df['low'], df['close'], 14)
-        df['ma20'], df['bb_upper'], df['bb_width'] = Indicators.bollinger_bands(df['close'], 20)
-        df['bb_width_pct'] = df['bb_width'].rolling(120).rank(pct=True)
-        df['ma200'] = df['close'].rolling(200).mean()
-        df['highest_high'] = df['high'].rolling(22).max()
-        return df
+    requires = {
+        'atr': spec('atr', period=14),
+        'ma20': spec('sma', period=20),
+        'bb_upper': spec('bb_upper', period=20),
+        'bb_width': BB_WIDTH,
+        'bb_width_pct': spec('rolling_rank', source=BB_WIDTH, window=120),
+        'ma200': spec('sma', period=200),
+        'highest_high': spec('rolling_max', period=22),
+    }
+
+    def prepare(self, df, ctx=None):
+        return attach(df, self.requires, ctx)
 
     def get_signal(self, row, prev_row, days_held, current_pnl, **kwargs):
         # Entry
@@ -67,8 +64,17 @@ class StrategyV5:
 
 # --- Validation Engine ---
 class FinalValidator:
-    def __init__(self):
+    def __init__(self, iterations=BOOTSTRAP_ITERATIONS, method='iid', block_size=1, workers=1, tol=None, seed=None,
+                 use_cache=True):
         self.strategy = StrategyV5()
+        self.iterations = iterations
+        self.method = method          # iid / block / circular / stationary
+        self.block_size = block_size  # mean block length in trades
+        self.workers = workers
+        self.tol = tol                # stop once the 2nd percentiles move less than this (relative)
+        self.seed = seed
+        code = code_fingerprint(StrategyV5, FinalValidator.backtest_symbol)
+        self.cache = ResultCache('v5_final', ENGINE_VERSION, {'code': code, 'requires': StrategyV5.requires}, enabled=use_cache)
         self.results = []
         self.equity_curve = [] 
 
@@ -105,46 +111,51 @@ class FinalValidator:
         print(f"Running validation on {len(all_data)} symbols (2018-2025)...")
         
         for symbol, df_raw in all_data.items():
-            df = df_raw.copy()
-            df = self.strategy.prepare(df)
-            df = df.dropna().reset_index(drop=True)
-            
-            in_pos = False
-            entry_price = 0
-            entry_idx = 0
-            local_high = 0
-            entry_date = None
-            
-            for i in range(1, len(df)):
-                row = df.iloc[i]
-                prev_row = df.iloc[i-1]
-                
-                days_held = 0
-                current_pnl = 0.0
-                
-                if in_pos:
-                    days_held = (row['date'] - entry_date).days
-                    current_pnl = (row['close'] - entry_price) / entry_price
-                    local_high = max(local_high, row['high'])
-                
-                ent, ext, reason = self.strategy.get_signal(row, prev_row, days_held, current_pnl, local_high=local_high)
-                
-                if in_pos and ext:
-                    self.results.append({
-                        'Symbol': symbol,
-                        'EntryDate': entry_date,
-                        'ExitDate': row['date'],
-                        'PnL': current_pnl,
-                        'Days': days_held,
-                        'Reason': reason
-                    })
-                    in_pos = False
-                elif not in_pos and ent:
-                    in_pos = True
-                    entry_price = row['close']
-                    entry_idx = i
-                    entry_date = row['date']
-                    local_high = row['close']
+            self.results.extend(self.cache.fetch_trades(symbol, (df_raw,), lambda: self.backtest_symbol(symbol, df_raw)))
+        print(self.cache.summary())
+
+    def backtest_symbol(self, symbol, df_raw):
+        trades = []
+        df = self.strategy.prepare(df_raw)
+        df = df.dropna().reset_index(drop=True)
+
+        in_pos = False
+        entry_price = 0
+        entry_idx = 0
+        local_high = 0
+        entry_date = None
+
+        for i in range(1, len(df)):
+            row = df.iloc[i]
+            prev_row = df.iloc[i-1]
+
+            days_held = 0
+            current_pnl = 0.0
+
+            if in_pos:
+                days_held = (row['date'] - entry_date).days
+                current_pnl = (row['close'] - entry_price) / entry_price
+                local_high = max(local_high, row['high'])
+
+            ent, ext, reason = self.strategy.get_signal(row, prev_row, days_held, current_pnl, local_high=local_high)
+
+            if in_pos and ext:
+                trades.append({
+                    'Symbol': symbol,
+                    'EntryDate': entry_date,
+                    'ExitDate': row['date'],
+                    'PnL': current_pnl,
+                    'Days': days_held,
+                    'Reason': reason
+                })
+                in_pos = False
+            elif not in_pos and ent:
+                in_pos = True
+                entry_price = row['close']
+                entry_idx = i
+                entry_date = row['date']
+                local_high = row['close']
+        return trades
 
     def calculate_cagr(self, returns_df):
         # Approximate CAGR based on portfolio simulation
@@ -169,13 +180,7 @@ class FinalValidator:
     def calculate_max_drawdown(self, returns):
         # Simulate equity curve from trade stream (assuming 1 unit invested per trade, sequential)
         # This is a synthetic curve for validation
-        equity = [1.0]
-        for r in returns:
-            equity.append(equity[-1] * (1 + r))
-        equity = np.array(equity)
-        peak = np.maximum.accumulate(equity)
-        drawdown = (equity - peak) / peak
-        return drawdown.min()
+        return point_metrics(returns, ('mdd',))['mdd']
 
     def to_md_table(self, data):
         if isinstance(data, pd.DataFrame):
@@ -197,62 +202,30 @@ class FinalValidator:
             print("No trades found.")
             return
 
-        # Bootstrapping for CI
+        # Bootstrapping for CI (block methods resample trades in exit order)
+        if self.method != 'iid':
+            df_res = df_res.sort_values('ExitDate', kind='stable').reset_index(drop=True)
         returns = df_res['PnL']
-        sharpes = []
-        pfs = []
-        mdds = []
-        annual_returns = [] # Synthetic
         
         # Time Span
         start_dt = df_res['EntryDate'].min()
         end_dt = df_res['ExitDate'].max()
         years = (end_dt - start_dt).days / 365.25
         
-        print(f"Bootstrapping {BOOTSTRAP_ITERATIONS} times...")
-        
-        for _ in range(BOOTSTRAP_ITERATIONS):
-            sample = returns.sample(n=len(returns), replace=True)
-            
-            # Sharpe
-            s = (sample.mean() / sample.std()) * (252**0.5) if sample.std() > 0 else 0
-            sharpes.append(s)
-            
-            # PF
-            wins = sample[sample > 0].sum()
-            losses = abs(sample[sample <= 0].sum())
-            pf = wins / losses if losses > 0 else 0
-            pfs.append(pf)
-            
-            # MaxDD (Synthetic)
-            mdd = self.calculate_max_drawdown(sample)
-            mdds.append(mdd)
-            
-            # Exp Annual Return (Simple)
-            # Sum of returns / Years (assuming simple interest for portfolio)
-            # OR Compound
-            # Let's stick to Sum of Returns / Years (Total Yield / Years)
-            # But this depends on position sizing. Assuming 100% allocation per trade (impossible).
-            # Better: Avg Trade % * TradesPerYear
-            tpy = len(sample) / years
-            ann_ret = sample.mean() * tpy
-            annual_returns.append(ann_ret)
-
-        # Sort for Percentiles
-        sharpes.sort()
-        pfs.sort()
-        mdds.sort() # Negative numbers
-        annual_returns.sort()
-        
-        # 98% Confidence (Lower Bound usually, or relevant tail)
-        # CI 98% means excluding bottom 1% and top 1%? Or User means "Lower 98% Bound"?
-        # Usually "With 98% Confidence" implies we are 98% sure it's above X. So 2nd percentile.
-        idx = int(BOOTSTRAP_ITERATIONS * (1 - CONFIDENCE_LEVEL))
+        print(f"Bootstrapping up to {self.iterations} times ({self.method})...")
+        res = run_bootstrap(returns, self.iterations, ('sharpe', 'pf', 'mdd', 'mean'), method=self.method,
+                            block_size=self.block_size, confidence=CONFIDENCE_LEVEL, seed=self.seed,
+                            workers=self.workers, tol=self.tol)
+        dist = res.distributions
+        sharpes, pfs, mdds = dist['sharpe'], dist['pf'], dist['mdd']
+        # Exp Annual Return (Simple): Avg Trade % * TradesPerYear
+        annual_returns = dist['mean'] * (len(returns) / years)
         
-        sharpe_lb = sharpes[idx]
-        pf_lb = pfs[idx]
-        mdd_worst = mdds[idx] # This is closer to -1.0 (smaller index = more negative)
-        ann_ret_lb = annual_returns[idx]
+        # 98% Confidence: "98% sure it's above X", i.e. the 2nd percentile
+        sharpe_lb = lower_bound(sharpes, CONFIDENCE_LEVEL)
+        pf_lb = lower_bound(pfs, CONFIDENCE_LEVEL)
+        mdd_worst = lower_bound(mdds, CONFIDENCE_LEVEL) # Closer to -1.0
+        ann_ret_lb = lower_bound(annual_returns, CONFIDENCE_LEVEL)
         
         # Summary Table
         summary = {
@@ -264,17 +237,19 @@ class FinalValidator:
                 f"{ann_ret_lb:.2%}"
             ],
             "Average Estimate": [
-                f"{sum(pfs)/len(pfs):.2f}",
-                f"{sum(sharpes)/len(sharpes):.2f}",
-                f"{sum(mdds)/len(mdds):.2%}",
-                f"{sum(annual_returns)/len(annual_returns):.2%}"
+                f"{pfs.mean():.2f}",
+                f"{sharpes.mean():.2f}",
+                f"{mdds.mean():.2%}",
+                f"{annual_returns.mean():.2%}"
             ]
         }
         
         report = f"# Final V5 Strategy Validation (2018-2025)\n\n"
         report += f"**Period**: {start_dt.date()} to {end_dt.date()} ({years:.1f} years)\n"
         report += f"**Sample Size**: {len(df_res)} Trades across ~75 Symbols\n"
-        report += f"**Confidence Level**: 98% (Bootstrap {BOOTSTRAP_ITERATIONS}x)\n\n"
+        resampling = "i.i.d." if self.method == 'iid' else f"{self.method} blocks of {self.block_size}"
+        stop = ", converged early" if res.converged else ""
+        report += f"**Confidence Level**: 98% (Bootstrap {res.iterations}x, {resampling}{stop})\n\n"
         
         report += self.to_md_table(pd.DataFrame(summary))
         
@@ -289,6 +264,17 @@ class FinalValidator:
         print(f"Report complete: {OUTPUT_REPORT}")
 
 if __name__ == "__main__":
-    validator = FinalValidator()
+    parser = argparse.ArgumentParser(description="V5 final validation with bootstrap confidence bounds")
+    parser.add_argument("--iterations", type=int, default=BOOTSTRAP_ITERATIONS)
+    parser.add_argument("--method", choices=METHODS, default='iid')
+    parser.add_argument("--block-size", type=int, default=10, help="Mean block length for block methods")
+    parser.add_argument("--workers", type=int, default=1, help="Bootstrap processes (0 = all cores)")
+    parser.add_argument("--tol", type=float, default=None, help="Relative tolerance for early stopping")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every symbol (ignore the result cache)")
+    args = parser.parse_args()
+
+    validator = FinalValidator(args.iterations, args.method, args.block_size, args.workers, args.tol, args.seed,
+                               use_cache=not args.no_cache)
     validator.run_backtest()
     validator.generate_report()
@@ -1,5 +1,7 @@
 import os
+import sys
 import json
+import argparse
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -11,38 +13,32 @@ OUTPUT_REPORT = "docs/V5_YEARLY_GROUPED_VALIDATION_REPORT.md"
 BOOTSTRAP_ITERATIONS = 5000
 CONFIDENCE_LEVEL = 0.98
 YEARS = list(range(2018, 2026))
+ENGINE_VERSION = 1 # bump when trade semantics change outside the fingerprinted code
 
-# --- Indicator Library (V5 Specific) ---
-class Indicators:
-    @staticmethod
-    def atr(high, low, close, period=14):
-        tr1 = high - low
-        tr2 = abs(high - close.shift())
-        tr3 = abs(low - close.shift())
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        return tr.rolling(period).mean()
+# --- Indicator Specs (V5 Specific, shared planner) ---
+sys.path.append(os.getcwd())
+from scripts.core.indicator_planner import attach, spec
+from scripts.core.result_cache import ResultCache, code_fingerprint
+from scripts.core.bootstrap_stats import bootstrap_distribution, lower_bound, point_metrics
 
-    @staticmethod
-    def bollinger_bands(close, period=20):
-        sma = close.rolling(period).mean()
-        std = close.rolling(period).std()
-        upper = sma + 2 * std
-        lower = sma - 2 * std
-        width = (upper - lower) / sma
-        return sma, upper, width
+BB_WIDTH = spec('bb_width', period=20, zero_guard=False)
 
 # --- Strategy Logic ---
 class StrategyV5:
     def __init__(self):
         self.name = "V5 (Sharpe/Squeeze) Yearly"
 
-    def prepare(self, df):
-        df['atr'] = Indicators.atr(df['high'], df['low'], df['close'], 14)
-        df['ma20'], df['bb_upper'], df['bb_width'] = Indicators.bollinger_bands(df['close'], 20)
-        df['bb_width_pct'] = df['bb_width'].rolling(120).rank(pct=True)
-        df['ma200'] = df['close'].rolling(200).mean()
-        # df['highest_high'] = df['high'].rolling(22).max() # Not strictly needed if calculated dynamically
-        return df
+    requires = {
+        'atr': spec('atr', period=14),
+        'ma20': spec('sma', period=20),
+        'bb_upper': spec('bb_upper', period=20),
+        'bb_width': BB_WIDTH,
+        'bb_width_pct': spec('rolling_rank', source=BB_WIDTH, window=120),
+        'ma200': spec('sma', period=200),
+    }
+
+    def prepare(self, df, ctx=None):
+        return attach(df, self.requires, ctx)
 
     def get_signal(self, row, prev_row, days_held, current_pnl, **kwargs):
         # Entry
@@ -68,9 +64,11 @@ class StrategyV5:
 
 # --- Validation Engine ---
 class YearlyValidator:
-    def __init__(self):
+    def __init__(self, use_cache=True):
         self.strategy = StrategyV5()
         self.results = []
+        code = code_fingerprint(StrategyV5, YearlyValidator.backtest_symbol)
+        self.cache = ResultCache('v5_yearly', ENGINE_VERSION, {'code': code, 'requires': StrategyV5.requires}, enabled=use_cache)
         self.sector_map = {}
         self.industry_map = {}
         self.load_metadata()
@@ -119,127 +117,98 @@ class YearlyValidator:
         print(f"Running validation on {len(all_data)} symbols...")
         
         for symbol, df_raw in all_data.items():
-            df = df_raw.copy()
-            df = self.strategy.prepare(df)
-            df = df.dropna().reset_index(drop=True)
-            
-            in_pos = False
-            entry_price = 0
-            local_high = 0
-            entry_date = None
-            
-            for i in range(1, len(df)):
-                row = df.iloc[i]
-                prev_row = df.iloc[i-1]
-                
-                days_held = 0
-                current_pnl = 0.0
-                
-                if in_pos:
-                    days_held = (row['date'] - entry_date).days
-                    current_pnl = (row['close'] - entry_price) / entry_price
-                    local_high = max(local_high, row['high'])
-                
-                ent, ext, reason = self.strategy.get_signal(row, prev_row, days_held, current_pnl, local_high=local_high)
-                
-                if in_pos and ext:
-                    # CRITICAL: No Day Trading Check
-                    if days_held < 1:
-                        # Force hold until next day close? Or just ignore trade?
-                        # User Rule: "Execution BUY then SELL at least next day".
-                        # If signal says sell same day, we ignore signal? Unsafe.
-                        # Interpretation: Trade counts, but Exit Price should be Next Day Open/Close?
-                        # Simplification: If algo exits same day, it's a violation.
-                        # But wait, our backtest loop is daily bars (Close to Close context).
-                        # Entry is at 'i' (assumed Close). Exit at 'i+k'.
-                        # If 'i' is entry day, next loop is 'i+1'.
-                        # So days_held will be >= 1 by definition of loop structure if we enter at Close.
-                        # Wait, logic:
-                        # ent -> in_pos=True (Mark entry at Close of i).
-                        # Next iteration (i+1): ext check. Exit at Close of i+1.
-                        # days_held = (date[i+1] - date[i]).days. Usually >= 1 (unless intraday data).
-                        # This dataset is Daily. So min hold is 1 day.
-                        # Day Trading is implicitly impossible with Daily Close-to-Close logic (Entry today close, Exit tomorrow close).
-                        # Valid.
-                        pass
+            self.results.extend(self.cache.fetch_trades(symbol, (df_raw, self.sector_map.get(symbol, 'Unknown'), self.industry_map.get(symbol, 'Unknown')), lambda: self.backtest_symbol(symbol, df_raw)))
+        print(self.cache.summary())
 
-                    self.results.append({
-                        'Symbol': symbol,
-                        'Sector': self.sector_map.get(symbol, 'Unknown'),
-                        'Industry': self.industry_map.get(symbol, 'Unknown'),
-                        'EntryDate': entry_date,
-                        'ExitDate': row['date'],
-                        'ExitYear': row['date'].year,
-                        'PnL': current_pnl,
-                        'Days': days_held,
-                        'Reason': reason
-                    })
-                    in_pos = False
-                elif not in_pos and ent:
-                    in_pos = True
-                    entry_price = row['close']
-                    entry_date = row['date']
-                    local_high = row['close']
+    def backtest_symbol(self, symbol, df_raw):
+        trades = []
+        df = self.strategy.prepare(df_raw)
+        df = df.dropna().reset_index(drop=True)
+
+        in_pos = False
+        entry_price = 0
+        local_high = 0
+        entry_date = None
+
+        for i in range(1, len(df)):
+            row = df.iloc[i]
+            prev_row = df.iloc[i-1]
+
+            days_held = 0
+            current_pnl = 0.0
+
+            if in_pos:
+                days_held = (row['date'] - entry_date).days
+                current_pnl = (row['close'] - entry_price) / entry_price
+                local_high = max(local_high, row['high'])
+
+            ent, ext, reason = self.strategy.get_signal(row, prev_row, days_held, current_pnl, local_high=local_high)
+
+            if in_pos and ext:
+                # CRITICAL: No Day Trading Check
+                if days_held < 1:
+                    # Force hold until next day close? Or just ignore trade?
+                    # User Rule: "Execution BUY then SELL at least next day".
+                    # If signal says sell same day, we ignore signal? Unsafe.
+                    # Interpretation: Trade counts, but Exit Price should be Next Day Open/Close?
+                    # Simplification: If algo exits same day, it's a violation.
+                    # But wait, our backtest loop is daily bars (Close to Close context).
+                    # Entry is at 'i' (assumed Close). Exit at 'i+k'.
+                    # If 'i' is entry day, next loop is 'i+1'.
+                    # So days_held will be >= 1 by definition of loop structure if we enter at Close.
+                    # Wait, logic:
+                    # ent -> in_pos=True (Mark entry at Close of i).
+                    # Next iteration (i+1): ext check. Exit at Close of i+1.
+                    # days_held = (date[i+1] - date[i]).days. Usually >= 1 (unless intraday data).
+                    # This dataset is Daily. So min hold is 1 day.
+                    # Day Trading is implicitly impossible with Daily Close-to-Close logic (Entry today close, Exit tomorrow close).
+                    # Valid.
+                    pass
+
+                trades.append({
+                    'Symbol': symbol,
+                    'Sector': self.sector_map.get(symbol, 'Unknown'),
+                    'Industry': self.industry_map.get(symbol, 'Unknown'),
+                    'EntryDate': entry_date,
+                    'ExitDate': row['date'],
+                    'ExitYear': row['date'].year,
+                    'PnL': current_pnl,
+                    'Days': days_held,
+                    'Reason': reason
+                })
+                in_pos = False
+            elif not in_pos and ent:
+                in_pos = True
+                entry_price = row['close']
+                entry_date = row['date']
+                local_high = row['close']
+        return trades
 
     def calculate_max_drawdown(self, returns):
-        equity = [1.0]
-        for r in returns:
-            equity.append(equity[-1] * (1 + r))
-        equity = np.array(equity)
-        peak = np.maximum.accumulate(equity)
-        drawdown = (equity - peak) / peak
-        return drawdown.min()
+        return point_metrics(returns, ('mdd',))['mdd']
 
     def bootstrap_metrics(self, df_group):
         unique_symbols = df_group['Symbol'].nunique()
         if unique_symbols < 3: return None
         
         returns = df_group['PnL']
-        sharpes = []
-        pfs = []
-        mdds = []
-        annual_returns = []
         
         # Determine strict time span for annualization within the specific year context?
         # Actually for "Yearly" group, the span is at most 1 year.
         # But trades might overlap years? We group by ExitYear.
         years_span = 1.0 
         
-        for _ in range(BOOTSTRAP_ITERATIONS):
-            sample = returns.sample(n=len(returns), replace=True)
-            
-            # Sharpe
-            s = (sample.mean() / sample.std()) * (252**0.5) if sample.std() > 0 else 0
-            sharpes.append(s)
-            
-            # PF
-            wins = sample[sample > 0].sum()
-            losses = abs(sample[sample <= 0].sum())
-            pf = wins / losses if losses > 0 else 0
-            pfs.append(pf)
-            
-            # MaxDD
-            mdd = self.calculate_max_drawdown(sample)
-            mdds.append(mdd)
-            
-            # Exp Annual Return
-            tpy = len(sample) # Total % sum / 1 year essentially if we assume full reinvestment? 
-            # Let's use simple sum for "Annual Return" of strategy in that year
-            ann_ret = sample.mean() * len(sample) # Total yield per unit
-            annual_returns.append(ann_ret)
-
-        sharpes.sort()
-        pfs.sort()
-        mdds.sort()
-        annual_returns.sort()
+        dist = bootstrap_distribution(returns, BOOTSTRAP_ITERATIONS, ('sharpe', 'pf', 'mdd', 'mean'))
+        # Simple sum for "Annual Return" of strategy in that year (total yield per unit)
+        annual_returns = dist['mean'] * len(returns)
         
-        idx = int(BOOTSTRAP_ITERATIONS * (1 - CONFIDENCE_LEVEL))
+        lb = lambda v: lower_bound(v, CONFIDENCE_LEVEL)
         
         return {
-            'PF (LB)': pfs[idx],
-            'Sharpe (LB)': sharpes[idx],
-            'MaxDD (LB)': mdds[idx],
-            'Avg Ret (LB)': annual_returns[idx],
+            'PF (LB)': lb(dist['pf']),
+            'Sharpe (LB)': lb(dist['sharpe']),
+            'MaxDD (LB)': lb(dist['mdd']),
+            'Avg Ret (LB)': lb(annual_returns),
             'Avg Win': returns[returns > 0].mean() if not returns[returns > 0].empty else 0,
             'Avg Loss': returns[returns <= 0].mean() if not returns[returns <= 0].empty else 0,
             'Trades': len(df_group),
@@ -306,6 +275,10 @@ class YearlyValidator:
         print(f"Report complete: {OUTPUT_REPORT}")
 
 if __name__ == "__main__":
-    v = YearlyValidator()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true", help="Recompute every symbol (ignore the result cache)")
+    args = parser.parse_args()
+
+    v = YearlyValidator(use_cache=not args.no_cache)
     v.run_backtest()
     v.generate_report()
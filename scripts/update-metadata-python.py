@@ -2,12 +2,21 @@
 """
 YFinance Metadata Update Script (Python)
 直接在 GitHub Actions 中運行，無需 CORS 代理
+
+只重新抓取過期 (超過 ttl_days)、缺少或 fallback 的股票，其餘沿用現有資料；
+需要抓取的股票以有限併發 + 速率限制並行處理。
+
+Usage:
+    python scripts/update-metadata-python.py [--force] [--workers 4] [--rate 4]
 """
 
+import argparse
 import json
 import os
 import sys
-from datetime import datetime, timezone
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 import time
 
@@ -19,12 +28,41 @@ except ImportError:
     print("請安裝: pip install yfinance requests")
     sys.exit(1)
 
+TTL_DAYS = 7
+# 排程每 ttl_days 執行一次，上次寫入的 last_verified_at 正好落在到期邊界；
+# 提前此時數視為到期，避免因 runner 啟動時間抖動而隔週才更新
+REFRESH_GRACE_HOURS = 12
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 4.0  # yfinance 請求 / 秒 (取代原本每檔 0.5 秒的 sleep)
+
+
+class RateLimiter:
+    """跨執行緒的請求間隔控制：每次 wait() 取得下一個間隔 1/rate 秒的起始時段"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
 class YFinanceMetadataUpdater:
-    def __init__(self):
+    def __init__(self, ttl_days=TTL_DAYS, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, force=False):
         self.project_root = Path(__file__).parent.parent
         self.output_file = self.project_root / 'public' / 'data' / 'symbols_metadata.json'
         self.sector_file = self.project_root / 'public' / 'data' / 'sector_industry.json'
         self.stocks_config_file = self.project_root / 'public' / 'config' / 'stocks.json'
+        self.ttl_days = ttl_days
+        self.workers = max(1, workers)
+        self.limiter = RateLimiter(rate)
+        self.force = force
         
         # 確保輸出目錄存在
         self.output_file.parent.mkdir(parents=True, exist_ok=True)
@@ -235,6 +273,60 @@ class YFinanceMetadataUpdater:
         }
         return exchange_mapping.get(exchange, exchange)
 
+    def load_existing_items(self):
+        """讀取現有 symbols_metadata.json，回傳 {symbol: item}"""
+        if not self.output_file.exists():
+            return {}
+        try:
+            with open(self.output_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return {item['symbol']: item for item in data.get('items', []) if item.get('symbol')}
+        except Exception as e:
+            print(f"⚠️ 無法讀取現有 metadata，將全部重新抓取: {e}")
+            return {}
+
+    def refresh_due(self, item, now):
+        """項目的到期時間：缺少、fallback (confidence < 1.0) 或無效時間戳立即到期，否則為 last_verified_at + TTL"""
+        if not item or item.get('confidence', 0) < 1.0:
+            return now
+        try:
+            verified = datetime.fromisoformat(item['last_verified_at'])
+        except (KeyError, TypeError, ValueError):
+            return now
+        if verified.tzinfo is None:
+            verified = verified.replace(tzinfo=timezone.utc)
+        return verified + timedelta(days=self.ttl_days)
+
+    def needs_refresh(self, item, now):
+        """到期 (或在 REFRESH_GRACE_HOURS 內即將到期) 的項目需要重新抓取"""
+        return self.refresh_due(item, now) <= now + timedelta(hours=REFRESH_GRACE_HOURS)
+
+    def fetch_metadata_concurrently(self, symbols):
+        """以 self.workers 個執行緒並行抓取，請求起始時間受 self.limiter 限速；回傳 {symbol: metadata}"""
+        results = {}
+        if not symbols:
+            return results
+
+        def fetch(symbol):
+            self.limiter.wait()
+            try:
+                return self.get_stock_metadata(symbol)
+            except Exception as e:
+                print(f"❌ {symbol} 處理失敗: {e}")
+                return self.get_fallback_metadata(symbol)
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(symbols))) as pool:
+            futures = {pool.submit(fetch, symbol): symbol for symbol in symbols}
+            for i, future in enumerate(as_completed(futures), 1):
+                symbol = futures[future]
+                results[symbol] = future.result()
+                print(f"📊 處理進度: {i}/{len(symbols)} - {symbol}")
+        return results
+
+    def next_refresh(self, items, now):
+        """最早到期項目的時間 (fallback 項目下次執行即重試)"""
+        return min((self.refresh_due(item, now) for item in items), default=now).isoformat()
+
     def update_metadata(self):
         """更新所有股票的 metadata"""
         print("🚀 開始更新 YFinance Metadata...")
@@ -249,27 +341,16 @@ class YFinanceMetadataUpdater:
             shutil.copy2(self.output_file, backup_file)
             print(f"💾 已備份現有 metadata 文件到 {backup_file}")
         
-        # 獲取所有股票的 metadata
-        metadata_items = []
-        successful_count = 0
-        
-        for i, symbol in enumerate(symbols, 1):
-            print(f"📊 處理進度: {i}/{len(symbols)} - {symbol}")
-            
-            try:
-                metadata = self.get_stock_metadata(symbol)
-                metadata_items.append(metadata)
-                
-                if metadata['confidence'] == 1.0:
-                    successful_count += 1
-                
-                # 避免 API 限制，稍微延遲
-                time.sleep(0.5)
-                
-            except Exception as e:
-                print(f"❌ {symbol} 處理失敗: {e}")
-                # 添加 fallback 資料
-                metadata_items.append(self.get_fallback_metadata(symbol))
+        # 只抓取過期 / 缺少 / fallback 的股票，其餘沿用現有資料
+        now = datetime.now(timezone.utc)
+        existing = self.load_existing_items()
+        stale = [symbol for symbol in symbols if self.force or self.needs_refresh(existing.get(symbol), now)]
+        print(f"🗂️ 現有 {len(existing)} 筆，需更新 {len(stale)} 筆，沿用 {len(symbols) - len(stale)} 筆")
+
+        refreshed = self.fetch_metadata_concurrently(stale)
+        metadata_items = [refreshed[symbol] if symbol in refreshed else existing[symbol] for symbol in symbols]
+        successful_count = sum(1 for symbol in stale if refreshed[symbol]['confidence'] == 1.0)
+        carried_count = len(symbols) - len(stale)
         
         # 生成 sector grouping
         sector_grouping = {}
@@ -281,9 +362,9 @@ class YFinanceMetadataUpdater:
         
         # 構建最終數據結構
         output_data = {
-            'ttl_days': 7,
+            'ttl_days': self.ttl_days,
             'as_of': datetime.now(timezone.utc).isoformat(),
-            'next_refresh': datetime.now(timezone.utc).isoformat(),
+            'next_refresh': self.next_refresh(metadata_items, now),
             'items': metadata_items,
             'sector_grouping': sector_grouping,
             'confidence_distribution': {
@@ -295,9 +376,10 @@ class YFinanceMetadataUpdater:
                 'fallback_data': sum(1 for item in metadata_items if 'fallback_data' in item['sources'])
             },
             'refresh_metadata': {
-                'symbols_updated': len(metadata_items),
+                'symbols_updated': len(stale),
                 'symbols_success': successful_count,
-                'symbols_fallback': len(metadata_items) - successful_count,
+                'symbols_fallback': len(stale) - successful_count,
+                'symbols_carried_forward': carried_count,
                 'update_source': 'github_actions_python'
             }
         }
@@ -335,9 +417,11 @@ class YFinanceMetadataUpdater:
         # 輸出統計
         print("\n📊 更新統計:")
         print(f"- 總股票數: {len(metadata_items)}")
+        print(f"- 沿用現有資料: {carried_count}")
         print(f"- 成功獲取: {successful_count}")
-        print(f"- 使用 fallback: {len(metadata_items) - successful_count}")
-        print(f"- API 成功率: {(successful_count/len(metadata_items)*100):.1f}%")
+        print(f"- 使用 fallback: {len(stale) - successful_count}")
+        if stale:
+            print(f"- API 成功率: {(successful_count/len(stale)*100):.1f}%")
         print(f"- Sector 數量: {len(sector_grouping)}")
         
         # 檢查關鍵股票
@@ -365,8 +449,16 @@ class YFinanceMetadataUpdater:
 
 def main():
     """主函數"""
+    parser = argparse.ArgumentParser(description='Refresh stale yfinance symbol metadata.')
+    parser.add_argument('--force', action='store_true', help='Refresh every symbol regardless of TTL')
+    parser.add_argument('--ttl-days', type=int, default=TTL_DAYS, help='Days before a verified entry is refetched')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Concurrent yfinance fetches')
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help='Max yfinance requests per second (0 = unlimited)')
+    args = parser.parse_args()
+
     try:
-        updater = YFinanceMetadataUpdater()
+        updater = YFinanceMetadataUpdater(ttl_days=args.ttl_days, workers=args.workers,
+                                          rate=args.rate, force=args.force)
         success = updater.update_metadata()
         
         if success:
@@ -1,13 +1,18 @@
-import yfinance as yf
-import pandas as pd
-import numpy as np
+import argparse
 import requests
 import json
 import os
+import sys
 import time
 
+sys.path.append(os.getcwd())
+from scripts.core.fear_greed import COMPONENTS, update_history
+
 OUTPUT_DIR = "public/data/technical-indicators"
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, "market-sentiment.json")
+# Daily model history for charts, plus the rolling-window state that lets each run extend it
+HISTORY_FILE = os.path.join(OUTPUT_DIR, "market-sentiment-history.json")
+STATE_FILE = os.path.join(OUTPUT_DIR, "market-sentiment-state.json")
 
 # Ensure dir exists
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -49,67 +54,12 @@ def fetch_cnn_api():
     return None
 
 # --- Z-Score Logic (Fallback) ---
-def calculate_z_score_model():
-    print("Calculating Z-Score Model (Fallback)...")
+def calculate_z_score_model(backfill=False):
+    print("Calculating Z-Score Model...")
     try:
-        # Fetch Data
-        tickers = ["^GSPC", "^VIX", "JNK", "IEF", "^NYA"]
-        data = yf.download(tickers, period="2y", interval="1d", progress=False) # 2y is enough for 125d lookback
-        
-        # Flatten MultiIndex
-        if isinstance(data.columns, pd.MultiIndex):
-            closes = data['Close']
-            highs = data['High']
-            lows = data['Low']
-        else:
-            closes = data
-            highs = data
-            lows = data
-            
-        closes = closes.ffill()
-        highs = highs.ffill()
-        lows = lows.ffill()
-        
-        # Parameters
-        LOOKBACK = 125
-        SCALE = 20
-        
-        def z_norm(series, invert=False):
-            rm = series.rolling(LOOKBACK).mean()
-            rstd = series.rolling(LOOKBACK).std()
-            z = (series - rm) / rstd
-            if invert: z = -z
-            return float((50 + z * SCALE).clip(0, 100).iloc[-1])
-            
-        # 1. Momentum
-        spx = closes['^GSPC']
-        ma125 = spx.rolling(125).mean()
-        mom = z_norm(spx / ma125)
-        
-        # 2. Strength
-        nya = closes['^NYA']
-        h52 = nya.rolling(252).max()
-        l52 = nya.rolling(252).min()
-        stre = z_norm((nya - l52) / (h52 - l52))
-        
-        # 3. Breadth
-        vix = closes['^VIX']
-        br = z_norm(vix.diff(5), invert=True)
-        
-        # 4. Options
-        opt = z_norm(vix, invert=True)
-        
-        # 5. Volatility
-        vma50 = vix.rolling(50).mean()
-        vol = z_norm((vix - vma50) / vma50, invert=True)
-        
-        # 6. Safe Haven
-        sret = spx.pct_change(20)
-        bret = closes['IEF'].pct_change(20)
-        safe = z_norm(sret - bret)
-        
-        # 7. Junk
-        junk = z_norm(closes['JNK'] / closes['IEF'])
+        # Extend the persisted history with the new trading days; publish its latest row
+        latest = update_history(HISTORY_FILE, STATE_FILE, lookback=125, scale=20, backfill=backfill).iloc[-1]
+        mom, stre, br, opt, vol, safe, junk = (float(latest[c]) for c in COMPONENTS)
         
         score = round((mom + stre + br + opt + vol + safe + junk) / 7)
         
@@ -149,19 +99,15 @@ def calculate_z_score_model():
 import datetime
 
 if __name__ == "__main__":
-    # Try API
-    result = fetch_cnn_api()
+    parser = argparse.ArgumentParser(description="Update the Fear & Greed sentiment file and its daily history")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild the full multi-year history instead of extending it")
+    args = parser.parse_args()
     
-    # Try Model if API fails
-    if not result:
-        result = calculate_z_score_model()
-        
-    # Always Calculate Components for UI? 
-    # Current Issue: API gives Score, but Vue needs components to draw the 7 sub-gauges.
-    # If Source is Official, we still don't have sub-components from API.
-    # Solution: ALWAYS run model to get components, but overwrite SCORE if API works.
-    
-    model_data = calculate_z_score_model()
+    # Vue needs the 7 model components for the sub-gauges even when the official
+    # CNN score is available, so the model runs exactly once and the API score
+    # (when it succeeds) overwrites the model score.
+    model_data = calculate_z_score_model(backfill=args.backfill)
+    result = fetch_cnn_api()
     
     final_data = model_data.copy()
     